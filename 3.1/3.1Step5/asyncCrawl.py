@@ -0,0 +1,194 @@
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import aiohttp
+
+from moreChildren import expand_more_async
+from redditFetch import conditional_headers, load_cached, store_cached, touch_cached
+
+# Async crawl engine used by fullCrawl.py when CRAWL_MODE = "async".
+# Keeps up to MAX_IN_FLIGHT comment fetches running at once, paced by a token
+# bucket per host instead of the fixed time.sleep(REQUEST_DELAY_COMMENTS).
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; SC4021Crawler/1.0; contact=edu)"
+}
+
+# Reddit allows ~100 requests/min for unauthenticated clients, start below that
+# and let the X-Ratelimit-* headers tell us how much room there really is
+DEFAULT_RATE = 1.0      # tokens (requests) per second
+DEFAULT_BURST = 4       # max tokens stored
+MIN_RATE = 0.05
+MAX_RATE = 5.0
+
+
+class TokenBucket:
+    """
+    Token bucket limiter for one host.
+    - acquire() waits until a token is available
+    - update_from_headers() re-tunes the rate from X-Ratelimit-Remaining/Reset
+    - penalize() halves the rate and pauses everyone after a 429
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount=1):
+        """Wait for `amount` tokens (capped at burst, so a big request can't wait forever)"""
+        amount = min(amount, self.burst)
+        # No lock needed: there is no await between the check and the decrement
+        while True:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self.paused_until:
+                wait = self.paused_until - now
+            elif self.tokens >= amount:
+                self.tokens -= amount
+                return
+            else:
+                wait = (amount - self.tokens) / self.rate
+            await asyncio.sleep(wait)
+
+    def update_from_headers(self, headers):
+        """Spread the remaining quota evenly over the time left in the window"""
+        try:
+            remaining = float(headers.get("X-Ratelimit-Remaining"))
+            reset = float(headers.get("X-Ratelimit-Reset"))
+        except (TypeError, ValueError):
+            return
+
+        if remaining < 1:
+            # Quota used up, nobody sends until the window resets
+            self.paused_until = time.monotonic() + reset
+            self.tokens = 0
+            return
+
+        if reset > 0:
+            self.rate = min(MAX_RATE, max(MIN_RATE, remaining / reset))
+
+    def penalize(self, retry_after=None):
+        self.rate = max(MIN_RATE, self.rate / 2)
+        self.tokens = 0
+        pause = retry_after if retry_after is not None else 1 / self.rate
+        self.paused_until = max(self.paused_until, time.monotonic() + pause)
+
+
+class HostLimiter:
+    """One TokenBucket per host, shared by every request to that host"""
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST):
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}
+
+    def for_url(self, url):
+        host = urlsplit(url).netloc
+        if host not in self.buckets:
+            self.buckets[host] = TokenBucket(self.rate, self.burst)
+        return self.buckets[host]
+
+
+def _retry_after(headers):
+    for key in ("Retry-After", "X-Ratelimit-Reset"):
+        try:
+            return float(headers.get(key))
+        except (TypeError, ValueError):
+            continue
+    return None
+
+
+async def fetch_json_async(session, limiter, url, params=None, max_retries=5):
+    """GET url and return parsed JSON, or None on 403/404/too many failures"""
+    bucket = limiter.for_url(url)
+    delay = 10
+    entry = load_cached(url, params)
+    headers = dict(HEADERS, **conditional_headers(entry))
+
+    for attempt in range(max_retries):
+        await bucket.acquire()
+        try:
+            async with session.get(url, params=params, headers=headers) as r:
+                bucket.update_from_headers(r.headers)
+
+                if r.status == 304 and entry:
+                    touch_cached(url, params)
+                    return json.loads(entry["body"])  # unchanged since last crawl
+
+                if r.status == 200:
+                    text = await r.text()
+                    store_cached(url, params, r.headers, text)
+                    return json.loads(text)
+
+                elif r.status == 429:
+                    retry_after = _retry_after(r.headers)
+                    bucket.penalize(retry_after)
+                    print(f"429 RATE LIMIT: rate now {bucket.rate:.2f} req/s (attempt {attempt+1}/{max_retries})")
+
+                elif r.status == 403:
+                    print(f"403 FORBIDDEN: Post may be private/removed. Skipping.")
+                    return None
+
+                elif r.status == 404:
+                    print(f"404 NOT FOUND: Post deleted. Skipping.")
+                    return None
+
+                else:
+                    print(f"Failed to fetch {url}: HTTP {r.status}")
+                    await asyncio.sleep(delay * (attempt + 1))
+
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            wait_time = delay * (2 ** attempt)
+            print(f"NETWORK ERROR ({type(e).__name__}): Retrying in {wait_time}s (attempt {attempt+1}/{max_retries})...")
+            await asyncio.sleep(wait_time)
+
+    print(f"Max retries ({max_retries}) exceeded. Skipping {url}")
+    return None
+
+
+async def crawl_comments_async(post_urls, handle_result, limiter, max_in_flight=4, api_url=None,
+                               morechildren_url=None, max_more_calls=None):
+    """
+    Fetch the comment JSON of every post in post_urls with at most max_in_flight
+    requests running. handle_result(post_url, data, calls) is called as each one
+    finishes (data is None if the fetch failed; calls = requests made for the post,
+    the thread fetch plus any morechildren calls), so results can be written to
+    disk while the rest are still downloading.
+
+    api_url maps the public post url to the url that is actually requested
+    (lets fullCrawl.py point the crawler at a local stand-in server).
+
+    If morechildren_url is given, "more" stubs are resolved (under the same
+    limiter) before the thread is handed to handle_result, at most max_more_calls
+    calls per post.
+    """
+    api_url = api_url or (lambda u: u)
+    semaphore = asyncio.Semaphore(max_in_flight)
+    timeout = aiohttp.ClientTimeout(total=30)
+    connector = aiohttp.TCPConnector(limit_per_host=max_in_flight)
+
+    async with aiohttp.ClientSession(timeout=timeout, connector=connector) as session:
+
+        async def worker(post_url):
+            async with semaphore:
+                calls = 1
+                data = await fetch_json_async(session, limiter, f"{api_url(post_url)}.json")
+                if data and morechildren_url:
+                    more_calls = await expand_more_async(
+                        data, lambda url, params: fetch_json_async(session, limiter, url, params),
+                        morechildren_url, max_more_calls)
+                    if more_calls:
+                        print(f"  Expanded 'more' stubs with {more_calls} morechildren calls")
+                    calls += more_calls
+            handle_result(post_url, data, calls)
+
+        await asyncio.gather(*(worker(u) for u in post_urls))
@@ -0,0 +1,123 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from commentsIO import load_comments, save_sheets
+from strictFilterComments import build_strict_matcher
+
+# BM25 ranking of comments against the topic, so sampling can favour comments that
+# are really about AI in hiring instead of drawing uniformly from Sheet 3.
+# The query is the strict filter's keyword lists (ai_terms / recruitment_terms),
+# matched exactly like strictFilterComments.py does (one Aho-Corasick pass per text).
+# Hit counts go into one sparse doc x term matrix and BM25 is applied to its
+# non-zeros only, so the whole corpus is scored in seconds. Each keyword group
+# gets its own column (bm25_ai, bm25_recruitment) and they're combined as
+#   bm25_score = (1 + bm25_ai) * (1 + bm25_recruitment) - 1
+# so a comment hitting both lists (what the strict rule asks for) ranks above one
+# that only piles up terms from a single list.
+#
+#   python bm25Rank.py --input all_raw_comments.parquet --output ranked_comments.parquet --top 2000
+
+K1 = 1.2
+B = 0.75
+
+
+def term_frequencies(texts, matcher):
+    """Sparse (texts x terms) hit counts, the term of each column and its group"""
+    columns, groups = {}, []
+    rows, cols = [], []
+    for row, hits in enumerate(matcher.scan_column(texts)):
+        for hit in hits:
+            col = columns.get(hit.term)
+            if col is None:
+                col = columns[hit.term] = len(columns)
+                groups.append(hit.group)
+            rows.append(row)
+            cols.append(col)
+    tf = sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(texts), len(columns)))
+    tf.sum_duplicates()
+    return tf, list(columns), groups
+
+
+def bm25_weights(tf, lengths, k1=K1, b=B):
+    """BM25 weight of every non-zero of a term frequency matrix (idf and average length from the same rows)"""
+    n_docs = tf.shape[0]
+    df = np.bincount(tf.indices, minlength=tf.shape[1])
+    idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    # tf * (k1 + 1) / (tf + k1 * (1 - b + b * len / avg_len))
+    norm = k1 * (1 - b + b * lengths / max(lengths.mean(), 1e-9))
+    rows = np.repeat(np.arange(n_docs), np.diff(tf.indptr))
+    data = tf.data * (k1 + 1) / (tf.data + norm[rows]) * idf[tf.indices]
+    return sparse.csr_matrix((data, tf.indices, tf.indptr), shape=tf.shape)
+
+
+def score_texts(texts, matcher=None, k1=K1, b=B):
+    """DataFrame with bm25_<group> per keyword group and the combined bm25_score"""
+    texts = pd.Series(list(texts), dtype=object).fillna("").astype(str)
+    tf, terms, groups = term_frequencies(texts, matcher or build_strict_matcher())
+    weights = bm25_weights(tf, texts.str.count(r"\w+").to_numpy(dtype=np.float64), k1, b)
+    out = pd.DataFrame(index=range(len(texts)))
+    combined = np.ones(len(texts))
+    for group in sorted(set(groups)):
+        mask = np.array([g == group for g in groups])
+        out[f"bm25_{group}"] = np.asarray(weights[:, mask].sum(axis=1)).ravel()
+        combined *= 1 + out[f"bm25_{group}"].to_numpy()
+    out["bm25_score"] = combined - 1
+    return out
+
+
+def rank_comments(df, text_col="comment_text"):
+    """df with the score columns added, best first (ties keep their original order)"""
+    scores = score_texts(df[text_col])
+    ranked = pd.concat([df.reset_index(drop=True), scores], axis=1)
+    return ranked.sort_values("bm25_score", ascending=False, kind="stable")
+
+
+def top_k(ranked, k):
+    return ranked.head(k)
+
+
+def stratified_by_score(ranked, n, buckets=4, random_state=42):
+    """
+    Equal share of n from each score bucket, so the sample covers weak and strong matches alike.
+    Comments with no keyword hit at all (bm25_score 0) are bucket 0; the rest are cut into
+    `buckets` quantiles of their score (1 = weakest). Small buckets give what they have.
+    """
+    ranked = ranked.copy()
+    positive = ranked["bm25_score"] > 0
+    ranked["bm25_bucket"] = 0
+    buckets = min(buckets, int(positive.sum()))
+    if buckets:
+        ranked.loc[positive, "bm25_bucket"] = pd.qcut(ranked.loc[positive, "bm25_score"].rank(method="first"), buckets,
+                                                      labels=range(1, buckets + 1)).astype(int)
+    groups = list(ranked.groupby("bm25_bucket"))
+    per_bucket, extra = divmod(n, len(groups)) if groups else (0, 0)
+    parts = []
+    for i, (bucket, group) in enumerate(groups):
+        take = per_bucket + (1 if i >= len(groups) - extra else 0)  # remainder goes to the top buckets
+        parts.append(group.sample(n=min(take, len(group)), random_state=random_state))
+    if not parts:
+        return ranked
+    return pd.concat(parts).sort_values("bm25_score", ascending=False, kind="stable")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rank comments by BM25 against the AI-hiring keyword lists")
+    parser.add_argument("--input", default="all_raw_comments.parquet", help=".parquet/.xlsx/.feather or jsonl folder")
+    parser.add_argument("--output", default="ranked_comments.parquet", help=".parquet or .xlsx")
+    parser.add_argument("--top", type=int, default=None, help="keep only the k best comments")
+    args = parser.parse_args()
+
+    df = load_comments(args.input)
+    print(f"Loaded {len(df):,} comments from {args.input}")
+    start = time.time()
+    ranked = rank_comments(df)
+    print(f"Scored in {time.time() - start:.2f}s; {(ranked['bm25_score'] > 0).sum():,} comments match any query term")
+    if args.top:
+        ranked = top_k(ranked, args.top)
+    written = save_sheets({"ranked_comments": ranked}, args.output)
+    print(f"✅ Saved {len(ranked):,} ranked comments to {', '.join(written)}")
+    print(ranked[["bm25_score", "comment_text"]].head(5).to_string(max_colwidth=80))
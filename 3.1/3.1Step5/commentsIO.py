@@ -0,0 +1,122 @@
+import json
+import os
+
+import pandas as pd
+
+# Loading/saving the comment tables used by the filter scripts.
+# Input format is picked from the path:
+#   .xlsx / .xls         -> pd.read_excel (slow, kept for old files)
+#   .parquet (file/dir)  -> pd.read_parquet, e.g. the convertAllJsonlToParquet.py dataset
+#   .feather / .arrow    -> pd.read_feather
+#   a folder of *.jsonl  -> the raw crawl output (jsonl_crawl_full/)
+# Only the requested columns are read (projection pushdown for Parquet/Feather,
+# usecols for Excel), so each filter pays only for title/text/subreddit/url/id.
+
+# Column names produced when reading the raw JSONL folder (same as all_raw_comments.xlsx)
+JSONL_COLUMNS = ["subreddit", "post_title", "post_url", "comment_text", "comment_id", "timestamp"]
+
+
+def _is_jsonl_dir(path):
+    return os.path.isdir(path) and any(name.endswith(".jsonl") for name in os.listdir(path))
+
+
+def input_format(path):
+    lower = path.lower().rstrip("/\\")
+    if lower.endswith((".xlsx", ".xls")):
+        return "excel"
+    if lower.endswith(".parquet"):
+        return "parquet"
+    if lower.endswith((".feather", ".arrow")):
+        return "feather"
+    if _is_jsonl_dir(path):
+        return "jsonl"
+    raise ValueError(f"Don't know how to read {path} (expected .xlsx, .parquet, .feather or a folder of .jsonl)")
+
+
+def list_columns(path):
+    """Column names without loading the data"""
+    fmt = input_format(path)
+    if fmt == "excel":
+        return list(pd.read_excel(path, nrows=0).columns)
+    if fmt == "parquet":
+        import pyarrow.dataset as ds
+        return ds.dataset(path, format="parquet", partitioning="hive").schema.names
+    if fmt == "feather":
+        import pyarrow.feather as feather
+        return feather.read_table(path, memory_map=True).schema.names
+    return list(JSONL_COLUMNS)
+
+
+def _read_jsonl_dir(folder, columns=None):
+    """Same row mapping as convertAllJsonlToExcelb4filterComments.create_raw_excel"""
+    rows = []
+    for name in sorted(os.listdir(folder)):
+        if not name.endswith(".jsonl"):
+            continue
+        sub = name[:-len("_all.jsonl")] if name.endswith("_all.jsonl") else name[:-len(".jsonl")]
+        with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+            for line_num, line in enumerate(f):
+                try:
+                    record = json.loads(line)
+                    rows.append({
+                        "subreddit": sub,
+                        "post_title": record["metadata"]["post_title"],
+                        "post_url": record["metadata"]["url"],
+                        "comment_text": record["text"],
+                        "comment_id": record.get("id", f"{sub}_{line_num}"),
+                        "timestamp": record.get("timestamp", ""),
+                    })
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    df = pd.DataFrame(rows, columns=JSONL_COLUMNS)
+    return df[columns] if columns else df
+
+
+def load_comments(path, columns=None):
+    """Load a comment table, reading only `columns` when given"""
+    fmt = input_format(path)
+    if fmt == "excel":
+        return pd.read_excel(path, usecols=columns)
+    if fmt == "parquet":
+        df = pd.read_parquet(path, columns=columns)
+        # partition column comes back as a category, filters expect plain strings
+        for col in df.columns:
+            if isinstance(df[col].dtype, pd.CategoricalDtype):
+                df[col] = df[col].astype(str)
+        return df
+    if fmt == "feather":
+        return pd.read_feather(path, columns=columns)
+    return _read_jsonl_dir(path, columns)
+
+
+def save_sheets(sheets, output_file, export_excel=False):
+    """
+    Write {sheet_name: DataFrame}.
+    - output_file .xlsx  -> one workbook, one sheet each (old behaviour)
+    - output_file .parquet -> one file for a single sheet, or <stem>/<sheet>.parquet for several
+    export_excel=True also writes the workbook next to the Parquet output.
+    Returns the list of paths written.
+    """
+    stem, ext = os.path.splitext(output_file)
+    written = []
+
+    if ext.lower() == ".parquet":
+        if len(sheets) == 1:
+            df = next(iter(sheets.values()))
+            df.to_parquet(output_file, index=False, compression="zstd")
+            written.append(output_file)
+        else:
+            os.makedirs(stem, exist_ok=True)
+            for name, df in sheets.items():
+                path = os.path.join(stem, f"{name}.parquet")
+                df.to_parquet(path, index=False, compression="zstd")
+                written.append(path)
+        if not export_excel:
+            return written
+        output_file = stem + ".xlsx"
+
+    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
+        for name, df in sheets.items():
+            df.to_excel(writer, sheet_name=name, index=False)
+    written.append(output_file)
+    return written
@@ -0,0 +1,172 @@
+import json
+import os
+import shutil
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from dedupIndex import DedupIndex
+
+# Streaming replacement for convertAllJsonlToExcelb4filterComments.py
+# Reads every <sub>_all.jsonl in chunks and writes a zstd-compressed Parquet dataset
+# partitioned by subreddit:
+#   all_raw_comments.parquet/subreddit=recruiting/part-0.parquet
+#   all_raw_comments.parquet/subreddit=recruitment/part-0.parquet ...
+# Memory stays at one chunk no matter how big the corpus gets, and there is no
+# 1,048,576 row limit like Excel. Load it back with
+#   pd.read_parquet("all_raw_comments.parquet", columns=[...])
+
+# --- Configuration ---
+INPUT_FOLDER = "jsonl_crawl_full"
+OUTPUT_DATASET = "all_raw_comments.parquet"
+CHUNK_SIZE = 50000  # rows buffered before a row group is written
+
+# Drop comments an earlier row of this run already had (same id, in any subreddit
+# file), so every count downstream is of unique comments. NEAR_DUP also drops
+# copy-pasted texts posted under a different id (see dedupIndex.py)
+DEDUP = True
+NEAR_DUP = False
+
+subreddits = [
+    "recruiting",
+    "recruitment",
+    "humanresources",
+    "recruitmentagencies",
+    #"technology",
+    #"futurology",
+    "recruitinghell"
+]
+
+# Same columns as all_raw_comments.xlsx (subreddit comes back from the partition folder)
+SCHEMA = pa.schema([
+    ("post_title", pa.string()),
+    ("post_url", pa.string()),
+    ("comment_text", pa.string()),
+    ("comment_id", pa.string()),
+    ("timestamp", pa.string()),
+])
+
+
+def iter_comment_rows(filepath, sub):
+    """Yield one row dict per valid JSONL record (same mapping as create_raw_excel)"""
+    with open(filepath, 'r', encoding='utf-8') as f:
+        for line_num, line in enumerate(f):
+            try:
+                record = json.loads(line)
+                yield {
+                    "post_title": record["metadata"]["post_title"],
+                    "post_url": record["metadata"]["url"],
+                    "comment_text": record["text"],
+                    "comment_id": record.get("id", f"{sub}_{line_num}"),
+                    "timestamp": record.get("timestamp", ""),
+                }
+            except json.JSONDecodeError as e:
+                print(f"  Error parsing line {line_num} in {sub}: {e}")
+            except KeyError as e:
+                print(f"  Missing key {e} in record from {sub}")
+
+
+def dedup_rows(rows, index, sub, batch_size=CHUNK_SIZE):
+    """Rows whose comment (id or near-identical text) isn't in the index yet, first occurrence wins"""
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == batch_size:
+            yield from _claim_rows(batch, index, sub)
+            batch = []
+    if batch:
+        yield from _claim_rows(batch, index, sub)
+
+
+def _claim_rows(batch, index, sub):
+    keep = index.claim_new([(row["comment_id"], row["comment_text"]) for row in batch], sub, sub)
+    return [batch[i] for i in keep]
+
+
+def iter_chunks(rows, chunk_size=CHUNK_SIZE):
+    """Group rows into column-oriented chunks of at most chunk_size"""
+    columns = {name: [] for name in SCHEMA.names}
+    count = 0
+    for row in rows:
+        for name in SCHEMA.names:
+            columns[name].append(row[name])
+        count += 1
+        if count == chunk_size:
+            yield columns
+            columns = {name: [] for name in SCHEMA.names}
+            count = 0
+    if count:
+        yield columns
+
+
+def convert_subreddit(filepath, sub, output_dir, dedup=None):
+    """Stream one subreddit's JSONL into its partition folder, returns rows written"""
+    partition_dir = os.path.join(output_dir, f"subreddit={sub}")
+    os.makedirs(partition_dir, exist_ok=True)
+
+    rows = iter_comment_rows(filepath, sub)
+    if dedup is not None:
+        rows = dedup_rows(rows, dedup, sub)
+
+    written = 0
+    writer = None
+    try:
+        for columns in iter_chunks(rows):
+            if writer is None:
+                writer = pq.ParquetWriter(os.path.join(partition_dir, "part-0.parquet"),
+                                          SCHEMA, compression="zstd")
+            writer.write_table(pa.Table.from_pydict(columns, schema=SCHEMA))
+            written += len(columns["comment_id"])
+            print(f"  Written {written:,} comments so far...")
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+def create_raw_parquet(input_folder=INPUT_FOLDER, output_dataset=OUTPUT_DATASET, dedup=DEDUP, near_dup=NEAR_DUP):
+    # Build into a temp folder and swap at the end, so a failed run never leaves
+    # a half-written dataset that downstream scripts would happily read
+    tmp_dataset = output_dataset + ".tmp"
+    if os.path.exists(tmp_dataset):
+        shutil.rmtree(tmp_dataset)
+    os.makedirs(tmp_dataset)
+
+    # Only lives for this run: the crawl's comment_index.sqlite has every id already
+    index = DedupIndex(":memory:", near_dup=near_dup) if dedup else None
+
+    by_sub = {}
+    for sub in subreddits:
+        filepath = os.path.join(input_folder, f"{sub}_all.jsonl")
+        if not os.path.exists(filepath):
+            print(f"Warning: {filepath} not found, skipping")
+            continue
+
+        print(f"Converting {sub}...")
+        by_sub[sub] = convert_subreddit(filepath, sub, tmp_dataset, index)
+
+    total = sum(by_sub.values())
+    if not total:
+        shutil.rmtree(tmp_dataset)
+        print("No comments found! Check your input folder.")
+        return
+
+    if os.path.exists(output_dataset):
+        shutil.rmtree(output_dataset)
+    os.replace(tmp_dataset, output_dataset)
+
+    print(f"\n{'='*60}")
+    print(f"✅ SUCCESS: Saved {total:,} raw comments to {output_dataset}/")
+    print(f"{'='*60}")
+    if index is not None:
+        print(index.stats_line())
+        index.close()
+
+    print(f"\nComments by subreddit:")
+    for sub, count in by_sub.items():
+        if count:
+            print(f"  {sub}: {count:,} comments")
+
+
+if __name__ == "__main__":
+    create_raw_parquet()
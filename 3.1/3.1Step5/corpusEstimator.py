@@ -0,0 +1,309 @@
+import argparse
+import json
+import random
+import time
+
+import numpy as np
+
+import fullCrawl
+import redditFetch
+from crawlBudget import COMMENT_MATCH_RATE, MAX_COMMENTS_PER_POST, TARGET_COMMENTS, TARGET_WORDS, estimate_calls
+from obtainAIrelatedPostPlusCommentsV2 import build_three_sheet_matcher, has_keywords
+
+# Sizes a crawl before paying for it (replaces 3.1Step4/10kcomments100kwords, which summed
+# num_comments and assumed 50 words per comment).
+#   1. every subreddit x keyword cell is searched - listings the crawl already downloaded are
+#      read straight from http_cache/ (SEARCH_MAX_AGE), no request
+#   2. THREADS_PER_CELL random threads per cell are fetched (first page only, no morechildren)
+#      and measured: share lost to [deleted]/[removed] (with the replies under them), words per
+#      comment, and for posts whose title has no keywords, the share of comments that have them
+#      (title matches keep everything)
+#   3. those rates are applied to the num_comments of every listed post (capped like the crawl
+#      caps it) -> relevant comments / words Sheet 3 would get, plus the requests needed
+# Confidence intervals come from a bootstrap over the sampled threads (comments of one thread
+# aren't independent, so threads are resampled, not comments).
+#
+#   python corpusEstimator.py                     (or python fullCrawl.py --estimate)
+#   python corpusEstimator.py --threads-per-cell 5 --seed 7 --output corpus_estimate.json
+
+THREADS_PER_CELL = 3
+SEARCH_MAX_AGE = 7 * 24 * 3600    # seconds a cached search listing is trusted without asking again
+THREAD_MAX_AGE = 30 * 24 * 3600
+BOOTSTRAP_ROUNDS = 2000
+CONFIDENCE = 0.90
+SEED = 42
+OUTPUT_FILE = "corpus_estimate.json"
+
+
+# --- Search metadata ---
+def paced(fetch, delay, *args, **kwargs):
+    """Call fetch and sleep afterwards only if it actually went to the network"""
+    before = redditFetch.request_counts["network"]
+    result = fetch(*args, **kwargs)
+    if redditFetch.request_counts["network"] > before:
+        time.sleep(delay)
+    return result
+
+
+def search_cells(subreddits, keywords, min_comments=fullCrawl.MIN_COMMENTS, max_age=SEARCH_MAX_AGE):
+    """(sub, kw) -> post_data of its listed posts; a post found by two cells counts for the first"""
+    cells, seen = {}, set()
+    for sub in subreddits:
+        for kw in keywords:
+            print(f"Searching r/{sub} for '{kw}'...")
+            posts = paced(fullCrawl.fetch_posts, fullCrawl.REQUEST_DELAY_SEARCH, sub, kw, limit=100, max_age=max_age)
+            cell = []
+            for post in posts:
+                post_data = post["data"]
+                if post_data.get("num_comments", 0) < min_comments or post_data["id"] in seen:
+                    continue
+                seen.add(post_data["id"])
+                cell.append(post_data)
+            cells[(sub, kw)] = cell
+    return cells
+
+
+# --- Thread sample ---
+def measure_thread(thread, title_match, matcher):
+    """
+    Counts of one fetched thread page, walked like the crawl walks it: visible comments, lost
+    ones ([deleted]/[removed] plus the replies under them, which the crawl never reaches),
+    words and relevance of the kept ones
+    """
+    lost = []
+    words, relevant = [], []
+    children = thread[1]["data"]["children"] if thread and len(thread) > 1 else []
+    for c in fullCrawl.kept_comments(children, lost):
+        words.append(len(c.get("body", "").split()))
+        relevant.append(title_match or has_keywords(matcher, c.get("body", "")))
+    return {"visible": len(words) + sum(lost), "deleted": sum(lost), "words": words, "relevant": relevant}
+
+
+def sample_threads(cells, title_matches, matcher, per_cell=THREADS_PER_CELL, seed=SEED, max_age=THREAD_MAX_AGE):
+    rng = random.Random(seed)
+    samples = []
+    for (sub, kw), posts in cells.items():
+        for post_data in rng.sample(posts, min(per_cell, len(posts))):
+            post_url = f"https://www.reddit.com{post_data['permalink']}"
+            thread = paced(fullCrawl.fetch_comments, fullCrawl.REQUEST_DELAY_COMMENTS, post_url, max_age=max_age)
+            if not thread:
+                continue
+            title_match = title_matches(post_data.get("title", ""))
+            sample = measure_thread(thread, title_match, matcher)
+            sample.update(cell=(sub, kw), post_id=post_data["id"], num_comments=post_data.get("num_comments", 0),
+                          title_match=title_match)
+            samples.append(sample)
+            print(f"  r/{sub} '{kw}': {post_data['id']} {sample['visible']} visible, {sample['deleted']} lost, "
+                  f"{sum(sample['relevant'])} relevant")
+    return samples
+
+
+# --- Projection ---
+def sample_arrays(samples):
+    """Per-thread totals the rates are ratios of"""
+    return {
+        "visible": np.array([s["visible"] for s in samples], dtype=np.float64),
+        "deleted": np.array([s["deleted"] for s in samples], dtype=np.float64),
+        "kept": np.array([len(s["words"]) for s in samples], dtype=np.float64),
+        "relevant": np.array([sum(s["relevant"]) for s in samples], dtype=np.float64),
+        "relevant_words": np.array([sum(w for w, r in zip(s["words"], s["relevant"]) if r) for s in samples],
+                                   dtype=np.float64),
+        "title_match": np.array([s["title_match"] for s in samples], dtype=bool),
+    }
+
+
+def rates(arrays, picks):
+    """
+    Ratio estimates for resampled thread sets; picks is (rounds, threads) of indexes.
+    Returns kept_rate, match_rate (non-title posts) and relevant words per comment, one per round.
+    """
+    def total(name, mask=None):
+        values = arrays[name] if mask is None else np.where(mask, arrays[name], 0)
+        return values[picks].sum(axis=1)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        kept_rate = 1 - total("deleted") / total("visible")
+        other = ~arrays["title_match"]
+        match_rate = total("relevant", other) / total("kept", other)
+        match_rate = np.where(np.isfinite(match_rate), match_rate, COMMENT_MATCH_RATE)  # no non-title thread drawn
+        words_per_comment = total("relevant_words") / total("relevant")
+    return kept_rate, match_rate, words_per_comment
+
+
+def capped(post_data, cap):
+    n = post_data.get("num_comments", 0)
+    return n if cap is None else min(n, cap)
+
+
+def project(cells, title_matches, kept_rate, match_rate, words_per_comment, cap):
+    """Relevant comments and words of all listed posts (arrays broadcast over bootstrap rounds)"""
+    title_n = sum(capped(p, cap) for posts in cells.values() for p in posts if title_matches(p.get("title", "")))
+    other_n = sum(capped(p, cap) for posts in cells.values() for p in posts if not title_matches(p.get("title", "")))
+    comments = kept_rate * (title_n + other_n * match_rate)
+    return comments, comments * words_per_comment
+
+
+def requests_to_target(cells, title_matches, kept_rate, match_rate, words_per_comment, cap,
+                       target_comments, target_words):
+    """Requests to reach the targets crawling the best-yield posts first, None if the posts don't suffice"""
+    posts = []
+    for cell_posts in cells.values():
+        for p in cell_posts:
+            relevant = capped(p, cap) * kept_rate * (1 if title_matches(p.get("title", "")) else match_rate)
+            posts.append((relevant / estimate_calls(p.get("num_comments", 0), cap), relevant, p))
+    posts.sort(key=lambda item: item[0], reverse=True)
+    comments = calls = 0
+    for _, relevant, p in posts:
+        if comments >= target_comments and comments * words_per_comment >= target_words:
+            return calls
+        comments += relevant
+        calls += estimate_calls(p.get("num_comments", 0), cap)
+    return calls if comments >= target_comments and comments * words_per_comment >= target_words else None
+
+
+def interval(values, confidence=CONFIDENCE):
+    tail = (1 - confidence) / 2 * 100
+    low, high = np.nanpercentile(values, [tail, 100 - tail])
+    return [float(low), float(high)]
+
+
+def estimate(subreddits=None, keywords=None, per_cell=THREADS_PER_CELL, seed=SEED, cap=MAX_COMMENTS_PER_POST,
+             min_comments=fullCrawl.MIN_COMMENTS, target_comments=TARGET_COMMENTS, target_words=TARGET_WORDS,
+             search_max_age=SEARCH_MAX_AGE, rounds=BOOTSTRAP_ROUNDS, confidence=CONFIDENCE):
+    """Search, sample and project; returns the report dict (see print_report)"""
+    subreddits = subreddits or fullCrawl.subreddits
+    keywords = keywords or fullCrawl.keywords
+    matcher = build_three_sheet_matcher()
+    title_matches = lambda title: has_keywords(matcher, str(title))
+    start_requests = redditFetch.request_counts["network"]
+
+    cells = search_cells(subreddits, keywords, min_comments, search_max_age)
+    search_requests = redditFetch.request_counts["network"] - start_requests
+    print(f"\nSampling {per_cell} threads per cell...")
+    samples = sample_threads(cells, title_matches, matcher, per_cell, seed)
+    if not samples:
+        raise RuntimeError("No thread could be fetched, nothing to estimate from")
+    arrays = sample_arrays(samples)
+
+    everything = np.arange(len(samples))[None, :]
+    kept_rate, match_rate, words_per_comment = (float(v[0]) for v in rates(arrays, everything))
+    comments, words = project(cells, title_matches, kept_rate, match_rate, words_per_comment, cap)
+
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(samples), size=(rounds, len(samples)))
+    boot_kept, boot_match, boot_words = rates(arrays, picks)
+    boot_comments, boot_total_words = project(cells, title_matches, boot_kept, boot_match, boot_words, cap)
+
+    relevant_lengths = np.array([w for s in samples for w, r in zip(s["words"], s["relevant"]) if r])
+    listed = [p for posts in cells.values() for p in posts]
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "subreddits": list(subreddits),
+        "keywords": list(keywords),
+        "threads_per_cell": per_cell,
+        "seed": seed,
+        "max_comments_per_post": cap,
+        "min_comments": min_comments,
+        "confidence": confidence,
+        "posts_listed": len(listed),
+        "num_comments_listed": int(sum(p.get("num_comments", 0) for p in listed)),
+        "threads_sampled": len(samples),
+        "requests_made": {"search": search_requests,
+                          "threads": redditFetch.request_counts["network"] - start_requests - search_requests},
+        "deleted_ratio": {"estimate": 1 - kept_rate, "ci": sorted(1 - x for x in interval(boot_kept, confidence))},
+        "keyword_share_untitled": {"estimate": match_rate, "ci": interval(boot_match, confidence),
+                                   "measured": bool((~arrays["title_match"]).any())},
+        "words_per_comment": {
+            "mean": words_per_comment,
+            "ci": interval(boot_words, confidence),
+            "p10_p50_p90": ([float(x) for x in np.percentile(relevant_lengths, [10, 50, 90])]
+                            if len(relevant_lengths) else None),
+        },
+        "relevant_comments": {"estimate": float(comments), "ci": interval(boot_comments, confidence)},
+        "relevant_words": {"estimate": float(words), "ci": interval(boot_total_words, confidence)},
+        "requests_full_crawl": int(sum(estimate_calls(p.get("num_comments", 0), cap) for p in listed)),
+        "requests_to_target": requests_to_target(cells, title_matches, kept_rate, match_rate, words_per_comment,
+                                                 cap, target_comments, target_words),
+        "target": {"comments": target_comments, "words": target_words},
+        "cells": [],
+    }
+    for (sub, kw), posts in cells.items():
+        cell_samples = [s for s in samples if s["cell"] == (sub, kw)]
+        visible = sum(s["visible"] for s in cell_samples)
+        cell_comments, _ = project({(sub, kw): posts}, title_matches, kept_rate, match_rate, words_per_comment, cap)
+        report["cells"].append({
+            "subreddit": sub, "keyword": kw, "posts": len(posts),
+            "num_comments": int(sum(p.get("num_comments", 0) for p in posts)),
+            "title_matches": sum(title_matches(p.get("title", "")) for p in posts),
+            "sampled": len(cell_samples),
+            "deleted_ratio": sum(s["deleted"] for s in cell_samples) / visible if visible else None,
+            "relevant_comments": float(cell_comments),
+        })
+    return report
+
+
+def print_report(report):
+    pct = int(report["confidence"] * 100)
+
+    def fmt(entry, scale=1, digits=0):
+        low, high = entry["ci"]
+        return f"{entry['estimate'] * scale:,.{digits}f} ({pct}% CI {low * scale:,.{digits}f} - {high * scale:,.{digits}f})"
+
+    print("\nPer cell (relevant comments use the pooled rates):")
+    for c in report["cells"]:
+        deleted = "-" if c["deleted_ratio"] is None else f"{c['deleted_ratio'] * 100:.0f}%"
+        print(f"  r/{c['subreddit']} '{c['keyword']}': {c['posts']} posts, {c['num_comments']:,} listed comments, "
+              f"{c['title_matches']} keyword titles, {c['sampled']} sampled, {deleted} lost "
+              f"-> ~{c['relevant_comments']:,.0f} relevant")
+
+    words = report["words_per_comment"]
+    print(f"\nSampled {report['threads_sampled']} threads "
+          f"({report['requests_made']['search']} search + {report['requests_made']['threads']} thread requests made, "
+          f"the rest came from the cache)")
+    print(f"Lost to [deleted]/[removed] (incl. their replies): {fmt(report['deleted_ratio'], 100, 1)} %")
+    share = report["keyword_share_untitled"]
+    print(f"Keyword share in posts without a keyword title: {fmt(share, 100, 1)} %"
+          + ("" if share["measured"] else " (prior, no such thread sampled)"))
+    print(f"Words per relevant comment: {words['mean']:.1f} ({pct}% CI {words['ci'][0]:.1f} - {words['ci'][1]:.1f})"
+          + (", p10/p50/p90 {:.0f}/{:.0f}/{:.0f}".format(*words["p10_p50_p90"]) if words["p10_p50_p90"] else ""))
+
+    print(f"\nEstimated corpus size ({report['posts_listed']} posts, {report['num_comments_listed']:,} listed comments, "
+          f"max {report['max_comments_per_post']} per post):")
+    print(f"Comments: {fmt(report['relevant_comments'])}")
+    print(f"Words:    {fmt(report['relevant_words'])}")
+    needed = report["requests_to_target"]
+    print(f"Requests: {report['requests_full_crawl']:,} for every listed post, "
+          + (f"~{needed:,} to reach the target best-yield first" if needed is not None else "target not reachable"))
+
+    target = report["target"]
+    low_comments, low_words = report["relevant_comments"]["ci"][0], report["relevant_words"]["ci"][0]
+    if low_comments >= target["comments"] and low_words >= target["words"]:
+        print(f"Good: even the low end reaches {target['comments']:,} comments / {target['words']:,} words.")
+    elif report["relevant_comments"]["estimate"] >= target["comments"] and report["relevant_words"]["estimate"] >= target["words"]:
+        print("Borderline: the estimate reaches the target but the low end doesn't, add a subreddit or keyword to be safe.")
+    else:
+        print("Warning: You may need more posts, subreddits, or keywords.")
+
+
+def main(subreddits=None, keywords=None, argv=None):
+    parser = argparse.ArgumentParser(description="Estimate corpus size from search metadata and a small thread sample")
+    parser.add_argument("--threads-per-cell", type=int, default=THREADS_PER_CELL)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--min-comments", type=int, default=fullCrawl.MIN_COMMENTS)
+    parser.add_argument("--max-comments-per-post", type=int, default=MAX_COMMENTS_PER_POST, help="0 = no cap")
+    parser.add_argument("--search-max-age", type=float, default=SEARCH_MAX_AGE / 3600,
+                        help="hours a cached search listing is reused without a request")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    args = parser.parse_args(argv)
+
+    report = estimate(subreddits, keywords, args.threads_per_cell, args.seed, args.max_comments_per_post or None,
+                      args.min_comments, search_max_age=args.search_max_age * 3600)
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, ensure_ascii=False)
+    print(f"✅ Saved estimate to {args.output}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
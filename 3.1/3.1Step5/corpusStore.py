@@ -0,0 +1,345 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+
+import numpy as np
+
+# Compact, memory-mapped copy of jsonl_crawl_full/.
+# Every JSONL record repeats its post's subreddit/title/url, so a 50 comment thread
+# stores its title 50 times. Here posts and comments are separate tables:
+#   corpus_store/
+#     strings.bin + strings.npy   interned strings (ids, subreddits, titles, urls, ...) + their offsets
+#     texts.bin                   comment bodies back to back (utf-8)
+#     comments.npy                one fixed-size row per comment (string refs, text offset/length, epoch time)
+#     posts.npy                   one row per post (id, subreddit, title, url) + its comments' range in post_rows.npy
+#     comment_slots.npy / post_slots.npy   open-addressing hash tables id -> row
+# Everything is opened with np.load(mmap_mode="r") / mmap, so opening the store reads
+# nothing up front and store.comment("nflaz4p") touches a handful of pages (O(1)).
+# export_jsonl() writes the records back in the original shape and order.
+#
+#   python corpusStore.py build --input jsonl_crawl_full --store corpus_store
+#   python corpusStore.py get nflaz4p          (a comment id, or a post id like 1nnlnw7)
+#   python corpusStore.py export --output jsonl_export
+
+INPUT_FOLDER = "jsonl_crawl_full"
+STORE_FOLDER = "corpus_store"
+NONE = np.iinfo(np.uint32).max  # "field not in the record"
+TIMESTAMP_FORMAT = "%Y-%m-%dT%H:%M:%SZ"
+POST_ID = re.compile(r"/comments/([a-z0-9]+)")
+
+COMMENT_DTYPE = np.dtype([
+    ("id", "<u4"),          # string refs
+    ("file", "<u4"),        # <sub> of the <sub>_all.jsonl it came from
+    ("source", "<u4"),
+    ("parent", "<u4"),
+    ("post", "<u4"),        # row in posts.npy
+    ("text_len", "<u4"),
+    ("text_start", "<u8"),  # byte offset in texts.bin
+    ("created", "<i8"),     # epoch seconds; < 0 -> -(string ref + 1) of a timestamp that isn't TIMESTAMP_FORMAT
+])
+POST_DTYPE = np.dtype([
+    ("id", "<u4"),
+    ("subreddit", "<u4"),
+    ("title", "<u4"),
+    ("url", "<u4"),
+    ("first", "<u4"),       # its comments are post_rows[first:first + count]
+    ("count", "<u4"),
+])
+
+
+def key_hash(key):
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def build_slots(keys):
+    """Open-addressing table (linear probing, <= 50% full): slot -> row + 1, 0 = empty. First key wins."""
+    capacity = 1 << max(4, (2 * len(keys) - 1).bit_length())
+    slots = np.zeros(capacity, dtype=np.uint32)
+    seen = set()
+    for row, key in enumerate(keys):
+        if key in seen:
+            continue
+        seen.add(key)
+        slot = key_hash(key) & (capacity - 1)
+        while slots[slot]:
+            slot = (slot + 1) & (capacity - 1)
+        slots[slot] = row + 1
+    return slots
+
+
+class StringPool:
+    """Interning table while building: string -> ref"""
+
+    def __init__(self):
+        self.refs = {}
+        self.strings = []
+
+    def __call__(self, value):
+        if value is None:
+            return NONE
+        ref = self.refs.get(value)
+        if ref is None:
+            ref = self.refs[value] = len(self.strings)
+            self.strings.append(value)
+        return ref
+
+    def save(self, folder):
+        data = [s.encode("utf-8") for s in self.strings]
+        offsets = np.zeros(len(data) + 1, dtype=np.uint64)
+        np.cumsum([len(d) for d in data], out=offsets[1:])
+        with open(os.path.join(folder, "strings.bin"), "wb") as f:
+            f.write(b"".join(data))
+        np.save(os.path.join(folder, "strings.npy"), offsets)
+
+
+def encode_timestamp(value, strings):
+    if value is None:
+        return -(int(NONE) + 1)
+    try:
+        epoch = int(datetime.strptime(value, TIMESTAMP_FORMAT).replace(tzinfo=timezone.utc).timestamp())
+        if decode_epoch(epoch) == value:
+            return epoch
+    except ValueError:
+        pass
+    return -(int(strings(value)) + 1)
+
+
+def decode_epoch(epoch):
+    return datetime.fromtimestamp(epoch, tz=timezone.utc).strftime(TIMESTAMP_FORMAT)
+
+
+# --- Build ---
+def build_store(input_folder=INPUT_FOLDER, store_folder=STORE_FOLDER):
+    """Read every <sub>_all.jsonl in input_folder into a new store (swapped in when complete)"""
+    tmp_folder = store_folder + ".tmp"
+    if os.path.exists(tmp_folder):
+        shutil.rmtree(tmp_folder)
+    os.makedirs(tmp_folder)
+
+    strings = StringPool()
+    post_rows = {}  # post key (id, else url) -> row
+    posts = []
+    comments = []
+    text_pos = 0
+    input_bytes = 0
+
+    with open(os.path.join(tmp_folder, "texts.bin"), "wb") as texts:
+        for name in sorted(os.listdir(input_folder)):
+            if not name.endswith("_all.jsonl"):
+                continue
+            sub = name[:-len("_all.jsonl")]
+            path = os.path.join(input_folder, name)
+            input_bytes += os.path.getsize(path)
+            print(f"Reading {name}...")
+            with open(path, "r", encoding="utf-8") as f:
+                for line_num, line in enumerate(f):
+                    try:
+                        record = json.loads(line)
+                        meta = record["metadata"]
+                        text = record["text"].encode("utf-8")
+                    except (json.JSONDecodeError, KeyError) as e:
+                        print(f"  Skipping line {line_num} in {name}: {e!r}")
+                        continue
+
+                    url = meta.get("url")
+                    match = POST_ID.search(url or "")
+                    post_key = match.group(1) if match else url
+                    row = post_rows.get(post_key)
+                    if row is None:
+                        row = post_rows[post_key] = len(posts)
+                        posts.append((strings(post_key), strings(meta.get("subreddit")),
+                                      strings(meta.get("post_title")), strings(url)))
+
+                    texts.write(text)
+                    comments.append((
+                        # same fallback id as convertAllJsonlToParquet.iter_comment_rows
+                        strings(record.get("id", f"{sub}_{line_num}")),
+                        strings(sub),
+                        strings(record.get("source")),
+                        strings(meta.get("parent_id")),
+                        row,
+                        len(text),
+                        text_pos,
+                        encode_timestamp(record.get("timestamp"), strings),
+                    ))
+                    text_pos += len(text)
+
+    comment_table = np.array(comments, dtype=COMMENT_DTYPE)
+    # comments grouped by post (stable, so crawl order within a post is kept)
+    by_post = np.argsort(comment_table["post"], kind="stable").astype(np.uint32)
+    counts = np.bincount(comment_table["post"], minlength=len(posts)) if len(posts) else np.zeros(0, dtype=np.int64)
+    firsts = np.concatenate([[0], np.cumsum(counts)[:-1]]) if len(posts) else counts
+    post_table = np.array([p + (int(first), int(count)) for p, first, count in zip(posts, firsts, counts)],
+                          dtype=POST_DTYPE)
+
+    np.save(os.path.join(tmp_folder, "comments.npy"), comment_table)
+    np.save(os.path.join(tmp_folder, "posts.npy"), post_table)
+    np.save(os.path.join(tmp_folder, "post_rows.npy"), by_post)
+    np.save(os.path.join(tmp_folder, "comment_slots.npy"),
+            build_slots([strings.strings[ref] for ref in comment_table["id"]]))
+    np.save(os.path.join(tmp_folder, "post_slots.npy"),
+            build_slots([strings.strings[ref] for ref in post_table["id"]]))
+    strings.save(tmp_folder)
+    with open(os.path.join(tmp_folder, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump({"comments": len(comment_table), "posts": len(post_table), "strings": len(strings.strings),
+                   "input_bytes": input_bytes}, f, indent=2)
+
+    if os.path.exists(store_folder):
+        shutil.rmtree(store_folder)
+    os.replace(tmp_folder, store_folder)
+    print(f"✅ Stored {len(comment_table):,} comments / {len(post_table):,} posts in {store_folder}/")
+    return CorpusStore(store_folder)
+
+
+# --- Read ---
+class CorpusStore:
+    """
+    store = CorpusStore("corpus_store")
+    store.comment("nflaz4p")       -> the JSONL record dict, or None
+    store.post("1nnlnw7")          -> {"id", "subreddit", "post_title", "url", "num_comments"}
+    store.post_comments("1nnlnw7") -> its records in crawl order
+    """
+
+    def __init__(self, folder=STORE_FOLDER):
+        self.folder = folder
+
+        def load(name):
+            return np.load(os.path.join(folder, name), mmap_mode="r")
+
+        self.comments = load("comments.npy")
+        self.posts = load("posts.npy")
+        self.post_rows = load("post_rows.npy")
+        self.comment_slots = load("comment_slots.npy")
+        self.post_slots = load("post_slots.npy")
+        self.string_offsets = load("strings.npy")
+        self.strings = self._map("strings.bin")
+        self.texts = self._map("texts.bin")
+
+    def _map(self, name):
+        with open(os.path.join(self.folder, name), "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def __len__(self):
+        return len(self.comments)
+
+    def string(self, ref):
+        if ref == NONE:
+            return None
+        start, end = self.string_offsets[ref], self.string_offsets[ref + 1]
+        return self.strings[start:end].decode("utf-8")
+
+    def _find(self, slots, table, key):
+        capacity = len(slots)
+        slot = key_hash(key) & (capacity - 1)
+        while slots[slot]:
+            row = int(slots[slot]) - 1
+            if self.string(table[row]["id"]) == key:
+                return row
+            slot = (slot + 1) & (capacity - 1)
+        return None
+
+    def comment_row(self, comment_id):
+        return self._find(self.comment_slots, self.comments, comment_id)
+
+    def post_row(self, post_id):
+        return self._find(self.post_slots, self.posts, post_id)
+
+    def record(self, row):
+        """The JSONL record of comment row `row` (same key order as fullCrawl.py writes)"""
+        c = self.comments[row]
+        p = self.posts[c["post"]]
+        start = int(c["text_start"])
+        created = int(c["created"])
+        record = {"id": self.string(c["id"]),
+                  "text": self.texts[start:start + int(c["text_len"])].decode("utf-8")}
+        timestamp = decode_epoch(created) if created >= 0 else self.string(-created - 1)
+        if timestamp is not None:
+            record["timestamp"] = timestamp
+        if c["source"] != NONE:
+            record["source"] = self.string(c["source"])
+        meta = {}
+        for key, ref in (("subreddit", p["subreddit"]), ("post_title", p["title"]), ("url", p["url"]),
+                         ("parent_id", c["parent"])):
+            if ref != NONE:
+                meta[key] = self.string(ref)
+        record["metadata"] = meta
+        return record
+
+    def comment(self, comment_id):
+        row = self.comment_row(comment_id)
+        return None if row is None else self.record(row)
+
+    def post(self, post_id):
+        row = self.post_row(post_id)
+        if row is None:
+            return None
+        p = self.posts[row]
+        return {"id": post_id, "subreddit": self.string(p["subreddit"]), "post_title": self.string(p["title"]),
+                "url": self.string(p["url"]), "num_comments": int(p["count"])}
+
+    def post_comments(self, post_id):
+        row = self.post_row(post_id)
+        if row is None:
+            return []
+        p = self.posts[row]
+        first = int(p["first"])
+        return [self.record(int(r)) for r in self.post_rows[first:first + int(p["count"])]]
+
+    def iter_records(self):
+        """(file subreddit, record) for every comment in the original order"""
+        for row in range(len(self.comments)):
+            yield self.string(self.comments[row]["file"]), self.record(row)
+
+    def export_jsonl(self, output_folder):
+        """Write <sub>_all.jsonl files in the original record shape and order"""
+        os.makedirs(output_folder, exist_ok=True)
+        handles = {}
+        try:
+            for sub, record in self.iter_records():
+                if sub not in handles:
+                    handles[sub] = open(os.path.join(output_folder, f"{sub}_all.jsonl"), "w", encoding="utf-8")
+                handles[sub].write(json.dumps(record, ensure_ascii=False) + "\n")
+        finally:
+            for f in handles.values():
+                f.close()
+        print(f"✅ Exported {len(self):,} comments to {output_folder}/ ({', '.join(sorted(handles))})")
+
+    def size_report(self):
+        store_bytes = sum(os.path.getsize(os.path.join(self.folder, name)) for name in os.listdir(self.folder))
+        with open(os.path.join(self.folder, "meta.json"), "r", encoding="utf-8") as f:
+            input_bytes = json.load(f).get("input_bytes", 0)
+        line = f"{len(self.comments):,} comments, {len(self.posts):,} posts: {store_bytes / 1e6:.2f} MB"
+        if input_bytes:
+            line += f" (JSONL was {input_bytes / 1e6:.2f} MB, {store_bytes / input_bytes:.0%})"
+        return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compact memory-mapped store of the crawled comments")
+    parser.add_argument("command", choices=["build", "get", "export", "stats"])
+    parser.add_argument("ids", nargs="*", help="comment or post ids for 'get'")
+    parser.add_argument("--input", default=INPUT_FOLDER, help="JSONL folder for 'build'")
+    parser.add_argument("--store", default=STORE_FOLDER)
+    parser.add_argument("--output", default="jsonl_export", help="folder for 'export'")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        print(build_store(args.input, args.store).size_report())
+    else:
+        store = CorpusStore(args.store)
+        if args.command == "stats":
+            print(store.size_report())
+        elif args.command == "export":
+            store.export_jsonl(args.output)
+        for key in args.ids if args.command == "get" else []:
+            found = store.comment(key)
+            if found is None and store.post(key) is not None:
+                found = dict(store.post(key), comments=store.post_comments(key))
+            print(json.dumps(found, ensure_ascii=False, indent=2) if found else f"{key}: not found")
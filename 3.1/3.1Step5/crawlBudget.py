@@ -0,0 +1,183 @@
+import math
+from collections import Counter, defaultdict
+
+from moreChildren import MORECHILDREN_BATCH
+
+# Crawl budget allocator for fullCrawl.py. Instead of crawling every keyword's biggest
+# threads first (a few megathreads end up being most of the corpus), all subreddit x
+# keyword cells are searched up front and their posts are crawled in order of
+#   expected relevant comments / HTTP calls needed
+# using only the search listing:
+#   - calls      = 1 thread fetch + one morechildren call per 100 comments past the first batch,
+#                  with the thread capped at MAX_COMMENTS_PER_POST comments
+#   - relevant   = capped comments x rate, rate = share of a thread that lands in Sheet 3:
+#                  nearly all of it if the title has the three-sheet keywords, else the share of
+#                  comments with the keywords themselves (12% in the current corpus)
+#   - every cell stops at CELL_SHARE of the comment target, so no keyword/subreddit dominates
+# After each thread the cell's observed/expected ratio is folded in (smoothed by PRIOR_WEIGHT)
+# and the queue is re-ranked, so cells that under-deliver sink.
+# The crawl stops once the Step 4 minimum (10k comments / 100k words, counted over
+# relevant comments) is reached. Per-cell totals (comments, words, requests incl. searches)
+# are kept in crawl_state.sqlite and seeded back in, so targets and CELL_SHARE hold for the
+# whole corpus across runs, not per run.
+
+TARGET_COMMENTS = 10000
+TARGET_WORDS = 100000
+CELL_SHARE = 0.25            # max share of TARGET_COMMENTS one sub x keyword cell may contribute
+MAX_COMMENTS_PER_POST = 500  # comments taken from one thread (None = all of them)
+FIRST_BATCH = 200            # comments a thread fetch returns before the "more" stubs start
+
+DELETED_RATIO = 0.1          # [deleted]/[removed] share of num_comments
+TITLE_MATCH_RATE = 1 - DELETED_RATIO
+COMMENT_MATCH_RATE = 0.12
+PRIOR_WEIGHT = 50            # expected comments worth of trust in the priors before a cell's own data wins
+
+
+def max_more_calls(cap=MAX_COMMENTS_PER_POST):
+    """morechildren calls needed to reach cap comments (None = unlimited)"""
+    if cap is None:
+        return None
+    return math.ceil(max(0, cap - FIRST_BATCH) / MORECHILDREN_BATCH)
+
+
+def estimate_calls(num_comments, cap=MAX_COMMENTS_PER_POST):
+    """HTTP calls to fetch a thread of num_comments (capped at cap)"""
+    n = num_comments if cap is None else min(num_comments, cap)
+    return 1 + math.ceil(max(0, n - FIRST_BATCH) / MORECHILDREN_BATCH)
+
+
+class CrawlBudget:
+    """
+    budget = CrawlBudget(title_matches)          # title_matches(title) -> bool
+    budget.seed(state.cell_totals())             # earlier runs
+    budget.add_cell((sub, kw), [post_data, ...])  # every search listing first
+    while not budget.done():
+        for cell, post_data in budget.next_wave(8):
+            ... fetch ...
+            stats = budget.record(cell, post_data, calls, relevant, words)
+            state.record_post(..., cell=cell, cell_stats=stats)
+    """
+
+    def __init__(self, title_matches, target_comments=TARGET_COMMENTS, target_words=TARGET_WORDS,
+                 cell_share=CELL_SHARE, cap=MAX_COMMENTS_PER_POST):
+        self.title_matches = title_matches
+        self.target_comments = target_comments
+        self.target_words = target_words
+        self.cell_limit = None if cell_share is None else cell_share * target_comments
+        self.cap = cap
+        self.queue = []                    # [(cell, post_data)] not crawled yet
+        self.queued_ids = set()
+        self.cells = set()
+        self.expected = Counter()          # cell -> expected relevant of its crawled posts
+        self.observed = Counter()          # cell -> relevant comments it really gave
+        self.cell_words = Counter()
+        self.cell_calls = Counter()
+        self.comments = 0                  # relevant comments / words / requests over every run
+        self.words = 0
+        self.calls = 0
+        self.crawled = defaultdict(int)    # cell -> posts crawled
+        self.run_comments = 0              # this run only
+        self.run_calls = 0
+
+    def seed(self, cell_totals):
+        """Start from the totals of earlier runs (CrawlState.cell_totals())"""
+        for cell, t in cell_totals.items():
+            self.observed[cell] += t["relevant"]
+            self.expected[cell] += t["expected"]
+            self.cell_words[cell] += t["words"]
+            self.cell_calls[cell] += t["calls"]
+            self.crawled[cell] += t["posts"]
+            self.comments += t["relevant"]
+            self.words += t["words"]
+            self.calls += t["calls"]
+
+    # --- Planning ---
+    def add_cell(self, cell, posts):
+        """Queue a cell's posts (a post already queued under another cell stays there)"""
+        self.cells.add(cell)
+        for post_data in posts:
+            if post_data["id"] not in self.queued_ids:
+                self.queued_ids.add(post_data["id"])
+                self.queue.append((cell, post_data))
+
+    def prior_rate(self, post_data):
+        return TITLE_MATCH_RATE if self.title_matches(post_data.get("title", "")) else COMMENT_MATCH_RATE
+
+    def cell_factor(self, cell):
+        """How the cell has delivered against its estimate so far (1.0 before any data)"""
+        return (PRIOR_WEIGHT + self.observed[cell]) / (PRIOR_WEIGHT + self.expected[cell])
+
+    def expected_relevant(self, cell, post_data):
+        n = post_data.get("num_comments", 0)
+        if self.cap is not None:
+            n = min(n, self.cap)
+        return n * self.prior_rate(post_data) * self.cell_factor(cell)
+
+    def priority(self, cell, post_data):
+        return self.expected_relevant(cell, post_data) / estimate_calls(post_data.get("num_comments", 0), self.cap)
+
+    def cell_open(self, cell):
+        return self.cell_limit is None or self.observed[cell] < self.cell_limit
+
+    # --- Crawling ---
+    def done(self):
+        return self.comments >= self.target_comments and self.words >= self.target_words
+
+    def next_wave(self, size):
+        """
+        Up to size best posts of open cells, taken off the queue. Within one wave a cell
+        only gets as many posts as its remaining share is expected to need.
+        """
+        self.queue = [(c, p) for c, p in self.queue if self.cell_open(c)]
+        self.queue.sort(key=lambda item: self.priority(*item), reverse=True)
+        wave, rest = [], []
+        planned = Counter()
+        for cell, post_data in self.queue:
+            room = None if self.cell_limit is None else self.cell_limit - self.observed[cell] - planned[cell]
+            if len(wave) >= size or (room is not None and room <= 0):
+                rest.append((cell, post_data))
+                continue
+            wave.append((cell, post_data))
+            planned[cell] += self.expected_relevant(cell, post_data)
+        self.queue = rest
+        return wave
+
+    def record(self, cell, post_data, calls, relevant, words):
+        """
+        Result of one crawled post: requests it really took, relevant comments written and
+        their words. Returns the cell_stats to persist with CrawlState.record_post.
+        """
+        expected = self.expected_relevant(cell, post_data)
+        self.expected[cell] += expected
+        self.observed[cell] += relevant
+        self.cell_words[cell] += words
+        self.crawled[cell] += 1
+        self.comments += relevant
+        self.words += words
+        self.run_comments += relevant
+        self.record_requests(cell, calls)
+        return {"relevant": relevant, "words": words, "expected": expected, "calls": calls}
+
+    def record_requests(self, cell, calls):
+        """Requests that don't come with comments: the cell's search, a failed fetch"""
+        self.cell_calls[cell] += calls
+        self.calls += calls
+        self.run_calls += calls
+
+    def finished_cells(self):
+        """Cells whose every post got crawled (not the ones cut off by their share)"""
+        queued = {cell for cell, _ in self.queue}
+        return {cell for cell in self.cells if cell not in queued and self.cell_open(cell)}
+
+    def summary(self):
+        lines = [f"Budget (all runs): {self.comments:,}/{self.target_comments:,} relevant comments, "
+                 f"{self.words:,}/{self.target_words:,} words in {self.calls:,} requests "
+                 f"({self.comments / max(self.calls, 1):.1f} comments/request), {len(self.queue)} posts left in the queue",
+                 f"This run: {self.run_comments:,} relevant comments in {self.run_calls:,} requests"]
+        for cell in sorted(set(self.crawled) | set(self.cell_calls), key=lambda c: -self.observed[c]):
+            share = self.observed[cell] / max(self.comments, 1) * 100
+            lines.append(f"  r/{cell[0]} '{cell[1]}': {self.crawled[cell]} posts, "
+                         f"{self.observed[cell]:,} comments ({share:.0f}%), {self.cell_words[cell]:,} words, "
+                         f"{self.cell_calls[cell]:,} requests"
+                         + ("" if self.cell_open(cell) else " [share reached]"))
+        return "\n".join(lines)
@@ -0,0 +1,203 @@
+import json
+import os
+import sqlite3
+import time
+
+# Crawl state backend shared by fullCrawl.py and fullCrawlManual.py.
+# Replaces seen_posts.json / crawl_progress.json / post_watermarks.json, which were
+# re-read and fully rewritten after every post (O(n) per post, corrupt if killed
+# mid-write, unsafe with two crawlers). Here every update is one small SQLite
+# transaction, and WAL mode lets several worker processes share the same file.
+
+STATE_DB = "crawl_state.sqlite"
+
+# Legacy files, imported once when the database is first created
+LEGACY_SEEN_POSTS_FILE = "seen_posts.json"
+LEGACY_PROGRESS_FILE = "crawl_progress.json"
+LEGACY_WATERMARKS_FILE = "post_watermarks.json"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS seen_posts (
+    post_id TEXT PRIMARY KEY,
+    seen_at REAL
+);
+CREATE TABLE IF NOT EXISTS watermarks (
+    post_id TEXT PRIMARY KEY,
+    num_comments INTEGER,
+    last_created_utc REAL
+);
+CREATE TABLE IF NOT EXISTS completed_keywords (
+    key TEXT PRIMARY KEY,
+    completed_at REAL
+);
+CREATE TABLE IF NOT EXISTS totals (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS cell_totals (
+    subreddit TEXT,
+    keyword TEXT,
+    posts INTEGER NOT NULL DEFAULT 0,
+    relevant INTEGER NOT NULL DEFAULT 0,
+    words INTEGER NOT NULL DEFAULT 0,
+    expected REAL NOT NULL DEFAULT 0,
+    calls INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (subreddit, keyword)
+);
+"""
+
+
+class CrawlState:
+    """
+    Seen posts, per-post watermarks, completed subreddit_keyword pairs, running totals
+    and the crawl budget's per-cell totals (crawlBudget.py), so a resumed run picks up
+    where the last one stopped.
+    Open one CrawlState per process/worker; they can all point at the same file.
+    """
+
+    def __init__(self, db_file=STATE_DB, import_legacy=True):
+        # isolation_level=None -> we control transactions explicitly with BEGIN IMMEDIATE
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+        if import_legacy:
+            self.import_legacy_json()
+
+    def _write(self, statements):
+        """Run (sql, args) pairs as one durable transaction, returns the last cursor"""
+        cur = None
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, args in statements:
+                cur = self.conn.execute(sql, args)
+            self.conn.execute("COMMIT")
+            return cur
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def close(self):
+        self.conn.close()
+
+    # --- Seen posts ---
+    def is_seen(self, post_id):
+        return self.conn.execute("SELECT 1 FROM seen_posts WHERE post_id = ?", (post_id,)).fetchone() is not None
+
+    def seen_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM seen_posts").fetchone()[0]
+
+    def seen_posts(self):
+        return {row[0] for row in self.conn.execute("SELECT post_id FROM seen_posts")}
+
+    def claim_post(self, post_id):
+        """Mark a post as seen; False if it already was (another worker got it first)"""
+        cur = self._write([("INSERT OR IGNORE INTO seen_posts VALUES (?, ?)", (post_id, time.time()))])
+        return cur.rowcount == 1
+
+    def mark_seen(self, post_ids):
+        now = time.time()
+        self._write([("INSERT OR IGNORE INTO seen_posts VALUES (?, ?)", (pid, now)) for pid in post_ids])
+
+    # --- Watermarks (incremental re-crawl) ---
+    def get_watermark(self, post_id):
+        row = self.conn.execute(
+            "SELECT num_comments, last_created_utc FROM watermarks WHERE post_id = ?", (post_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        return {"num_comments": row[0], "last_created_utc": row[1]}
+
+    def watermark_count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM watermarks").fetchone()[0]
+
+    # --- Completed subreddit/keyword pairs ---
+    def is_keyword_done(self, key):
+        return self.conn.execute("SELECT 1 FROM completed_keywords WHERE key = ?", (key,)).fetchone() is not None
+
+    def mark_keyword_done(self, key):
+        self._write([("INSERT OR IGNORE INTO completed_keywords VALUES (?, ?)", (key, time.time()))])
+
+    # --- Running totals ---
+    def totals(self):
+        values = dict(self.conn.execute("SELECT name, value FROM totals"))
+        return {"total_comments": values.get("total_comments", 0), "total_words": values.get("total_words", 0)}
+
+    def _add_totals_sql(self, comments, words):
+        sql = "INSERT INTO totals VALUES (?, ?) ON CONFLICT(name) DO UPDATE SET value = value + excluded.value"
+        return [(sql, ("total_comments", comments)), (sql, ("total_words", words))]
+
+    def add_totals(self, comments, words):
+        self._write(self._add_totals_sql(comments, words))
+
+    def record_post(self, post_id, comments, words, watermark=None, cell=None, cell_stats=None):
+        """
+        Everything that changes after one post is crawled, committed together.
+        cell_stats (relevant/words/expected/calls, from CrawlBudget.record) is added to cell's totals.
+        """
+        statements = [("INSERT OR IGNORE INTO seen_posts VALUES (?, ?)", (post_id, time.time()))]
+        if watermark is not None:
+            statements.append((
+                "INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                (post_id, watermark["num_comments"], watermark["last_created_utc"]),
+            ))
+        statements += self._add_totals_sql(comments, words)
+        if cell_stats is not None:
+            statements.append(self._add_cell_sql(cell, posts=1, **cell_stats))
+        self._write(statements)
+
+    # --- Crawl budget per sub x keyword cell ---
+    def _add_cell_sql(self, cell, posts=0, relevant=0, words=0, expected=0.0, calls=0):
+        sql = ("INSERT INTO cell_totals VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(subreddit, keyword) DO UPDATE SET "
+               "posts = posts + excluded.posts, relevant = relevant + excluded.relevant, "
+               "words = words + excluded.words, expected = expected + excluded.expected, "
+               "calls = calls + excluded.calls")
+        return sql, (cell[0], cell[1], posts, relevant, words, expected, calls)
+
+    def add_cell_calls(self, cell, calls):
+        """Requests that produced no post (searches, failed fetches) still count for the cell"""
+        self._write([self._add_cell_sql(cell, calls=calls)])
+
+    def cell_totals(self):
+        """(subreddit, keyword) -> {posts, relevant, words, expected, calls} over every run"""
+        rows = self.conn.execute("SELECT subreddit, keyword, posts, relevant, words, expected, calls FROM cell_totals")
+        return {(sub, kw): {"posts": posts, "relevant": relevant, "words": words, "expected": expected, "calls": calls}
+                for sub, kw, posts, relevant, words, expected, calls in rows}
+
+    # --- Migration ---
+    def import_legacy_json(self, seen_file=LEGACY_SEEN_POSTS_FILE, progress_file=LEGACY_PROGRESS_FILE,
+                           watermarks_file=LEGACY_WATERMARKS_FILE):
+        statements = []
+        now = time.time()
+        if os.path.exists(seen_file):
+            with open(seen_file, "r") as f:
+                statements += [("INSERT OR IGNORE INTO seen_posts VALUES (?, ?)", (pid, now)) for pid in json.load(f)]
+        if os.path.exists(watermarks_file):
+            with open(watermarks_file, "r") as f:
+                statements += [
+                    ("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)",
+                     (pid, m["num_comments"], m["last_created_utc"]))
+                    for pid, m in json.load(f).items()
+                ]
+        if os.path.exists(progress_file):
+            with open(progress_file, "r") as f:
+                progress = json.load(f)
+            statements += [("INSERT OR IGNORE INTO completed_keywords VALUES (?, ?)", (key, now))
+                           for key in progress.get("completed_keywords", [])]
+            statements += self._add_totals_sql(progress.get("total_comments", 0), progress.get("total_words", 0))
+        if not statements:
+            return
+
+        # Only into an empty database, checked inside the write lock so two workers
+        # starting at the same time don't both import (and double the totals)
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self.conn.execute("SELECT COUNT(*) FROM totals").fetchone()[0] == 0 and self.seen_count() == 0:
+                for sql, args in statements:
+                    self.conn.execute(sql, args)
+                print(f"Imported legacy crawl state from JSON ({len(statements)} entries)")
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
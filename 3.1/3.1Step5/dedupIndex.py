@@ -0,0 +1,228 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from collections import Counter
+
+import numpy as np
+
+# Persistent comment index, checked *before* a comment is written anywhere, so the
+# corpus never holds the same comment twice (today Sheet 3's drop_duplicates is
+# the first place duplicates get removed, and every count before it is inflated).
+# Duplicates come from:
+#   - a crawl killed after appending a thread but before record_post (re-fetched next run)
+#   - the same thread found under two subreddits / keywords
+#   - obtainJsonl.py's manually saved threads overlapping the full crawl
+# Optionally also near-duplicates: copy-pasted comments with a different id. Each
+# comment of NEAR_DUP_MIN_WORDS+ words gets a 64-bit SimHash; two comments count as
+# the same text when their hashes differ in at most max_distance bits. Lookups use
+# 4 bands of 16 bits - with <= 3 differing bits at least one band is identical.
+#
+#   python dedupIndex.py --build jsonl_crawl_full      -> index an existing corpus (reports dupes in it)
+#   python dedupIndex.py --stats
+
+INDEX_DB = "comment_index.sqlite"
+NEAR_DUP_MAX_DISTANCE = 3
+NEAR_DUP_MIN_WORDS = 8   # "Thanks!" / "This." repeat legitimately, don't fingerprint them
+BANDS = 4
+LOOKUP_CHUNK = 500       # ids per "IN (...)" query
+
+TOKEN = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS comments (
+    comment_id TEXT PRIMARY KEY,
+    subreddit TEXT,
+    source TEXT,
+    simhash INTEGER,
+    added_at REAL
+);
+CREATE TABLE IF NOT EXISTS simhash_bands (
+    band INTEGER,
+    value INTEGER,
+    comment_id TEXT
+);
+CREATE INDEX IF NOT EXISTS simhash_bands_lookup ON simhash_bands (band, value);
+"""
+
+
+def simhash(text):
+    """64-bit SimHash of the lowercased words (as a signed int for SQLite), None if too short"""
+    tokens = TOKEN.findall(str(text).lower())
+    if len(tokens) < NEAR_DUP_MIN_WORDS:
+        return None
+    counts = Counter(tokens)
+    digests = b"".join(hashlib.blake2b(t.encode("utf-8"), digest_size=8).digest() for t in counts)
+    bits = np.unpackbits(np.frombuffer(digests, dtype=np.uint8).reshape(-1, 8), axis=1).astype(np.int64)
+    weights = np.fromiter(counts.values(), dtype=np.int64, count=len(counts))
+    votes = weights @ (bits * 2 - 1)
+    value = int.from_bytes(np.packbits(votes > 0).tobytes(), "big")
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+def bands(fingerprint):
+    return [(b, (fingerprint >> (16 * b)) & 0xFFFF) for b in range(BANDS)]
+
+
+def hamming(a, b):
+    return ((a ^ b) & 0xFFFFFFFFFFFFFFFF).bit_count()
+
+
+class DedupIndex:
+    """
+    index = DedupIndex("comment_index.sqlite", near_dup=True)
+    keep = index.filter_new([(comment_id, text), ...])   -> positions not seen before
+    ... write those ...
+    index.add([...kept items...], subreddit, source)
+    Use ":memory:" for an index that only lives for one run (the converter does).
+    """
+
+    def __init__(self, db_file=INDEX_DB, near_dup=False, max_distance=NEAR_DUP_MAX_DISTANCE):
+        self.near_dup = near_dup
+        self.max_distance = max_distance
+        self.dropped = Counter()  # "id" / "near" -> items filtered out so far
+        # isolation_level=None -> explicit BEGIN IMMEDIATE, same as crawlState.py
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA busy_timeout=30000")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+
+    # --- Lookups ---
+    def known_ids(self, ids):
+        """The subset of ids already indexed"""
+        ids = list(ids)
+        known = set()
+        for i in range(0, len(ids), LOOKUP_CHUNK):
+            chunk = ids[i:i + LOOKUP_CHUNK]
+            sql = f"SELECT comment_id FROM comments WHERE comment_id IN ({','.join('?' * len(chunk))})"
+            known.update(row[0] for row in self.conn.execute(sql, chunk))
+        return known
+
+    def near_match(self, fingerprint):
+        """Id of an indexed comment within max_distance bits of fingerprint, or None"""
+        for band, value in bands(fingerprint):
+            rows = self.conn.execute(
+                "SELECT c.comment_id, c.simhash FROM simhash_bands b "
+                "JOIN comments c ON c.comment_id = b.comment_id WHERE b.band = ? AND b.value = ?",
+                (band, value),
+            )
+            for comment_id, other in rows:
+                if hamming(fingerprint, other) <= self.max_distance:
+                    return comment_id
+        return None
+
+    def filter_new(self, items):
+        """
+        items: (comment_id, text) pairs. Positions of the items to keep: id not indexed
+        yet, and (near_dup) text not a near copy of an indexed or earlier item. Within
+        the batch the first occurrence wins. Nothing is recorded until add().
+        """
+        items = list(items)
+        known = self.known_ids({comment_id for comment_id, _ in items})
+        batch_bands = {}  # (band, value) -> fingerprints kept earlier in this batch
+        keep = []
+        for position, (comment_id, text) in enumerate(items):
+            if comment_id in known:
+                self.dropped["id"] += 1
+                continue
+            if self.near_dup:
+                fingerprint = simhash(text)
+                if fingerprint is not None:
+                    keys = bands(fingerprint)
+                    if (any(hamming(fingerprint, other) <= self.max_distance
+                            for key in keys for other in batch_bands.get(key, ()))
+                            or self.near_match(fingerprint) is not None):
+                        self.dropped["near"] += 1
+                        continue
+                    for key in keys:
+                        batch_bands.setdefault(key, []).append(fingerprint)
+            known.add(comment_id)
+            keep.append(position)
+        return keep
+
+    # --- Updates ---
+    def add(self, items, subreddit=None, source=None):
+        """Index (comment_id, text) pairs in one transaction (ids already present are left alone)"""
+        now = time.time()
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            for comment_id, text in items:
+                fingerprint = simhash(text) if self.near_dup else None
+                cur = self.conn.execute("INSERT OR IGNORE INTO comments VALUES (?, ?, ?, ?, ?)",
+                                        (comment_id, subreddit, source, fingerprint, now))
+                if cur.rowcount == 1 and fingerprint is not None:
+                    self.conn.executemany("INSERT INTO simhash_bands VALUES (?, ?, ?)",
+                                          [(band, value, comment_id) for band, value in bands(fingerprint)])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+
+    def claim_new(self, items, subreddit=None, source=None):
+        """filter_new + add of the kept items, for callers that write right after"""
+        items = list(items)
+        keep = self.filter_new(items)
+        self.add([items[i] for i in keep], subreddit, source)
+        return keep
+
+    # --- Seeding from an existing corpus ---
+    def import_jsonl_folder(self, folder, batch_size=5000):
+        """Index every <sub>_all.jsonl in folder; returns how many records were duplicates"""
+        dropped_before = sum(self.dropped.values())
+        for name in sorted(os.listdir(folder)):
+            if not name.endswith("_all.jsonl"):
+                continue
+            sub = name[:-len("_all.jsonl")]
+            batch = []
+            with open(os.path.join(folder, name), "r", encoding="utf-8") as f:
+                for line_num, line in enumerate(f):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    # same fallback id as convertAllJsonlToParquet.iter_comment_rows
+                    batch.append((record.get("id", f"{sub}_{line_num}"), record.get("text", "")))
+                    if len(batch) >= batch_size:
+                        self.claim_new(batch, sub, name)
+                        batch = []
+            if batch:
+                self.claim_new(batch, sub, name)
+        return sum(self.dropped.values()) - dropped_before
+
+    def stats_line(self):
+        line = f"Dedup index: {self.count():,} comments"
+        if self.dropped:
+            line += f", dropped {self.dropped['id']:,} repeated ids"
+            if self.near_dup:
+                line += f" + {self.dropped['near']:,} near-duplicate texts"
+        return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build or inspect the global comment dedup index")
+    parser.add_argument("--db", default=INDEX_DB)
+    parser.add_argument("--build", metavar="FOLDER", help="index every <sub>_all.jsonl in FOLDER")
+    parser.add_argument("--near-dup", action="store_true", help="also fingerprint texts for near-duplicates")
+    parser.add_argument("--stats", action="store_true")
+    args = parser.parse_args()
+
+    index = DedupIndex(args.db, near_dup=args.near_dup)
+    if args.build:
+        start = time.time()
+        dupes = index.import_jsonl_folder(args.build)
+        print(f"Indexed {args.build} in {time.time() - start:.1f}s, {dupes:,} duplicate records already in it")
+    print(index.stats_line())
+    if args.stats:
+        for sub, n in index.conn.execute("SELECT subreddit, COUNT(*) FROM comments GROUP BY subreddit"):
+            print(f"  {sub}: {n:,}")
+    index.close()
@@ -1,18 +1,29 @@
 import pandas as pd
 import json
 
-# Load your Excel file
-df = pd.read_excel("ai_filtered_three_sheets.xlsx", sheet_name="All_Unique_Comments(1)")
+from bm25Rank import rank_comments, top_k
 
-# Select only the two columns you want
-# Adjust the column names if your Excel file uses different headers
-df = df[['post_title', 'comment_text']]
+def export_two_columns(input_file="ai_filtered_three_sheets.xlsx", output_file="sample_comments.json",
+                       sheet_name="All_Unique_Comments", top=None):
+    # Load your Excel file
+    df = pd.read_excel(input_file, sheet_name=sheet_name)
 
-# Convert to a list of dicts
-records = df.to_dict(orient='records')
+    # Only the `top` comments ranking highest for the AI-hiring query, best first (bm25Rank.py)
+    if top:
+        df = top_k(rank_comments(df), top)
 
-# Save to JSON
-with open("sample_comments.json", "w", encoding="utf-8") as f:
-    json.dump(records, f, ensure_ascii=False, indent=2)
+    # Select only the two columns you want
+    # Adjust the column names if your Excel file uses different headers
+    df = df[['post_title', 'comment_text']]
 
-print(f"Saved {len(records)} records to sample_comments.json")
+    # Convert to a list of dicts
+    records = df.to_dict(orient='records')
+
+    # Save to JSON
+    with open(output_file, "w", encoding="utf-8") as f:
+        json.dump(records, f, ensure_ascii=False, indent=2)
+
+    print(f"Saved {len(records)} records to {output_file}")
+
+if __name__ == "__main__":
+    export_two_columns()
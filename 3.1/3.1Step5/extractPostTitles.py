@@ -1,16 +1,10 @@
-import pandas as pd
+from commentsIO import list_columns, load_comments
 
-def extract_unique_post_titles_from_excel(input_file="all_raw_comments.xlsx", output_file="unique_post_titles.xlsx"):
-    
-    print(f"Loading {input_file}...")
-    
-    # Load the Excel file
-    df = pd.read_excel(input_file)
-    
-    print(f"Loaded {len(df):,} total comments")
+def extract_unique_post_titles_from_excel(input_file="all_raw_comments.parquet", output_file="unique_post_titles.xlsx"):
+    """input_file can be .parquet, .feather, .xlsx or the jsonl_crawl_full folder"""
     
     # Check what columns you have (uncomment if unsure)
-    # print("Columns in your file:", df.columns.tolist())
+    # print("Columns in your file:", list_columns(input_file))
     
     # Adjust column names based on your actual Excel columns
     # Your columns might be named differently - check and adjust!
@@ -23,13 +17,20 @@ def extract_unique_post_titles_from_excel(input_file="all_raw_comments.xlsx", ou
     # Find actual column names
     actual_columns = {}
     for key, possible_names in expected_columns.items():
-        for col in df.columns:
+        for col in list_columns(input_file):
             if col.lower() in [name.lower() for name in possible_names]:
                 actual_columns[key] = col
                 break
     
     print(f"\nDetected columns: {actual_columns}")
     
+    # Load only the columns used below
+    print(f"Loading {input_file}...")
+    needed = list(dict.fromkeys(list(actual_columns.values()) + ['comment_text']))
+    df = load_comments(input_file, columns=needed)
+    
+    print(f"Loaded {len(df):,} total comments")
+    
     # Get unique posts with comment counts
     unique_posts = df.groupby([actual_columns['post_title'], 
                                actual_columns['post_url'], 
@@ -80,10 +81,10 @@ def extract_unique_post_titles_from_excel(input_file="all_raw_comments.xlsx", ou
     print("Send me the file when you're done and I'll help filter your 50k comments!")
 
 # Alternative: If you just want a quick look without saving
-def preview_unique_posts(input_file="all_raw_comments.xlsx", n=20):
+def preview_unique_posts(input_file="all_raw_comments.parquet", n=20):
     """Preview first n unique posts without saving"""
     
-    df = pd.read_excel(input_file)
+    df = load_comments(input_file, columns=['post_title', 'subreddit'])
     
     # Get unique posts with counts
     unique = df.groupby(['post_title', 'subreddit']).size().reset_index(name='comment_count')
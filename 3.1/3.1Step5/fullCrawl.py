@@ -1,10 +1,21 @@
+import asyncio
 import requests
 import json
 import os
+import sys
 import time
 from datetime import datetime
 from collections import defaultdict
 
+from asyncCrawl import HostLimiter, crawl_comments_async
+from crawlBudget import CrawlBudget, max_more_calls
+from crawlState import CrawlState
+from dedupIndex import DedupIndex
+from invertedIndex import update_index
+from moreChildren import expand_more
+from obtainAIrelatedPostPlusCommentsV2 import build_three_sheet_matcher, has_keywords
+from redditFetch import cached_get, request_counts
+
 # --- Configuration ---
 subreddits = [
 
@@ -44,37 +55,97 @@ os.makedirs(OUTPUT_FOLDER, exist_ok=True)
 
 # Delays
 REQUEST_DELAY_SEARCH = 2.0
-REQUEST_DELAY_COMMENTS = 3.0
+REQUEST_DELAY_COMMENTS = 3.0  # only used in sequential mode
+
+# Crawl mode
+# "async" = fetch comments concurrently under a token-bucket rate limiter (asyncCrawl.py)
+# "sequential" = old behaviour, one post at a time with fixed sleeps
+CRAWL_MODE = "async"
+MAX_IN_FLIGHT = 4
+
+# Resolve "more" stubs through /api/morechildren (100 ids per call) so each fetched
+# post yields all of its comments instead of only the first batch
+EXPAND_MORE = True
+
+# Point at a local stand-in (mockRedditServer.py) with REDDIT_BASE_URL=http://127.0.0.1:8765
+BASE_URL = os.environ.get("REDDIT_BASE_URL", "https://www.reddit.com")
+MORECHILDREN_URL = f"{BASE_URL}/api/morechildren.json"
+
+# Targets (the Step 4 minimum), counted over relevant comments: the ones Sheet 3 keeps
+# (post title or comment text has the three-sheet keywords)
+TARGET_COMMENTS = 10000
+TARGET_WORDS = 100000
+
+# Crawl budget (crawlBudget.py): every sub x keyword cell is searched first, then posts
+# are crawled in order of expected relevant comments per request, in waves of WAVE_SIZE,
+# until the targets are met. One cell gives at most CELL_SHARE of TARGET_COMMENTS and
+# one post at most MAX_COMMENTS_PER_POST comments (None = no cap, the old behaviour)
+CELL_SHARE = 0.25
+MAX_COMMENTS_PER_POST = 500
+WAVE_SIZE = 8
 
-# Targets
-TARGET_COMMENTS = 70000
-TARGET_WORDS = 600000
+# Seen posts, watermarks, completed keywords and running totals live in an SQLite
+# file (crawlState.py); seen_posts.json / crawl_progress.json are imported on first run
+STATE_DB = "crawl_state.sqlite"
 
-# Track seen posts to avoid duplicates
-SEEN_POSTS_FILE = "seen_posts.json"
+# Incremental re-crawl: seen posts are re-fetched only if their num_comments in the
+# search results grew past the high-water mark stored when they were last crawled,
+# and only comment ids not already in <sub>_all.jsonl get appended
+INCREMENTAL = True
 
-# --- Load/Save Seen Posts Only ---
-def load_seen_posts():
-    if os.path.exists(SEEN_POSTS_FILE):
-        with open(SEEN_POSTS_FILE, 'r') as f:
-            return set(json.load(f))
-    return set()
+# Global comment index (dedupIndex.py): a comment already in any <sub>_all.jsonl is
+# never appended again. Seeded from OUTPUT_FOLDER on the first run.
+# NEAR_DUP also drops copy-pasted texts under a different id (SimHash, slower)
+DEDUP_DB = "comment_index.sqlite"
+NEAR_DUP = False
 
-def save_seen_posts(seen_posts):
-    """Append new seen posts to the existing JSON file without overwriting."""
-    existing = set()
-    if os.path.exists(SEEN_POSTS_FILE):
-        with open(SEEN_POSTS_FILE, 'r') as f:
-            existing = set(json.load(f))
-    all_seen = existing.union(seen_posts)
-    with open(SEEN_POSTS_FILE, 'w') as f:
-        json.dump(list(all_seen), f)
+# Search index (invertedIndex.py) caught up with the new lines after the crawl, None to skip
+SEARCH_INDEX = "comment_search.sqlite"
+
+def load_comment_ids(output_file):
+    """Ids of every comment already written to a subreddit JSONL file"""
+    ids = set()
+    if os.path.exists(output_file):
+        with open(output_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    ids.add(json.loads(line)["id"])
+                except (json.JSONDecodeError, KeyError):
+                    continue
+    return ids
+
+def needs_refresh(post_data, state):
+    """
+    Seen post is worth re-fetching only if it gained comments since the last crawl,
+    and wasn't already at MAX_COMMENTS_PER_POST (the capped fetch would only see the
+    comments it has already given)
+    """
+    mark = state.get_watermark(post_data["id"])
+    if mark is None:
+        return True  # crawled before watermarks existed, refetch once to record one
+    if MAX_COMMENTS_PER_POST is not None and mark["num_comments"] >= MAX_COMMENTS_PER_POST:
+        return False
+    return post_data.get("num_comments", 0) > mark["num_comments"]
+
+def last_comment_utc(input_json):
+    """Newest created_utc in a thread (0 if it has no comments)"""
+    latest = 0
+    stack = list(input_json[1]["data"]["children"]) if input_json and len(input_json) > 1 else []
+    while stack:
+        comment = stack.pop()
+        if comment["kind"] != "t1":
+            continue
+        c = comment["data"]
+        latest = max(latest, c.get("created_utc", 0))
+        if c.get("replies") and isinstance(c["replies"], dict):
+            stack.extend(c["replies"]["data"]["children"])
+    return latest
 
 
 # --- Fetch functions ---
-def fetch_posts(subreddit, keyword, limit=100):
-    """Fetch posts sorted by relevance, then locally by comment count"""
-    url = f"https://www.reddit.com/r/{subreddit}/search.json"
+def fetch_posts(subreddit, keyword, limit=100, max_age=None):
+    """Fetch posts sorted by relevance, then locally by comment count (max_age: see cached_get)"""
+    url = f"{BASE_URL}/r/{subreddit}/search.json"
     headers = {"User-Agent": "Mozilla/5.0 (RedditCrawler/0.1 by YourUsername)"}
     
     # Fetch more than needed to allow for sorting
@@ -88,7 +159,7 @@ def fetch_posts(subreddit, keyword, limit=100):
     }
     
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=10)
+        r = cached_get(url, headers=headers, params=params, timeout=10, max_age=max_age)
         if r.status_code != 200:
             print(f"Failed to fetch posts ({subreddit}, '{keyword}'): {r.status_code}")
             return []
@@ -108,8 +179,20 @@ def fetch_posts(subreddit, keyword, limit=100):
     except Exception as e:
         print(f"Error fetching posts ({subreddit}, '{keyword}'): {e}")
         return []
+
+def api_url(post_url):
+    """Public post url -> url we actually request (differs only when BASE_URL is overridden)"""
+    return post_url.replace("https://www.reddit.com", BASE_URL, 1)
     
-def fetch_comments(post_url, max_retries=5):
+def fetch_comments(post_url, max_retries=5, max_age=None):
+    return fetch_json(f"{api_url(post_url)}.json", max_retries=max_retries, max_age=max_age)
+
+def fetch_more_json(url, params):
+    """morechildren call for the sequential mode, paced like a comment fetch"""
+    time.sleep(REQUEST_DELAY_COMMENTS)
+    return fetch_json(url, params)
+
+def fetch_json(url, params=None, max_retries=5, max_age=None):
     headers = {
         "User-Agent": "Mozilla/5.0 (compatible; SC4021Crawler/1.0; contact=edu)"
     }
@@ -117,7 +200,7 @@ def fetch_comments(post_url, max_retries=5):
     delay = 10
     for attempt in range(max_retries):
         try:
-            r = requests.get(f"{post_url}.json", headers=headers, timeout=15)
+            r = cached_get(url, params=params, headers=headers, timeout=15, max_age=max_age)
             
             if r.status_code == 200:
                 return r.json()
@@ -162,8 +245,44 @@ def fetch_comments(post_url, max_retries=5):
     print(f"Max retries ({max_retries}) exceeded. Skipping this post.")
     return None
 
-def process_comments_to_jsonl(input_json, post_url, output_file):
-    """Extract comments and append to subreddit-level JSONL file"""
+def kept_comments(children, lost=None):
+    """
+    Comments the crawl keeps, in Reddit's order: a [deleted]/[removed] comment is skipped
+    together with its replies. lost (a list) gets the size of every skipped subtree.
+    """
+    for comment in children:
+        if comment["kind"] != "t1":
+            continue
+        c = comment["data"]
+        replies = c["replies"]["data"]["children"] if c.get("replies") and isinstance(c["replies"], dict) else []
+        if c.get("body") in ["[deleted]", "[removed]"]:
+            if lost is not None:
+                lost.append(1 + sum(1 for _ in all_comments(replies)))
+            continue
+        yield c
+        yield from kept_comments(replies, lost)
+
+
+def all_comments(children):
+    for comment in children:
+        if comment["kind"] == "t1":
+            yield comment["data"]
+            replies = comment["data"].get("replies")
+            if replies and isinstance(replies, dict):
+                yield from all_comments(replies["data"]["children"])
+
+
+def process_comments_to_jsonl(input_json, post_url, output_file, skip_ids=None, dedup=None,
+                              max_comments=None, on_written=None):
+    """
+    Extract comments and append to subreddit-level JSONL file.
+    Comments whose id is in skip_ids are not written again (their replies still are),
+    and every id written is added to skip_ids.
+    With a DedupIndex, comments it already has (from any subreddit file) are dropped
+    before writing and the written ones are added to it afterwards.
+    max_comments stops after N new comments (Reddit's order; already saved ones don't count);
+    on_written(records) gets the records that were appended.
+    """
     if not input_json or len(input_json) < 2:
         return 0, 0
 
@@ -171,93 +290,191 @@ def process_comments_to_jsonl(input_json, post_url, output_file):
     subreddit = post_data["subreddit"]
     post_title = post_data["title"]
 
-    comments_count = 0
-    words_count = 0
+    records = []
+    for c in kept_comments(input_json[1]["data"]["children"]):
+        if max_comments is not None and len(records) >= max_comments:
+            break
+        if skip_ids is not None and c["id"] in skip_ids:
+            continue
+        records.append({
+            "id": c["id"],
+            "text": c.get("body", ""),
+            "timestamp": datetime.utcfromtimestamp(c["created_utc"]).isoformat() + "Z",
+            "source": "reddit",
+            "metadata": {
+                "subreddit": subreddit,
+                "post_title": post_title,
+                "url": post_url,
+                "parent_id": c.get("parent_id")
+            }
+        })
+        if skip_ids is not None:
+            skip_ids.add(c["id"])
+
+    items = [(r["id"], r["text"]) for r in records]
+    if dedup is not None:
+        keep = dedup.filter_new(items)
+        records = [records[i] for i in keep]
+        items = [items[i] for i in keep]
 
     # Open in append mode
     with open(output_file, "a", encoding="utf-8") as out_f:
-        def process_comment(comment):
-            nonlocal comments_count, words_count
-            if comment["kind"] != "t1":
-                return
-            c = comment["data"]
-            if c.get("body") in ["[deleted]", "[removed]"]:
-                return
-            text = c.get("body", "")
-            record = {
-                "id": c["id"],
-                "text": text,
-                "timestamp": datetime.utcfromtimestamp(c["created_utc"]).isoformat() + "Z",
-                "source": "reddit",
-                "metadata": {
-                    "subreddit": subreddit,
-                    "post_title": post_title,
-                    "url": post_url
-                }
-            }
+        for record in records:
             out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
-            
-            comments_count += 1
-            words_count += len(text.split())
 
-            # Process replies
-            if c.get("replies") and isinstance(c["replies"], dict):
-                for reply in c["replies"]["data"]["children"]:
-                    process_comment(reply)
+    # Indexed only once the lines are on disk: if the crawl dies in between, the
+    # INCREMENTAL file scan (skip_ids) still keeps the re-fetch from repeating them
+    if dedup is not None:
+        dedup.add(items, subreddit.lower(), os.path.basename(output_file))
+    if on_written is not None:
+        on_written(records)
 
-        for comment in input_json[1]["data"]["children"]:
-            process_comment(comment)
-
-    return comments_count, words_count
+    return len(records), sum(len(r["text"].split()) for r in records)
 
 # --- Main Loop (No crawl_progress) ---
-seen_posts = load_seen_posts()
-total_comments = 0
-total_words = 0
+def search_cells(state, budget):
+    """Search every sub x keyword cell and queue its crawlable posts in the budget"""
+    for sub in subreddits:
+        for kw in keywords:
+            if not INCREMENTAL and state.is_keyword_done(f"{sub}_{kw}"):
+                continue  # nothing new to find without re-checking seen posts
 
-print(f"Resuming crawl. Already seen posts: {len(seen_posts)}")
-print(f"Sorting by RELEVANCE then COMMENT COUNT with MIN_COMMENTS = {MIN_COMMENTS}")
+            print(f"\nFetching posts for r/{sub} with keyword '{kw}' (relevance sorted)...")
+            before = request_counts["network"]
+            posts = fetch_posts(sub, kw, limit=100)
+            searches = request_counts["network"] - before
+            budget.record_requests((sub, kw), searches)
+            state.add_cell_calls((sub, kw), searches)
+            time.sleep(REQUEST_DELAY_SEARCH)
 
-for sub in subreddits:
-    output_file = os.path.join(OUTPUT_FOLDER, f"{sub}_all.jsonl")
-    
-    for kw in keywords:
-        print(f"\nFetching posts for r/{sub} with keyword '{kw}' (relevance sorted)...")
-        posts = fetch_posts(sub, kw, limit=100)
-        time.sleep(REQUEST_DELAY_SEARCH)
-
-        for post in posts:
-            post_data = post["data"]
-            post_id = post_data["id"]
-            
-            if post_id in seen_posts:
-                continue  # Skip already processed posts
-            
-            if post_data.get("num_comments", 0) < MIN_COMMENTS:
-                continue  # Skip low-comment posts
-            
-            post_url = f"https://www.reddit.com{post_data['permalink']}"
-            print(f"  Fetching comments for post: {post_url} ({post_data.get('num_comments')} comments)")
-            data = fetch_comments(post_url)
-            time.sleep(REQUEST_DELAY_COMMENTS)
-            
+            candidates = []
+            for post in posts:
+                post_data = post["data"]
+                if state.is_seen(post_data["id"]) and not (INCREMENTAL and needs_refresh(post_data, state)):
+                    continue  # Skip already processed posts (unless they gained comments)
+                if post_data.get("num_comments", 0) < MIN_COMMENTS:
+                    continue  # Skip low-comment posts
+                candidates.append(post_data)
+            budget.add_cell((sub, kw), candidates)
+
+def main():
+    state = CrawlState(STATE_DB)
+    total_comments = 0
+    total_words = 0
+    limiter = HostLimiter()  # shared across all waves so learned rates carry over
+    dedup = DedupIndex(DEDUP_DB, near_dup=NEAR_DUP) if DEDUP_DB else None
+    if dedup is not None and dedup.count() == 0:
+        dupes = dedup.import_jsonl_folder(OUTPUT_FOLDER)
+        print(f"Seeded comment index from {OUTPUT_FOLDER}/ ({dedup.count()} comments, {dupes} duplicates already there)")
+
+    matcher = build_three_sheet_matcher()
+    budget = CrawlBudget(lambda title: has_keywords(matcher, str(title)), TARGET_COMMENTS, TARGET_WORDS,
+                         CELL_SHARE, MAX_COMMENTS_PER_POST)
+    budget.seed(state.cell_totals())  # targets and cell shares count what earlier runs collected
+    more_calls = max_more_calls(MAX_COMMENTS_PER_POST)
+
+    print(f"Resuming crawl. Already seen posts: {state.seen_count()}")
+    print(f"Budget: {TARGET_COMMENTS} relevant comments / {TARGET_WORDS} words, "
+          f"cell share {CELL_SHARE}, max {MAX_COMMENTS_PER_POST} comments per post, MIN_COMMENTS = {MIN_COMMENTS}")
+    print(f"Crawl mode: {CRAWL_MODE}" + (f" ({MAX_IN_FLIGHT} requests in flight)" if CRAWL_MODE == "async" else ""))
+    if INCREMENTAL:
+        print(f"Incremental: re-fetching seen posts whose comment count grew ({state.watermark_count()} watermarks)")
+
+    print(f"Budget so far: {budget.comments} relevant comments, {budget.words} words in {budget.calls} requests")
+    if budget.done():
+        print("Targets already reached by earlier runs, nothing to crawl")
+    else:
+        search_cells(state, budget)
+    print(f"\nPlanned {len(budget.queue)} posts over {len(budget.cells)} cells")
+
+    # Only needed to dedup re-fetched threads, so skip the file scan otherwise
+    existing_ids = {sub: load_comment_ids(os.path.join(OUTPUT_FOLDER, f"{sub}_all.jsonl")) if INCREMENTAL else None
+                    for sub in subreddits}
+
+    while not budget.done():
+        wave = budget.next_wave(WAVE_SIZE)
+        if not wave:
+            print("Every cell is exhausted or at its share, stopping short of the target")
+            break
+        to_crawl = {f"https://www.reddit.com{post_data['permalink']}": (cell, post_data) for cell, post_data in wave}
+
+        def handle_result(post_url, data, calls):
+            nonlocal total_comments, total_words
             if not data:
-                continue  # Skip if fetch failed
-            
-            comments_count, words_count = process_comments_to_jsonl(data, post_url, output_file)
-            seen_posts.add(post_id)  # Mark as seen
-            save_seen_posts(seen_posts)  # Save after each post
-            
+                budget.record_requests(to_crawl[post_url][0], calls)
+                state.add_cell_calls(to_crawl[post_url][0], calls)
+                return  # Skip if fetch failed
+
+            (sub, kw), post_data = to_crawl[post_url]
+            output_file = os.path.join(OUTPUT_FOLDER, f"{sub}_all.jsonl")
+            title_match = budget.title_matches(post_data.get("title", ""))
+            relevant = []
+
+            def keep_relevant(records):
+                relevant.extend(r["text"] for r in records if title_match or has_keywords(matcher, r["text"]))
+
+            comments_count, words_count = process_comments_to_jsonl(
+                data, post_url, output_file, existing_ids[sub], dedup, MAX_COMMENTS_PER_POST, keep_relevant)
+
+            # num_comments from the thread itself is fresher than the search listing
+            thread_post = data[0]["data"]["children"][0]["data"]
+            watermark = {
+                "num_comments": thread_post.get("num_comments", post_data.get("num_comments", 0)),
+                "last_created_utc": last_comment_utc(data),
+            }
+            cell_stats = budget.record((sub, kw), post_data, calls, len(relevant), sum(len(t.split()) for t in relevant))
+            # Seen flag + watermark + totals + the cell's budget totals in one transaction after each post
+            state.record_post(post_data["id"], comments_count, words_count, watermark, (sub, kw), cell_stats)
+
             total_comments += comments_count
             total_words += words_count
 
-            print(f"  +{comments_count} comments, +{words_count} words | Total: {total_comments}, {total_words}")
+            print(f"  r/{sub} '{kw}': +{comments_count} comments ({len(relevant)} relevant), +{words_count} words"
+                  f" | Total: {total_comments}, {total_words} | Relevant: {budget.comments}, {budget.words}")
+
+        if CRAWL_MODE == "async":
+            print(f"  Fetching comments for {len(to_crawl)} posts...")
+            asyncio.run(crawl_comments_async(list(to_crawl), handle_result, limiter,
+                                             max_in_flight=MAX_IN_FLIGHT, api_url=api_url,
+                                             morechildren_url=MORECHILDREN_URL if EXPAND_MORE else None,
+                                             max_more_calls=more_calls))
+        else:
+            for post_url, (cell, post_data) in to_crawl.items():
+                print(f"  Fetching comments for post: {post_url} ({post_data.get('num_comments')} comments)")
+                data = fetch_comments(post_url)
+                time.sleep(REQUEST_DELAY_COMMENTS)
+                calls = 1
+                if data and EXPAND_MORE:
+                    expanded = expand_more(data, fetch_more_json, MORECHILDREN_URL, more_calls)
+                    if expanded:
+                        print(f"  Expanded 'more' stubs with {expanded} morechildren calls")
+                    calls += expanded
+                handle_result(post_url, data, calls)
+
+    for sub, kw in budget.finished_cells():
+        state.mark_keyword_done(f"{sub}_{kw}")
+    print("\n" + budget.summary())
 
-print(f"\nFinal stats: {total_comments} comments, {total_words} words")
-print(f"Files saved in {OUTPUT_FOLDER}/ :")
-for sub in subreddits:
-    filepath = os.path.join(OUTPUT_FOLDER, f"{sub}_all.jsonl")
-    if os.path.exists(filepath):
-        size = os.path.getsize(filepath) / (1024*1024)
-        print(f"  - {sub}_all.jsonl ({size:.2f} MB)")
+    overall = state.totals()
+    state.close()
+    if dedup is not None:
+        print(dedup.stats_line())
+        dedup.close()
+    if SEARCH_INDEX:
+        update_index(OUTPUT_FOLDER, SEARCH_INDEX)
+    print(f"\nFinal stats: {total_comments} comments, {total_words} words")
+    print(f"All runs: {overall['total_comments']} comments, {overall['total_words']} words")
+    print(f"Files saved in {OUTPUT_FOLDER}/ :")
+    for sub in subreddits:
+        filepath = os.path.join(OUTPUT_FOLDER, f"{sub}_all.jsonl")
+        if os.path.exists(filepath):
+            size = os.path.getsize(filepath) / (1024*1024)
+            print(f"  - {sub}_all.jsonl ({size:.2f} MB)")
 
+if __name__ == "__main__":
+    if "--estimate" in sys.argv:
+        # Size the crawl first: python fullCrawl.py --estimate [corpusEstimator.py options]
+        from corpusEstimator import main as estimate
+        estimate(subreddits, keywords, [a for a in sys.argv[1:] if a != "--estimate"])
+    else:
+        main()
@@ -1,9 +1,12 @@
-import requests
 import json
 import os
 import time
 from datetime import datetime
 
+from crawlState import CrawlState
+from dedupIndex import DedupIndex
+from redditFetch import cached_get
+
 # --- Configuration ---
 subreddits = [
     "recruiting",
@@ -40,8 +43,11 @@ REQUEST_DELAY_COMMENTS = 3.0
 TARGET_COMMENTS = 70000
 TARGET_WORDS = 600000
 
-# Track seen posts
-SEEN_POSTS_FILE = "seen_posts.json"
+# Seen posts + running totals (shared with fullCrawl.py, see crawlState.py)
+STATE_DB = "crawl_state.sqlite"
+
+# Global comment index, shared with fullCrawl.py (None to write every comment)
+DEDUP_DB = "comment_index.sqlite"
 
 # Step mapping for early-stage hiring (1-6)
 STEP_KEYWORDS = {
@@ -53,27 +59,6 @@ STEP_KEYWORDS = {
     "Candidate Evaluation/Ranking": ["candidate ranking AI", "recruitment automation"]
 }
 
-# --- Load/Save ---
-def load_progress():
-    if os.path.exists(PROGRESS_FILE):
-        with open(PROGRESS_FILE, 'r') as f:
-            return json.load(f)
-    return {"total_comments": 0, "total_words": 0}
-
-def save_progress(progress):
-    with open(PROGRESS_FILE, 'w') as f:
-        json.dump(progress, f)
-
-def load_seen_posts():
-    if os.path.exists(SEEN_POSTS_FILE):
-        with open(SEEN_POSTS_FILE, 'r') as f:
-            return set(json.load(f))
-    return set()
-
-def save_seen_posts(seen_posts):
-    with open(SEEN_POSTS_FILE, 'w') as f:
-        json.dump(list(seen_posts), f)
-
 # --- Fetch functions ---
 def fetch_posts(subreddit, keyword, limit=100):
     url = f"https://www.reddit.com/r/{subreddit}/search.json"
@@ -81,7 +66,7 @@ def fetch_posts(subreddit, keyword, limit=100):
     fetch_limit = limit * 2
     params = {"q": keyword, "sort": "relevance", "limit": fetch_limit, "restrict_sr": 1}
     try:
-        r = requests.get(url, headers=headers, params=params, timeout=10)
+        r = cached_get(url, headers=headers, params=params, timeout=10)
         if r.status_code != 200: return []
         posts = r.json().get("data", {}).get("children", [])
         posts.sort(key=lambda p: p["data"]["num_comments"], reverse=True)
@@ -93,7 +78,7 @@ def fetch_comments(post_url, max_retries=5):
     delay = 10
     for attempt in range(max_retries):
         try:
-            r = requests.get(f"{post_url}.json", headers=headers, timeout=15)
+            r = cached_get(f"{post_url}.json", headers=headers, timeout=15)
             if r.status_code == 200: return r.json()
             elif r.status_code == 429:
                 time.sleep(delay * (2 ** attempt))
@@ -104,37 +89,43 @@ def fetch_comments(post_url, max_retries=5):
         except: time.sleep(delay * (2 ** attempt))
     return None
 
-def process_comments_to_jsonl(input_json, post_url, output_file):
+def process_comments_to_jsonl(input_json, post_url, output_file, dedup=None):
     if not input_json or len(input_json) < 2: return 0,0
     post_data = input_json[0]["data"]["children"][0]["data"]
     subreddit = post_data["subreddit"]
     post_title = post_data["title"]
-    comments_count = 0
-    words_count = 0
-
+    records = []
+
+    def process_comment(comment):
+        if comment["kind"] != "t1": return
+        c = comment["data"]
+        if c.get("body") in ["[deleted]", "[removed]"]: return
+        text = c.get("body", "")
+        records.append({
+            "id": c["id"],
+            "text": text,
+            "timestamp": datetime.utcfromtimestamp(c["created_utc"]).isoformat() + "Z",
+            "source": "reddit",
+            "metadata": {"subreddit": subreddit, "post_title": post_title, "url": post_url}
+        })
+        if c.get("replies") and isinstance(c["replies"], dict):
+            for reply in c["replies"]["data"]["children"]:
+                process_comment(reply)
+    for comment in input_json[1]["data"]["children"]:
+        process_comment(comment)
+
+    # Skip comments the full crawl (or an earlier batch) already wrote, see dedupIndex.py
+    items = [(r["id"], r["text"]) for r in records]
+    if dedup is not None:
+        keep = dedup.filter_new(items)
+        records = [records[i] for i in keep]
+        items = [items[i] for i in keep]
     with open(output_file, "a", encoding="utf-8") as out_f:
-        def process_comment(comment):
-            nonlocal comments_count, words_count
-            if comment["kind"] != "t1": return
-            c = comment["data"]
-            if c.get("body") in ["[deleted]", "[removed]"]: return
-            text = c.get("body", "")
-            record = {
-                "id": c["id"],
-                "text": text,
-                "timestamp": datetime.utcfromtimestamp(c["created_utc"]).isoformat() + "Z",
-                "source": "reddit",
-                "metadata": {"subreddit": subreddit, "post_title": post_title, "url": post_url}
-            }
+        for record in records:
             out_f.write(json.dumps(record, ensure_ascii=False)+"\n")
-            comments_count += 1
-            words_count += len(text.split())
-            if c.get("replies") and isinstance(c["replies"], dict):
-                for reply in c["replies"]["data"]["children"]:
-                    process_comment(reply)
-        for comment in input_json[1]["data"]["children"]:
-            process_comment(comment)
-    return comments_count, words_count
+    if dedup is not None:
+        dedup.add(items, subreddit.lower(), os.path.basename(output_file))
+    return len(records), sum(len(r["text"].split()) for r in records)
 
 # --- Determine likely step for a post ---
 def suggest_step(post_title):
@@ -146,10 +137,13 @@ def suggest_step(post_title):
     return "Unknown Step"
 
 # --- Main loop with batch approval ---
-progress = load_progress()
-seen_posts = load_seen_posts()
-total_comments = progress["total_comments"]
-total_words = progress["total_words"]
+state = CrawlState(STATE_DB)
+dedup = DedupIndex(DEDUP_DB) if DEDUP_DB else None
+if dedup is not None and dedup.count() == 0:
+    dedup.import_jsonl_folder(OUTPUT_FOLDER)
+totals = state.totals()
+total_comments = totals["total_comments"]
+total_words = totals["total_words"]
 BATCH_SIZE = 30
 
 for sub in subreddits:
@@ -160,7 +154,7 @@ for sub in subreddits:
 
         posts = fetch_posts(sub, kw, limit=100)
         time.sleep(REQUEST_DELAY_SEARCH)
-        posts = [p for p in posts if p["data"]["id"] not in seen_posts and p["data"].get("num_comments",0) >= MIN_COMMENTS]
+        posts = [p for p in posts if not state.is_seen(p["data"]["id"]) and p["data"].get("num_comments",0) >= MIN_COMMENTS]
 
         for i in range(0, len(posts), BATCH_SIZE):
             batch = posts[i:i+BATCH_SIZE]
@@ -183,39 +177,23 @@ for sub in subreddits:
                 post_id = post_data["id"]
                 post_url = f"https://www.reddit.com{post_data['permalink']}"
 
-                # mark post as seen regardless of y/n
-                seen_posts.add(post_id)
-
+                comments_count, words_count = 0, 0
                 # only fetch/process if user approved
                 if approvals[idx] == "y":
                     data = fetch_comments(post_url)
                     time.sleep(REQUEST_DELAY_COMMENTS)
                     if data:
-                        comments_count, words_count = process_comments_to_jsonl(data, post_url, output_file)
+                        comments_count, words_count = process_comments_to_jsonl(data, post_url, output_file, dedup)
                         total_comments += comments_count
                         total_words += words_count
                         print(f"  +{comments_count} comments, +{words_count} words | Total: {total_comments}, {total_words}")
 
-            # --- append to seen_posts.json ---
-            if os.path.exists(SEEN_POSTS_FILE):
-                with open(SEEN_POSTS_FILE, "r", encoding="utf-8") as f:
-                    existing = set(json.load(f))
-                existing.update(seen_posts)
-                seen_posts_to_save = existing
-            else:
-                seen_posts_to_save = seen_posts
-
-            with open(SEEN_POSTS_FILE, "w", encoding="utf-8") as f:
-                json.dump(list(seen_posts_to_save), f)
-
-            # save progress after each batch
-            progress["total_comments"] = total_comments
-            progress["total_words"] = total_words
-            save_progress(progress)
+                # mark post as seen regardless of y/n (one transaction with the totals)
+                state.record_post(post_id, comments_count, words_count)
 
 
-# Final save
-progress["total_comments"] = total_comments
-progress["total_words"] = total_words
-save_progress(progress)
+state.close()
+if dedup is not None:
+    print(dedup.stats_line())
+    dedup.close()
 print(f"\nFinal stats: {total_comments} comments, {total_words} words")
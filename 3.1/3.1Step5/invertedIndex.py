@@ -0,0 +1,435 @@
+import argparse
+import json
+import os
+import re
+import sqlite3
+import time
+import zlib
+from collections import Counter, defaultdict
+
+from proximityRules import min_distance
+
+# Positional inverted index over jsonl_crawl_full/, for trying keyword hypotheses
+# ("Tip3: filter by opinionated keywords") without re-scanning every comment.
+# Comment texts and post titles are tokenized (lowercase \w+ words) and for every
+# word the index keeps which comments / posts contain it and at which token
+# positions. Postings are varint delta-encoded and zlib-compressed, stored in SQLite.
+#
+# Incremental: the byte offset reached in every <sub>_all.jsonl is remembered, so
+# `update` only reads what fullCrawl.py appended since (as a new segment).
+# `compact` merges the segments back into one blob per word.
+#
+#   python invertedIndex.py update                       -> build / catch up with jsonl_crawl_full
+#   python invertedIndex.py query 'ai AND (ats OR "resume screening") NOT bot'
+#   python invertedIndex.py query '"one way interview" OR hirevue NEAR/5 ai' --by-subreddit
+#   python invertedIndex.py query 'title:ai AND rejected' --ids
+# Query syntax: AND (also implicit between words), OR, NOT, ( ), "phrases",
+# a NEAR/n b (within n words, either order), title:word / title:"phrase" for post titles
+# (a title match selects every comment of that post). Case insensitive.
+
+INPUT_FOLDER = "jsonl_crawl_full"
+INDEX_DB = "comment_search.sqlite"
+FIELDS = ("text", "title")
+LOOKUP_CHUNK = 500
+
+TOKEN = re.compile(r"\w+")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS posts (
+    post INTEGER PRIMARY KEY,
+    url TEXT UNIQUE
+);
+CREATE TABLE IF NOT EXISTS comments (
+    doc INTEGER PRIMARY KEY,
+    comment_id TEXT,
+    post INTEGER,
+    subreddit TEXT
+);
+CREATE INDEX IF NOT EXISTS comments_post ON comments (post);
+CREATE TABLE IF NOT EXISTS postings (
+    field TEXT,
+    term TEXT,
+    segment INTEGER,
+    docs INTEGER,
+    data BLOB,
+    PRIMARY KEY (field, term, segment)
+);
+CREATE TABLE IF NOT EXISTS files (
+    path TEXT PRIMARY KEY,
+    offset INTEGER,
+    lines INTEGER
+);
+"""
+
+
+def tokenize(text):
+    return TOKEN.findall(str(text).lower())
+
+
+# --- Postings encoding ---
+def _put_varint(out, n):
+    while n >= 0x80:
+        out.append((n & 0x7F) | 0x80)
+        n >>= 7
+    out.append(n)
+
+
+def encode_postings(entries):
+    """[(doc, [positions...]), ...] sorted by doc -> zlib(varints of doc gaps, counts, position gaps)"""
+    out = bytearray()
+    prev_doc = 0
+    for doc, positions in entries:
+        _put_varint(out, doc - prev_doc)
+        _put_varint(out, len(positions))
+        prev = 0
+        for p in positions:
+            _put_varint(out, p - prev)
+            prev = p
+        prev_doc = doc
+    return zlib.compress(bytes(out))
+
+
+def decode_postings(blob):
+    data = zlib.decompress(blob)
+    i, n = 0, len(data)
+
+    def varint():
+        nonlocal i
+        value = shift = 0
+        while True:
+            b = data[i]
+            i += 1
+            value |= (b & 0x7F) << shift
+            if b < 0x80:
+                return value
+            shift += 7
+
+    doc = 0
+    while i < n:
+        doc += varint()
+        positions, p = [], 0
+        for _ in range(varint()):
+            p += varint()
+            positions.append(p)
+        yield doc, positions
+
+
+# --- Query parsing ---
+QUERY_TOKEN = re.compile(r'\s*(\(|\)|(?:title:)?"[^"]*"|NEAR/\d+|[^\s()"]+)')
+
+
+def parse_query(query):
+    """Query string -> nested tuples: ("term"|"phrase", field, words) / ("near", n, a, b) / ("and"|"or", a, b) / ("not", a)"""
+    tokens = QUERY_TOKEN.findall(query)
+    pos = 0
+
+    def peek():
+        return tokens[pos] if pos < len(tokens) else None
+
+    def take():
+        nonlocal pos
+        if pos >= len(tokens):
+            raise ValueError("Unexpected end of query")
+        pos += 1
+        return tokens[pos - 1]
+
+    def leaf():
+        token = take()
+        if token == "(":
+            node = or_expr()
+            if take() != ")":
+                raise ValueError("Missing ')' in query")
+            return node
+        field = "text"
+        if token.startswith("title:"):
+            field, token = "title", token[len("title:"):]
+        words = tokenize(token)
+        if not words:
+            raise ValueError(f"Nothing to search for in {token!r}")
+        return ("phrase" if token.startswith('"') and len(words) > 1 else "term", field, words)
+
+    def near_expr():
+        node = leaf()
+        while peek() and peek().startswith("NEAR/"):
+            n = int(take()[len("NEAR/"):])
+            node = ("near", n, node, leaf())
+        return node
+
+    def unary():
+        if peek() == "NOT":
+            take()
+            return ("not", unary())
+        return near_expr()
+
+    def and_expr():
+        node = unary()
+        while peek() not in (None, ")", "OR"):
+            if peek() == "AND":
+                take()
+            node = ("and", node, unary())
+        return node
+
+    def or_expr():
+        node = and_expr()
+        while peek() == "OR":
+            take()
+            node = ("or", node, and_expr())
+        return node
+
+    if not tokens:
+        raise ValueError("Empty query")
+    node = or_expr()
+    if peek() is not None:
+        raise ValueError(f"Unexpected {peek()!r} in query")
+    return node
+
+
+class InvertedIndex:
+    """
+    index = InvertedIndex("comment_search.sqlite")
+    index.update("jsonl_crawl_full")        -> comments added
+    docs = index.search('ai NEAR/3 interview')
+    index.comment_ids(docs)
+    """
+
+    def __init__(self, db_file=INDEX_DB):
+        # isolation_level=None -> explicit transactions, same as crawlState.py
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self._all_docs = None
+
+    def close(self):
+        self.conn.close()
+
+    def count(self):
+        return self.conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0]
+
+    # --- Indexing ---
+    def clear(self):
+        self.conn.executescript("DELETE FROM postings; DELETE FROM comments; DELETE FROM posts; DELETE FROM files;")
+
+    def update(self, input_folder=INPUT_FOLDER):
+        """Index the lines appended to every <sub>_all.jsonl since the last update, as one new segment"""
+        offsets = {path: (offset, lines) for path, offset, lines in self.conn.execute("SELECT * FROM files")}
+        files = sorted(n for n in os.listdir(input_folder) if n.endswith("_all.jsonl"))
+        if any(os.path.getsize(os.path.join(input_folder, n)) < offsets.get(n, (0, 0))[0] for n in files):
+            print("A JSONL file got shorter since the last update (rewritten?), rebuilding the index")
+            self.clear()
+            offsets = {}
+
+        post_ids = dict((url, post) for post, url in self.conn.execute("SELECT post, url FROM posts"))
+        next_doc = self.conn.execute("SELECT COALESCE(MAX(doc), 0) + 1 FROM comments").fetchone()[0]
+        segment = self.conn.execute("SELECT COALESCE(MAX(segment), 0) + 1 FROM postings").fetchone()[0]
+        postings = {field: defaultdict(list) for field in FIELDS}
+        new_posts, new_comments, new_offsets = [], [], {}
+
+        for name in files:
+            sub = name[:-len("_all.jsonl")]
+            offset, line_num = offsets.get(name, (0, 0))
+            with open(os.path.join(input_folder, name), "rb") as f:
+                f.seek(offset)
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break  # the crawler is still writing this one, next update gets it
+                    offset += len(line)
+                    line_num += 1
+                    try:
+                        record = json.loads(line)
+                        url = record["metadata"]["url"]
+                        title = record["metadata"]["post_title"]
+                        text = record["text"]
+                    except (json.JSONDecodeError, KeyError):
+                        continue
+                    # same fallback id as convertAllJsonlToParquet.iter_comment_rows
+                    comment_id = record.get("id", f"{sub}_{line_num - 1}")
+
+                    if url not in post_ids:
+                        post_ids[url] = len(post_ids) + 1
+                        new_posts.append((post_ids[url], url))
+                        for term, positions in self._term_positions(title).items():
+                            postings["title"][term].append((post_ids[url], positions))
+                    doc = next_doc + len(new_comments)
+                    new_comments.append((doc, comment_id, post_ids[url], sub))
+                    for term, positions in self._term_positions(text).items():
+                        postings["text"][term].append((doc, positions))
+                new_offsets[name] = (offset, line_num)
+
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("INSERT INTO posts VALUES (?, ?)", new_posts)
+            self.conn.executemany("INSERT INTO comments VALUES (?, ?, ?, ?)", new_comments)
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?, ?, ?, ?)", (
+                (field, term, segment, len(entries), encode_postings(entries))
+                for field in FIELDS for term, entries in postings[field].items()
+            ))
+            self.conn.executemany("INSERT OR REPLACE INTO files VALUES (?, ?, ?)",
+                                  [(name, offset, lines) for name, (offset, lines) in new_offsets.items()])
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self._all_docs = None
+        return len(new_comments)
+
+    @staticmethod
+    def _term_positions(text):
+        positions = defaultdict(list)
+        for i, word in enumerate(tokenize(text)):
+            positions[word].append(i)
+        return positions
+
+    def compact(self):
+        """Merge every word's segments into one blob"""
+        merged = defaultdict(list)
+        for field, term, blob in self.conn.execute("SELECT field, term, data FROM postings ORDER BY segment"):
+            merged[(field, term)].extend(decode_postings(blob))
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.execute("DELETE FROM postings")
+            self.conn.executemany("INSERT INTO postings VALUES (?, ?, 1, ?, ?)", (
+                (field, term, len(entries), encode_postings(entries)) for (field, term), entries in merged.items()
+            ))
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.conn.execute("VACUUM")
+
+    # --- Search ---
+    def postings(self, field, term):
+        """doc (comment, or post for titles) -> positions of term"""
+        result = {}
+        for (blob,) in self.conn.execute("SELECT data FROM postings WHERE field = ? AND term = ? ORDER BY segment",
+                                         (field, term)):
+            result.update(decode_postings(blob))
+        return result
+
+    def _positions(self, node):
+        """Leaf / NEAR node -> (field, {doc: sorted start positions})"""
+        kind = node[0]
+        if kind in ("term", "phrase"):
+            _, field, words = node
+            lists = [self.postings(field, w) for w in words]
+            if len(words) == 1:
+                return field, lists[0]
+            found = {}
+            for doc in set(lists[0]).intersection(*lists[1:]):
+                later = [set(l[doc]) for l in lists[1:]]
+                starts = [p for p in lists[0][doc] if all(p + i + 1 in s for i, s in enumerate(later))]
+                if starts:
+                    found[doc] = starts
+            return field, found
+        if kind == "near":
+            _, n, left, right = node
+            field_a, a = self._positions(left)
+            field_b, b = self._positions(right)
+            if field_a != field_b:
+                raise ValueError("NEAR needs both sides in the same field (text or title)")
+            found = {}
+            for doc in a.keys() & b.keys():
+                if min_distance(a[doc], b[doc]) <= n:
+                    found[doc] = sorted(a[doc] + b[doc])
+            return field_a, found
+        raise ValueError("NEAR only works between words / phrases")
+
+    def _comments_of_posts(self, posts):
+        posts = list(posts)
+        docs = set()
+        for i in range(0, len(posts), LOOKUP_CHUNK):
+            chunk = posts[i:i + LOOKUP_CHUNK]
+            docs.update(r[0] for r in self.conn.execute(
+                f"SELECT doc FROM comments WHERE post IN ({','.join('?' * len(chunk))})", chunk))
+        return docs
+
+    def _evaluate(self, node):
+        kind = node[0]
+        if kind == "and":
+            return self._evaluate(node[1]) & self._evaluate(node[2])
+        if kind == "or":
+            return self._evaluate(node[1]) | self._evaluate(node[2])
+        if kind == "not":
+            if self._all_docs is None:
+                self._all_docs = {r[0] for r in self.conn.execute("SELECT doc FROM comments")}
+            return self._all_docs - self._evaluate(node[1])
+        field, found = self._positions(node)
+        return set(found) if field == "text" else self._comments_of_posts(found)
+
+    def search(self, query):
+        """Sorted comment doc numbers matching the query (index order = crawl order within each update)"""
+        return sorted(self._evaluate(parse_query(query)))
+
+    def comments(self, docs):
+        """(comment_id, subreddit) per doc, in the given order"""
+        docs = list(docs)
+        rows = {}
+        for i in range(0, len(docs), LOOKUP_CHUNK):
+            chunk = docs[i:i + LOOKUP_CHUNK]
+            for doc, comment_id, sub in self.conn.execute(
+                    f"SELECT doc, comment_id, subreddit FROM comments WHERE doc IN ({','.join('?' * len(chunk))})", chunk):
+                rows[doc] = (comment_id, sub)
+        return [rows[d] for d in docs]
+
+    def comment_ids(self, docs):
+        return [comment_id for comment_id, _ in self.comments(docs)]
+
+    def stats_line(self, db_file=None):
+        words = self.conn.execute("SELECT COUNT(DISTINCT field || ':' || term) FROM postings").fetchone()[0]
+        segments = self.conn.execute("SELECT COUNT(DISTINCT segment) FROM postings").fetchone()[0]
+        line = f"Index: {self.count():,} comments, {words:,} words, {segments} segment(s)"
+        if db_file and os.path.exists(db_file):
+            size = sum(os.path.getsize(f) for f in (db_file, db_file + "-wal") if os.path.exists(f))
+            line += f", {size / 1e6:.2f} MB"
+        return line
+
+
+def update_index(input_folder=INPUT_FOLDER, db_file=INDEX_DB):
+    """Catch the index up with the JSONL files (used by fullCrawl.py and pipeline.py)"""
+    index = InvertedIndex(db_file)
+    start = time.time()
+    added = index.update(input_folder)
+    print(f"Search index: +{added:,} comments in {time.time() - start:.1f}s")
+    print(index.stats_line(db_file))
+    index.close()
+    return added
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Positional inverted index over the crawled comments")
+    parser.add_argument("command", choices=["update", "rebuild", "compact", "query", "stats"])
+    parser.add_argument("query", nargs="?", help="query for the 'query' command")
+    parser.add_argument("--input", default=INPUT_FOLDER)
+    parser.add_argument("--db", default=INDEX_DB)
+    parser.add_argument("--ids", action="store_true", help="print the matching comment ids")
+    parser.add_argument("--by-subreddit", action="store_true", help="counts per subreddit")
+    args = parser.parse_args()
+
+    if args.command in ("update", "rebuild"):
+        if args.command == "rebuild":
+            InvertedIndex(args.db).clear()
+        update_index(args.input, args.db)
+    else:
+        index = InvertedIndex(args.db)
+        if args.command == "compact":
+            index.compact()
+            print(index.stats_line(args.db))
+        elif args.command == "stats":
+            print(index.stats_line(args.db))
+        else:
+            if not args.query:
+                parser.error("query needs a query string")
+            start = time.time()
+            try:
+                docs = index.search(args.query)
+            except ValueError as e:
+                index.close()
+                parser.error(f"bad query {args.query!r}: {e}")
+            elapsed = (time.time() - start) * 1000
+            print(f"{len(docs):,} comments match {args.query!r} ({elapsed:.1f} ms)")
+            if args.by_subreddit:
+                for sub, n in Counter(sub for _, sub in index.comments(docs)).most_common():
+                    print(f"  {sub}: {n:,}")
+            if args.ids:
+                print("\n".join(index.comment_ids(docs)))
+        index.close()
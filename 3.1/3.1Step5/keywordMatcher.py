@@ -0,0 +1,173 @@
+import re
+from collections import deque, namedtuple
+
+try:
+    import ahocorasick  # pyahocorasick, optional C automaton (pip install pyahocorasick)
+except ImportError:
+    ahocorasick = None
+
+# Multi-keyword matcher shared by the comment filters.
+# All terms go into one Aho-Corasick automaton, so a text is scanned once no matter
+# how many keywords there are, and every hit is reported with its offset.
+# Per-term rules:
+#   case_sensitive -> e.g. "AI" must be uppercase, "ai interview" matches any case
+#   word_boundary  -> same as wrapping the term in \b...\b (False = plain substring, like `in`)
+# Terms may use simple character classes like 'one[- ]way interview', which are
+# expanded into one literal per variant.
+
+Hit = namedtuple("Hit", ["start", "end", "term", "group"])
+
+_CHAR_CLASS = re.compile(r"\[([^\]]+)\]")
+
+
+def expand_pattern(pattern):
+    """'auto[- ]reject' -> ['auto-reject', 'auto reject']"""
+    m = _CHAR_CLASS.search(pattern)
+    if not m:
+        return [pattern]
+    variants = []
+    for ch in m.group(1):
+        variants += expand_pattern(pattern[:m.start()] + ch + pattern[m.end():])
+    return variants
+
+
+def _is_word(ch):
+    return ch.isalnum() or ch == "_"
+
+
+def _boundary(text, i):
+    """True where re's \\b would match at position i"""
+    before = i > 0 and _is_word(text[i - 1])
+    after = i < len(text) and _is_word(text[i])
+    return before != after
+
+
+def _lower_aligned(text):
+    """Lowercase without changing length (a few characters like 'İ' grow when lowered)"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return "".join(c if len(c.lower()) != 1 else c.lower() for c in text)
+
+
+class _PyAutomaton:
+    """Plain Python Aho-Corasick, used when pyahocorasick isn't installed"""
+
+    def __init__(self):
+        self.goto = [{}]
+        self.fail = [0]
+        self.out = [[]]
+
+    def add_word(self, word, value):
+        node = 0
+        for ch in word:
+            nxt = self.goto[node].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[node][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.out.append([])
+            node = nxt
+        self.out[node].append(value)
+
+    def make_automaton(self):
+        queue = deque(self.goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self.goto[node].items():
+                queue.append(nxt)
+                f = self.fail[node]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                target = self.goto[f].get(ch, 0)
+                self.fail[nxt] = target if target != nxt else 0  # depth-1 nodes fail to the root
+                self.out[nxt] = self.out[nxt] + self.out[self.fail[nxt]]
+
+    def iter(self, text):
+        goto, fail, out = self.goto, self.fail, self.out
+        node = 0
+        for i, ch in enumerate(text):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for value in out[node]:
+                    yield i, value
+
+
+class KeywordMatcher:
+    """
+    matcher = KeywordMatcher()
+    matcher.add("AI", group="ai", case_sensitive=True)
+    matcher.add_all(other_keywords, group="other")
+    matcher.scan(text)        -> [Hit(start, end, term, group), ...] in text order
+    matcher.groups_in(text)   -> {"ai", "other"} (which groups hit at least once)
+    """
+
+    def __init__(self):
+        self._variants = []  # (variant, term, group, case_sensitive, word_boundary)
+        self._automaton = None
+
+    def add(self, term, group=None, case_sensitive=False, word_boundary=True):
+        for variant in expand_pattern(term):
+            self._variants.append((variant, term, group, case_sensitive, word_boundary))
+        self._automaton = None
+        return self
+
+    def add_all(self, terms, group=None, case_sensitive=False, word_boundary=True):
+        for term in terms:
+            self.add(term, group, case_sensitive, word_boundary)
+        return self
+
+    def compile(self):
+        automaton = ahocorasick.Automaton() if ahocorasick is not None else _PyAutomaton()
+        keyed = {}
+        for index, (variant, *_rest) in enumerate(self._variants):
+            keyed.setdefault(variant.lower(), []).append(index)
+        for key, indexes in keyed.items():
+            automaton.add_word(key, (len(key), indexes))
+        automaton.make_automaton()
+        self._automaton = automaton
+        return self
+
+    def scan(self, text):
+        """Every hit in one pass, overlapping hits included"""
+        if self._automaton is None:
+            self.compile()
+        if not isinstance(text, str) or not text:
+            return []
+
+        lowered = _lower_aligned(text)
+        hits = []
+        for end_index, (length, indexes) in self._automaton.iter(lowered):
+            start, end = end_index - length + 1, end_index + 1
+            for index in indexes:
+                variant, term, group, case_sensitive, word_boundary = self._variants[index]
+                if case_sensitive and text[start:end] != variant:
+                    continue
+                if word_boundary and not (_boundary(text, start) and _boundary(text, end)):
+                    continue
+                hits.append(Hit(start, end, term, group))
+        hits.sort(key=lambda h: (h.start, h.end))
+        return hits
+
+    def groups_in(self, text):
+        return {hit.group for hit in self.scan(text)}
+
+    def terms_in(self, text):
+        return {hit.term for hit in self.scan(text)}
+
+    def first_offsets(self, text):
+        """term -> offset of its first hit (what str.find would give for substring terms)"""
+        offsets = {}
+        for hit in self.scan(text):
+            offsets.setdefault(hit.term, hit.start)
+        return offsets
+
+    def scan_column(self, series):
+        """scan() for every value of a pandas Series/iterable, same order"""
+        return [self.scan(text) for text in series]
+
+    def groups_column(self, series):
+        return [{hit.group for hit in self.scan(text)} for text in series]
@@ -0,0 +1,192 @@
+import argparse
+import copy
+import glob
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+# Local stand-in for reddit.com that serves canned Reddit JSON, so the crawler
+# can be run without hitting (or getting banned by) the real site.
+#
+# Usage:
+#   python mockRedditServer.py --port 8765
+#   REDDIT_BASE_URL=http://127.0.0.1:8765 python fullCrawl.py
+#
+# Serves:
+#   /r/<sub>/search.json          -> listing of every canned thread of that subreddit
+#   /r/<sub>/comments/<id>/...json -> the canned thread JSON for post <id>
+#   /api/morechildren.json        -> flat list of the requested comments
+# --truncate N keeps only the first N top-level comments of each thread and hides
+# the rest behind a "more" stub, like Reddit does on big threads.
+# Every response carries X-Ratelimit-* headers, and --quota makes it answer 429
+# once the window is used up, same as Reddit does. 200s carry an ETag and a
+# matching If-None-Match gets a bodyless 304.
+
+DEFAULT_CANNED = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "3.1Steps1-3")
+
+
+def flatten_comments(children):
+    """comment id -> copy of the t1 node with replies cleared (morechildren shape)"""
+    flat = {}
+    stack = list(children)
+    while stack:
+        node = stack.pop()
+        if node.get("kind") != "t1":
+            continue
+        replies = node["data"].get("replies")
+        if isinstance(replies, dict):
+            stack.extend(replies["data"]["children"])
+        flat_node = copy.deepcopy(node)
+        flat_node["data"]["replies"] = ""
+        flat[node["data"]["id"]] = flat_node
+    return flat
+
+
+def truncate_thread(thread, keep):
+    """Keep the first `keep` top-level comments, hide the rest (and their replies) behind one "more" stub"""
+    thread = copy.deepcopy(thread)
+    children = thread[1]["data"]["children"]
+    hidden = [c for c in children[keep:] if c.get("kind") == "t1"]
+    if not hidden:
+        return thread
+    hidden_ids = [c["data"]["id"] for c in hidden] + [
+        i for c in hidden for i in flatten_comments([c]) if i != c["data"]["id"]
+    ]
+    link_id = thread[0]["data"]["children"][0]["data"]["name"]
+    stub = {"kind": "more", "data": {"count": len(hidden_ids), "name": f"t1_{hidden_ids[0]}",
+                                     "id": hidden_ids[0], "parent_id": link_id, "depth": 0,
+                                     "children": hidden_ids}}
+    thread[1]["data"]["children"] = children[:keep] + [stub]
+    return thread
+
+
+def load_threads(folder):
+    """post id -> thread JSON ([post listing, comment listing]) for every *.json file"""
+    threads = {}
+    for path in glob.glob(os.path.join(folder, "*.json")):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        try:
+            post = data[0]["data"]["children"][0]["data"]
+        except (KeyError, IndexError, TypeError):
+            continue
+        threads[post["id"]] = data
+    return threads
+
+
+class RateWindow:
+    """Fixed window request counter, mirrors Reddit's X-Ratelimit-* headers"""
+
+    def __init__(self, quota, window):
+        self.quota = quota
+        self.window = window
+        self.start = time.monotonic()
+        self.used = 0
+        self.lock = threading.Lock()
+
+    def hit(self):
+        with self.lock:
+            now = time.monotonic()
+            if now - self.start >= self.window:
+                self.start = now
+                self.used = 0
+            self.used += 1
+            remaining = max(0, self.quota - self.used)
+            reset = self.window - (now - self.start)
+            return self.used <= self.quota, remaining, reset
+
+
+def make_handler(threads, rate_window, latency, truncate=None):
+    flat = {}
+    for t in threads.values():
+        flat.update(flatten_comments(t[1]["data"]["children"]))
+    if truncate is not None:
+        threads = {pid: truncate_thread(t, truncate) for pid, t in threads.items()}
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send_json(self, status, payload, remaining, reset):
+            body = json.dumps(payload).encode("utf-8")
+            etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+            if status == 200 and self.headers.get("If-None-Match") == etag:
+                status, body = 304, b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Ratelimit-Remaining", f"{remaining:.1f}")
+            self.send_header("X-Ratelimit-Reset", str(int(reset) + 1))
+            if status in (200, 304):
+                self.send_header("ETag", etag)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            ok, remaining, reset = rate_window.hit()
+            if latency:
+                time.sleep(latency)
+            if not ok:
+                self.send_json(429, {"message": "Too Many Requests", "error": 429}, remaining, reset)
+                return
+
+            parts = urlsplit(self.path)
+            path = parts.path
+
+            if path == "/api/morechildren.json":
+                ids = parse_qs(parts.query).get("children", [""])[0].split(",")
+                things = [flat[i] for i in ids if i in flat]
+                self.send_json(200, {"json": {"errors": [], "data": {"things": things}}}, remaining, reset)
+                return
+
+            m = re.match(r"^/r/([^/]+)/search\.json$", path)
+            if m:
+                sub = m.group(1).lower()
+                children = [
+                    {"kind": "t3", "data": t[0]["data"]["children"][0]["data"]}
+                    for t in threads.values()
+                    if t[0]["data"]["children"][0]["data"]["subreddit"].lower() == sub
+                ]
+                self.send_json(200, {"kind": "Listing", "data": {"children": children}}, remaining, reset)
+                return
+
+            m = re.match(r"^/r/[^/]+/comments/([^/]+)/", path)
+            if m and m.group(1) in threads:
+                self.send_json(200, threads[m.group(1)], remaining, reset)
+                return
+
+            self.send_json(404, {"message": "Not Found", "error": 404}, remaining, reset)
+
+        def log_message(self, format, *args):
+            pass  # keep crawler output readable
+
+    return Handler
+
+
+def serve(port=8765, canned=DEFAULT_CANNED, quota=600, window=600, latency=0.0, truncate=None):
+    threads = load_threads(canned)
+    handler = make_handler(threads, RateWindow(quota, window), latency, truncate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"Serving {len(threads)} canned threads from {canned} on http://127.0.0.1:{port}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for reddit.com serving canned JSON")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--canned", default=DEFAULT_CANNED, help="folder of saved thread .json files")
+    parser.add_argument("--quota", type=int, default=600, help="requests allowed per window before 429")
+    parser.add_argument("--window", type=float, default=600, help="rate limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay added to every response")
+    parser.add_argument("--truncate", type=int, default=None,
+                        help="only serve the first N top-level comments, rest behind a 'more' stub")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.canned, args.quota, args.window, args.latency, args.truncate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
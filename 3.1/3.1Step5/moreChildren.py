@@ -0,0 +1,135 @@
+# Helpers for Reddit's "more" placeholders.
+# A thread JSON only contains the first few hundred comments, the rest are
+# {"kind": "more", "data": {"children": [ids...]}} stubs. /api/morechildren
+# returns those comments as a flat list (each with its parent_id), which we
+# graft back into the tree so process_comments_to_jsonl sees the full thread.
+
+MORECHILDREN_BATCH = 100  # max ids Reddit accepts per call
+
+
+def post_fullname(thread):
+    """t3_xxx of the thread's post (the link_id morechildren wants)"""
+    return thread[0]["data"]["children"][0]["data"]["name"]
+
+
+def _walk(children):
+    """Yield every node of a comment listing (t1 and more), depth first"""
+    stack = list(reversed(children))
+    while stack:
+        node = stack.pop()
+        yield node
+        replies = node["data"].get("replies") if node.get("kind") == "t1" else None
+        if replies and isinstance(replies, dict):
+            stack.extend(reversed(replies["data"]["children"]))
+
+
+def collect_more_ids(thread, requested=None):
+    """Comment ids hidden behind "more" stubs that haven't been requested yet"""
+    requested = requested or set()
+    if not thread or len(thread) < 2:
+        return []
+    ids = []
+    for node in _walk(thread[1]["data"]["children"]):
+        if node.get("kind") == "more":
+            # "continue this thread" stubs have no children, they need a separate permalink fetch
+            ids.extend(i for i in node["data"].get("children", []) if i not in requested)
+    return list(dict.fromkeys(ids))
+
+
+def morechildren_params(link_id, ids):
+    return {
+        "api_type": "json",
+        "link_id": link_id,
+        "children": ",".join(ids),
+        "raw_json": 1,
+    }
+
+
+def things_from_response(response):
+    if not response:
+        return []
+    return response.get("json", {}).get("data", {}).get("things", [])
+
+
+def graft_things(thread, things):
+    """
+    Attach flat morechildren results to their parents (by parent_id) inside the thread.
+    Top-level comments (parent t3_) go to the comment listing; anything whose parent
+    can't be found is kept at the top level rather than dropped.
+    """
+    top_level = thread[1]["data"]["children"]
+    link_id = post_fullname(thread)
+    by_name = {n["data"]["name"]: n for n in _walk(top_level) if n.get("kind") == "t1"}
+    existing = set(by_name)
+
+    pending = [t for t in things if t.get("kind") in ("t1", "more")]
+    # A child can come back before its parent, so keep passing until nothing moves
+    while pending:
+        still_pending = []
+        for thing in pending:
+            data = thing["data"]
+            if thing["kind"] == "t1" and data["name"] in existing:
+                continue  # already in the tree
+            parent_id = data.get("parent_id")
+            if parent_id == link_id:
+                siblings = top_level
+            elif parent_id in by_name:
+                parent = by_name[parent_id]["data"]
+                if not isinstance(parent.get("replies"), dict):
+                    parent["replies"] = {"kind": "Listing", "data": {"children": []}}
+                siblings = parent["replies"]["data"]["children"]
+            else:
+                still_pending.append(thing)
+                continue
+            siblings.append(thing)
+            if thing["kind"] == "t1":
+                by_name[data["name"]] = thing
+                existing.add(data["name"])
+        if len(still_pending) == len(pending):
+            top_level.extend(still_pending)  # orphans, parent_id is still kept on the record
+            break
+        pending = still_pending
+    return thread
+
+
+def expand_more(thread, fetch_json, morechildren_url, max_calls=None):
+    """
+    Resolve every "more" stub in the thread, 100 ids per call, including stubs
+    that appear inside morechildren results. fetch_json(url, params) does the
+    actual (rate limited) request. Returns the number of calls made.
+    max_calls stops early (per-post comment cap), the remaining stubs stay in the thread.
+    """
+    requested = set()
+    calls = 0
+    link_id = post_fullname(thread)
+    while True:
+        ids = collect_more_ids(thread, requested)
+        if not ids:
+            return calls
+        for i in range(0, len(ids), MORECHILDREN_BATCH):
+            if max_calls is not None and calls >= max_calls:
+                return calls
+            batch = ids[i:i + MORECHILDREN_BATCH]
+            requested.update(batch)
+            response = fetch_json(morechildren_url, morechildren_params(link_id, batch))
+            calls += 1
+            graft_things(thread, things_from_response(response))
+
+
+async def expand_more_async(thread, fetch_json_async, morechildren_url, max_calls=None):
+    """Same as expand_more but fetch_json_async is awaited (shares the async limiter)"""
+    requested = set()
+    calls = 0
+    link_id = post_fullname(thread)
+    while True:
+        ids = collect_more_ids(thread, requested)
+        if not ids:
+            return calls
+        for i in range(0, len(ids), MORECHILDREN_BATCH):
+            if max_calls is not None and calls >= max_calls:
+                return calls
+            batch = ids[i:i + MORECHILDREN_BATCH]
+            requested.update(batch)
+            response = await fetch_json_async(morechildren_url, morechildren_params(link_id, batch))
+            calls += 1
+            graft_things(thread, things_from_response(response))
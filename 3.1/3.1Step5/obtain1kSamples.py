@@ -1,18 +1,43 @@
 import pandas as pd
 
-# Load Sheet 3
-df = pd.read_excel("ai_filtered_three_sheets.xlsx", sheet_name="All_Unique_Comments(1)")
+from bm25Rank import rank_comments, stratified_by_score, top_k
+from streamSampler import sample_file
 
-# Random sample 1000 records
-sample_df = df.sample(n=2000, random_state=42)
+# mode: "balanced"   -> streamSampler.py: equal share per subreddit x conditions_met, post cap, manifest
+#       "random"     -> uniform draw (the old behaviour)
+#       "top"        -> the n comments ranking highest for the AI-hiring query (bm25Rank.py)
+#       "stratified" -> n/buckets from each BM25 score bucket, weak and strong matches alike
+def obtain_samples(input_file="ai_filtered_three_sheets.xlsx", output_file="eval_sample_1k.xlsx",
+                   sheet_name="All_Unique_Comments", n=2000, mode="balanced", buckets=4):
+    if mode == "balanced":
+        return sample_file(input_file, output_file, n=n, sheet_name=sheet_name)
 
-# Save
-sample_df.to_excel("eval_sample_1k.xlsx", index=False)
+    # Load Sheet 3
+    df = pd.read_excel(input_file, sheet_name=sheet_name)
 
-# Check your sample proportions
-print("Sample breakdown:")
-print(sample_df['conditions_met'].value_counts())
-print(f"\nPercentages:")
-for condition, count in sample_df['conditions_met'].value_counts().items():
-    pct = count/1000*100
-    print(f"  {condition}: {pct:.1f}%")
+    if mode == "random":
+        # Random sample 1000 records
+        sample_df = df.sample(n=n, random_state=42)
+    elif mode == "top":
+        sample_df = top_k(rank_comments(df), n)
+    elif mode == "stratified":
+        sample_df = stratified_by_score(rank_comments(df), n, buckets=buckets)
+    else:
+        raise ValueError(f"mode must be 'balanced', 'random', 'top' or 'stratified', got {mode!r}")
+
+    # Save
+    sample_df.to_excel(output_file, index=False)
+
+    # Check your sample proportions
+    print("Sample breakdown:")
+    print(sample_df['conditions_met'].value_counts())
+    print(f"\nPercentages:")
+    for condition, count in sample_df['conditions_met'].value_counts().items():
+        pct = count/len(sample_df)*100
+        print(f"  {condition}: {pct:.1f}%")
+    if "bm25_bucket" in sample_df:
+        print("\nPer score bucket:")
+        print(sample_df['bm25_bucket'].value_counts().sort_index())
+
+if __name__ == "__main__":
+    obtain_samples()
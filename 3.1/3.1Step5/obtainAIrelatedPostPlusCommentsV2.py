@@ -1,69 +1,88 @@
+import numpy as np
 import pandas as pd
-import re
 
-def filter_ai_comments_three_sheets(input_file="all_raw_comments.xlsx", output_file="ai_filtered_three_sheets.xlsx"):
+from commentsIO import list_columns, load_comments, save_sheets
+from keywordMatcher import KeywordMatcher
+
+# Define keyword categories
+interview_terms = [
+    'HireVue', 'one[- ]way interview', 'video interview', 'ai interview', 
+    'automated interview', 'pre[- ]recorded interview', 'digital interview',
+    'phone screen', 'screening call', 'ai assistant', 'chatbot',
+    'Olivia Paradox', 'Paradox', 'ai recruiter'
+]
+
+ats_terms = [
+    'ATS', 'applicant tracking', 'resume screening', 'auto reject', 'auto[- ]reject',
+    'automated reject', 'automated rejection', 'keyword filter', 'ai screening',
+    'algorithm rejected', 'flagged as high-risk', 'screening system'
+]
+
+candidate_ai_terms = [
+    'fake candidate', 'ai generated resume', 'ai resume', 'chatgpt application',
+    'ai slop', 'bot application', 'impersonation', 'deepfake',
+    'candidates using ai', 'ai generated application', 'chatgpt cover letter'
+]
+
+opinion_terms = [
+    'ai taking your job', 'ai replacing recruiters', 'automated hiring',
+    'double standard', 'hypocrit', 'rules for thee', 'ai for me',
+    'boycott ai interviews', 'ai outperforms human', 'ai interview boycott'
+]
+
+assessment_terms = [
+    'personality test', 'cognitive test', 'assessment tool', 'skills test',
+    'coding test', 'technical assessment'
+]
+
+# Combine all non-AI terms
+other_keywords = interview_terms + ats_terms + candidate_ai_terms + opinion_terms + assessment_terms
+
+
+def build_three_sheet_matcher():
+    """'AI' case sensitive, every other keyword case insensitive, all with word boundaries"""
+    return (KeywordMatcher()
+            .add('AI', group='ai', case_sensitive=True)
+            .add_all(other_keywords, group='other'))
+
+
+def has_keywords(matcher, text):
+    """Same test for titles (cond1) and comment texts (cond2): any AI or other keyword"""
+    return bool(matcher.scan(text))
+
+
+def filter_ai_comments_three_sheets(input_file="all_raw_comments.parquet", output_file="ai_filtered_three_sheets.parquet",
+                                    export_excel=True):
     """
     THREE SHEETS with mixed case sensitivity:
     - "AI" must be uppercase
     - All other keywords are case insensitive
+
+    input_file can be .parquet, .feather, .xlsx or the jsonl_crawl_full folder;
+    only the title/text/subreddit/url/id columns are read.
     """
     
-    print(f"Loading {input_file}...")
-    df = pd.read_excel(input_file)
-    print(f"Loaded {len(df):,} total comments")
-    
-    # Detect column names
-    title_col = next((col for col in df.columns if 'title' in col.lower()), 'post_title')
-    text_col = next((col for col in df.columns if 'comment' in col.lower() or 'text' in col.lower()), 'comment_text')
-    subreddit_col = next((col for col in df.columns if 'subreddit' in col.lower()), 'subreddit')
-    url_col = next((col for col in df.columns if 'url' in col.lower()), 'post_url')
+    # Detect column names (from the schema, before loading)
+    columns = list_columns(input_file)
+    title_col = next((col for col in columns if 'title' in col.lower()), 'post_title')
+    text_col = next((col for col in columns if 'comment' in col.lower() or 'text' in col.lower()), 'comment_text')
+    subreddit_col = next((col for col in columns if 'subreddit' in col.lower()), 'subreddit')
+    url_col = next((col for col in columns if 'url' in col.lower()), 'post_url')
     
     # Create a unique ID if not present
-    if 'id' not in df.columns and 'comment_id' not in df.columns:
-        df['temp_id'] = df.index.astype(str)
+    if 'id' not in columns and 'comment_id' not in columns:
         id_col = 'temp_id'
     else:
-        id_col = 'id' if 'id' in df.columns else 'comment_id'
+        id_col = 'id' if 'id' in columns else 'comment_id'
     
-    print(f"\nUsing columns: title='{title_col}', text='{text_col}', subreddit='{subreddit_col}', url='{url_col}', id='{id_col}'")
+    print(f"Loading {input_file}...")
+    needed = [title_col, text_col, subreddit_col, url_col] + ([id_col] if id_col != 'temp_id' else [])
+    df = load_comments(input_file, columns=list(dict.fromkeys(needed)))
+    print(f"Loaded {len(df):,} total comments")
+    if id_col == 'temp_id':
+        df['temp_id'] = df.index.astype(str)
     
-    # Define keyword categories
-    interview_terms = [
-        'HireVue', 'one[- ]way interview', 'video interview', 'ai interview', 
-        'automated interview', 'pre[- ]recorded interview', 'digital interview',
-        'phone screen', 'screening call', 'ai assistant', 'chatbot',
-        'Olivia Paradox', 'Paradox', 'ai recruiter'
-    ]
-    
-    ats_terms = [
-        'ATS', 'applicant tracking', 'resume screening', 'auto reject', 'auto[- ]reject',
-        'automated reject', 'automated rejection', 'keyword filter', 'ai screening',
-        'algorithm rejected', 'flagged as high-risk', 'screening system'
-    ]
-    
-    candidate_ai_terms = [
-        'fake candidate', 'ai generated resume', 'ai resume', 'chatgpt application',
-        'ai slop', 'bot application', 'impersonation', 'deepfake',
-        'candidates using ai', 'ai generated application', 'chatgpt cover letter'
-    ]
-    
-    opinion_terms = [
-        'ai taking your job', 'ai replacing recruiters', 'automated hiring',
-        'double standard', 'hypocrit', 'rules for thee', 'ai for me',
-        'boycott ai interviews', 'ai outperforms human', 'ai interview boycott'
-    ]
-    
-    assessment_terms = [
-        'personality test', 'cognitive test', 'assessment tool', 'skills test',
-        'coding test', 'technical assessment'
-    ]
-    
-    # Combine all non-AI terms
-    other_keywords = interview_terms + ats_terms + candidate_ai_terms + opinion_terms + assessment_terms
-    other_pattern = r'\b(' + '|'.join(other_keywords) + r')\b'
-    
-    # AI pattern (case sensitive)
-    ai_pattern = r'\bAI\b'
+    print(f"\nUsing columns: title='{title_col}', text='{text_col}', subreddit='{subreddit_col}', url='{url_col}', id='{id_col}'")
     
     title_series = df[title_col].astype(str)
     text_series = df[text_col].astype(str)
@@ -72,62 +91,65 @@ def filter_ai_comments_three_sheets(input_file="all_raw_comments.xlsx", output_f
     print("   - 'AI' must be uppercase")
     print(f"   - {len(other_keywords)} other keywords are case insensitive")
     
+    # One automaton for both conditions, each text is scanned once
+    matcher = build_three_sheet_matcher()
+    
     # CONDITION 1: Posts with relevant keywords in title
-    # Check for AI (case sensitive)
-    posts_with_ai_title = set(df[title_series.str.contains(ai_pattern, na=False, regex=True)][url_col].unique())
-    # Check for other keywords (case insensitive)
-    posts_with_other_title = set(df[title_series.str.contains(other_pattern, na=False, regex=True, case=False)][url_col].unique())
-    posts_with_keywords = posts_with_ai_title.union(posts_with_other_title)
+    # Each distinct title is scanned once instead of once per comment
+    title_hits = {title: has_keywords(matcher, title) for title in title_series.unique()}
+    posts_with_keywords = set(df[title_series.map(title_hits)][url_col].unique())
     df['cond1'] = df[url_col].isin(posts_with_keywords)
     print(f"\n📌 Found {len(posts_with_keywords):,} unique posts with relevant keywords in title")
     
     # CONDITION 2: Comments with relevant keywords in text
-    df['cond2'] = (
-        text_series.str.contains(ai_pattern, na=False, regex=True) | 
-        text_series.str.contains(other_pattern, na=False, regex=True, case=False)
-    )
+    df['cond2'] = [has_keywords(matcher, text) for text in text_series]
     print(f"📌 Found {df['cond2'].sum():,} comments with relevant keywords in text")
     
+    columns_out = [title_col, text_col, subreddit_col, url_col, id_col]
+    cond1 = df['cond1'].to_numpy()
+    cond2 = df['cond2'].to_numpy()
+    
     # SHEET 1: All comments from posts with keywords in title
-    sheet1_df = df[df['cond1']].copy()
-    sheet1_df = sheet1_df[[title_col, text_col, subreddit_col, url_col, id_col]]
+    sheet1_df = df.loc[cond1, columns_out].copy()
     sheet1_df['source'] = 'post_title_has_keywords'
     
     # SHEET 2: All comments with keywords in text
-    sheet2_df = df[df['cond2']].copy()
-    sheet2_df = sheet2_df[[title_col, text_col, subreddit_col, url_col, id_col]]
+    sheet2_df = df.loc[cond2, columns_out].copy()
     sheet2_df['source'] = 'comment_text_has_keywords'
     
-    # SHEET 3: Sheet1 + Sheet2 combined, duplicates removed
-    sheet3_df = pd.concat([sheet1_df, sheet2_df], ignore_index=True)
-    initial_count = len(sheet3_df)
-    sheet3_df = sheet3_df.drop_duplicates(subset=[id_col], keep='first')
-    duplicates_removed = initial_count - len(sheet3_df)
-    
-    # Add column showing which conditions were met
-    def get_merged_source(row):
-        in_sheet1 = row[id_col] in sheet1_df[id_col].values
-        in_sheet2 = row[id_col] in sheet2_df[id_col].values
-        
-        if in_sheet1 and in_sheet2:
-            return 'both_conditions'
-        elif in_sheet1:
-            return 'post_title_only'
-        else:
-            return 'comment_text_only'
-    
-    sheet3_df['conditions_met'] = sheet3_df.apply(get_merged_source, axis=1)
+    # SHEET 3: every comment meeting either condition, one row per id.
+    # Built straight from the masks: rows meeting cond1 come first (as if Sheet 1 were
+    # listed before Sheet 2), so keeping the first row per id gives the same rows and
+    # 'source' values as concatenating the two sheets and dropping duplicates.
+    either = cond1 | cond2
+    priority = np.where(cond1, 0, 1)[either]
+    order = np.argsort(priority, kind='stable')
+    sheet3_df = df.loc[either, columns_out].iloc[order]
+    sheet3_df['source'] = np.where(priority[order] == 0, 'post_title_has_keywords', 'comment_text_has_keywords')
+    sheet3_df = sheet3_df[~sheet3_df[id_col].duplicated(keep='first')]
+    duplicates_removed = len(sheet1_df) + len(sheet2_df) - len(sheet3_df)
+    
+    # Add column showing which conditions were met (per comment id, hash lookups
+    # instead of scanning the other sheets for every row)
+    in_sheet1 = sheet3_df[id_col].isin(pd.unique(sheet1_df[id_col])).to_numpy()
+    in_sheet2 = sheet3_df[id_col].isin(pd.unique(sheet2_df[id_col])).to_numpy()
+    sheet3_df['conditions_met'] = np.select(
+        [in_sheet1 & in_sheet2, in_sheet1],
+        ['both_conditions', 'post_title_only'],
+        default='comment_text_only'
+    )
     
     # Sort all sheets
     sheet1_df = sheet1_df.sort_values(title_col)
     sheet2_df = sheet2_df.sort_values(title_col)
     sheet3_df = sheet3_df.sort_values(title_col)
     
-    # Save to Excel with three sheets
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        sheet1_df.to_excel(writer, sheet_name='Posts_with_Keywords_Title', index=False)
-        sheet2_df.to_excel(writer, sheet_name='Comments_with_Keywords_Text', index=False)
-        sheet3_df.to_excel(writer, sheet_name='All_Unique_Comments', index=False)
+    # Save three sheets (Parquet per sheet, plus the Excel workbook if export_excel)
+    written = save_sheets({
+        'Posts_with_Keywords_Title': sheet1_df,
+        'Comments_with_Keywords_Text': sheet2_df,
+        'All_Unique_Comments': sheet3_df,
+    }, output_file, export_excel=export_excel)
     
     # Print summary
     print(f"\n{'='*60}")
@@ -149,7 +171,7 @@ def filter_ai_comments_three_sheets(input_file="all_raw_comments.xlsx", output_f
         pct = count/len(sheet3_df)*100
         print(f"  - {source}: {count:,} comments ({pct:.1f}%)")
     
-    print(f"\n✅ Saved to {output_file}")
+    print(f"\n✅ Saved to {', '.join(written)}")
 
 if __name__ == "__main__":
     filter_ai_comments_three_sheets()
@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from commentsIO import save_sheets
+from convertAllJsonlToParquet import subreddits
+from obtainAIrelatedPostPlusCommentsV2 import build_three_sheet_matcher, has_keywords
+from strictFilterComments import build_strict_matcher, is_strict_match
+
+# Multi-core version of the strict / three-sheet filters for big corpora.
+# The corpus is cut into shards that workers can read on their own:
+#   - JSONL folder (jsonl_crawl_full/): byte ranges of SHARD_BYTES, aligned to line starts
+#   - Parquet dataset (all_raw_comments.parquet/): one shard per row group
+# Each worker process builds the keyword automaton once and returns the matching
+# rows of its shards. The results are put back in corpus order (file, then offset /
+# row group) and deduplicated by comment id keeping the first occurrence, so the
+# output is the same whatever the number of workers.
+#
+#   python parallelFilter.py --mode strict --input jsonl_crawl_full --workers 8
+#   python parallelFilter.py --mode three --input all_raw_comments.parquet --output ai_filtered_three_sheets.parquet
+
+SHARD_BYTES = 64 * 1024 * 1024
+COLUMNS = ["post_title", "comment_text", "subreddit", "post_url", "comment_id"]
+SHEETS = ["Posts_with_Keywords_Title", "Comments_with_Keywords_Text", "All_Unique_Comments"]
+
+_matcher = None  # per worker process
+
+
+# --- Shards ---
+def jsonl_shards(input_folder, subs=subreddits, shard_bytes=SHARD_BYTES):
+    for sub in subs:
+        path = os.path.join(input_folder, f"{sub}_all.jsonl")
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found, skipping")
+            continue
+        size = os.path.getsize(path)
+        for start in range(0, size, shard_bytes):
+            yield ("jsonl", path, sub, start, min(start + shard_bytes, size))
+
+
+def parquet_shards(dataset):
+    import pyarrow.parquet as pq
+    files = [os.path.join(root, name) for root, _, names in os.walk(dataset)
+             for name in names if name.endswith(".parquet")] if os.path.isdir(dataset) else [dataset]
+    for path in sorted(files):
+        # subreddit comes from the hive partition folder (subreddit=<sub>)
+        part = os.path.basename(os.path.dirname(path))
+        sub = part.split("=", 1)[1] if part.startswith("subreddit=") else None
+        for row_group in range(pq.ParquetFile(path).num_row_groups):
+            yield ("parquet", path, sub, row_group, None)
+
+
+def make_shards(input_path, shard_bytes=SHARD_BYTES):
+    if input_path.lower().rstrip("/\\").endswith(".parquet"):
+        return list(parquet_shards(input_path))
+    return list(jsonl_shards(input_path, shard_bytes=shard_bytes))
+
+
+def read_jsonl_range(path, sub, start, end):
+    """Rows of the lines that *start* inside [start, end)"""
+    with open(path, "rb") as f:
+        if start:
+            # finish the line the previous shard owns (a no-op if start is a line start)
+            f.seek(start - 1)
+            f.readline()
+        while f.tell() < end:
+            offset = f.tell()
+            line = f.readline()
+            if not line:
+                break
+            try:
+                record = json.loads(line)
+                yield offset, {
+                    "post_title": record["metadata"]["post_title"],
+                    "comment_text": record["text"],
+                    "subreddit": sub,
+                    "post_url": record["metadata"]["url"],
+                    # no line number here, so id-less records get a byte offset based one
+                    "comment_id": record.get("id", f"{sub}_@{offset}"),
+                }
+            except (json.JSONDecodeError, KeyError):
+                continue
+
+
+def read_parquet_row_group(path, sub, row_group):
+    import pyarrow.parquet as pq
+    pf = pq.ParquetFile(path)
+    wanted = [c for c in COLUMNS if c in pf.schema_arrow.names]
+    table = pf.read_row_group(row_group, columns=wanted)
+    for i, row in enumerate(table.to_pylist()):
+        if sub is not None:
+            row["subreddit"] = sub
+        yield i, row
+
+
+def iter_shard(shard):
+    kind, path, sub, a, b = shard
+    return read_jsonl_range(path, sub, a, b) if kind == "jsonl" else read_parquet_row_group(path, sub, a)
+
+
+# --- Workers ---
+def _init_worker(mode):
+    global _matcher
+    _matcher = build_strict_matcher() if mode == "strict" else build_three_sheet_matcher()
+
+
+def filter_shard(args):
+    """(shard index, mode, shard) -> (shard index, rows read, [(position, row, flags)])"""
+    index, mode, shard = args
+    matches = []
+    read = 0
+    titles = {}
+    for position, row in iter_shard(shard):
+        read += 1
+        if mode == "strict":
+            if is_strict_match(_matcher.groups_in(str(row["comment_text"]))):
+                matches.append((position, row, None))
+            continue
+        url = row["post_url"]
+        if url not in titles:
+            titles[url] = has_keywords(_matcher, str(row["post_title"]))
+        cond1 = titles[url]
+        cond2 = has_keywords(_matcher, str(row["comment_text"]))
+        if cond1 or cond2:
+            matches.append((position, row, (cond1, cond2)))
+    return index, read, matches
+
+
+# --- Merge ---
+def merge_strict(matches):
+    rows, seen, dupes = [], set(), 0
+    for _, row, _ in matches:
+        if row["comment_id"] in seen:
+            dupes += 1
+            continue
+        seen.add(row["comment_id"])
+        rows.append(row)
+    if dupes:
+        print(f"  {dupes:,} duplicate comment ids dropped")
+    return {"strict_ai_hiring_comments": pd.DataFrame(rows, columns=COLUMNS)}
+
+
+def merge_three_sheets(matches):
+    sheet1, sheet2, sheet3, seen = [], [], [], set()
+    for _, row, (cond1, cond2) in matches:
+        if cond1:
+            sheet1.append(dict(row, source="post_title_has_keywords"))
+        if cond2:
+            sheet2.append(dict(row, source="comment_text_has_keywords"))
+        if row["comment_id"] not in seen:
+            seen.add(row["comment_id"])
+            sheet3.append(dict(
+                row,
+                source="post_title_has_keywords" if cond1 else "comment_text_has_keywords",
+                conditions_met="both_conditions" if cond1 and cond2 else
+                               "post_title_only" if cond1 else "comment_text_only",
+            ))
+    return {
+        SHEETS[0]: pd.DataFrame(sheet1, columns=COLUMNS + ["source"]),
+        SHEETS[1]: pd.DataFrame(sheet2, columns=COLUMNS + ["source"]),
+        SHEETS[2]: pd.DataFrame(sheet3, columns=COLUMNS + ["source", "conditions_met"]),
+    }
+
+
+def parallel_filter(input_path, output_file, mode="strict", workers=None, shard_bytes=SHARD_BYTES,
+                    export_excel=False):
+    workers = workers or os.cpu_count()
+    shards = make_shards(input_path, shard_bytes)
+    print(f"Filtering {input_path} ({mode}) in {len(shards)} shards on {workers} worker processes...")
+
+    start = time.time()
+    per_shard, total_read = {}, 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(mode,)) as pool:
+        jobs = [(i, mode, shard) for i, shard in enumerate(shards)]
+        for index, read, matches in pool.map(filter_shard, jobs, chunksize=1):
+            per_shard[index] = matches
+            total_read += read
+    elapsed = time.time() - start
+
+    # Corpus order regardless of which worker finished first
+    ordered = [m for i in range(len(shards)) for m in per_shard[i]]
+    sheets = merge_strict(ordered) if mode == "strict" else merge_three_sheets(ordered)
+    written = save_sheets(sheets, output_file, export_excel=export_excel)
+
+    print(f"Read {total_read:,} comments in {elapsed:.1f}s ({total_read / max(elapsed, 1e-9):,.0f} comments/s)")
+    for name, df in sheets.items():
+        print(f"  {name}: {len(df):,} comments")
+    print(f"✅ Saved to {', '.join(written)}")
+    return sheets
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the keyword filters over shards of the corpus in parallel")
+    parser.add_argument("--mode", choices=["strict", "three"], default="strict")
+    parser.add_argument("--input", default="jsonl_crawl_full", help="jsonl folder or Parquet dataset")
+    parser.add_argument("--output", default=None, help=".parquet or .xlsx (default depends on --mode)")
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--shard-mb", type=int, default=SHARD_BYTES // (1024 * 1024), help="JSONL shard size")
+    parser.add_argument("--excel", action="store_true", help="also write the .xlsx next to a .parquet output")
+    args = parser.parse_args()
+
+    default_output = "ai_filtered_strict.parquet" if args.mode == "strict" else "ai_filtered_three_sheets.parquet"
+    parallel_filter(args.input, args.output or default_output, args.mode, args.workers,
+                    args.shard_mb * 1024 * 1024, args.excel)
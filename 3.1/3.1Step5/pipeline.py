@@ -0,0 +1,274 @@
+import argparse
+import hashlib
+import importlib
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# One entry point for the Mtd2 V2 flow:
+#   crawl -> convert -> filter_three_sheets -> sample_1k / export_2col
+#                    -> filter_strict
+#                    -> extract_titles
+#         -> search_index
+# Each stage declares the files it reads and writes and the source files its
+# result depends on. Before a stage runs, its inputs + code + params are hashed;
+# if the hash matches the last successful run (and the outputs are still there)
+# the stage is skipped. So editing a keyword list in strictFilterComments.py only
+# re-runs filter_strict, never the crawl or the conversion.
+# Stages whose inputs are ready run in parallel worker processes.
+#
+#   python pipeline.py                    -> everything except the crawl
+#   python pipeline.py --crawl            -> crawl first (network, never skipped)
+#   python pipeline.py --only filter_strict --force filter_strict
+#   python pipeline.py --dry-run          -> show what would run
+
+STATE_FILE = "pipeline_state.json"
+MAX_WORKERS = 3
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))  # stage code lives next to this file, data in the cwd
+
+
+class Stage:
+    def __init__(self, name, target, inputs=(), outputs=(), code=(), kwargs=None, manual=False):
+        self.name = name
+        self.target = target            # "module:function", imported in the worker process
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.code = list(code)          # source files whose edits invalidate the stage
+        self.kwargs = kwargs or {}
+        self.manual = manual            # only runs when asked for (e.g. the network crawl)
+
+
+STAGES = [
+    Stage("crawl", "fullCrawl:main",
+          outputs=["jsonl_crawl_full"],
+          code=["fullCrawl.py", "asyncCrawl.py", "moreChildren.py", "redditFetch.py", "crawlState.py",
+                "dedupIndex.py", "invertedIndex.py", "crawlBudget.py", "obtainAIrelatedPostPlusCommentsV2.py",
+                "keywordMatcher.py"],
+          manual=True),
+    Stage("convert", "convertAllJsonlToParquet:create_raw_parquet",
+          inputs=["jsonl_crawl_full"], outputs=["all_raw_comments.parquet"],
+          code=["convertAllJsonlToParquet.py", "dedupIndex.py"],
+          kwargs={"input_folder": "jsonl_crawl_full", "output_dataset": "all_raw_comments.parquet"}),
+    Stage("search_index", "invertedIndex:update_index",
+          inputs=["jsonl_crawl_full"], outputs=["comment_search.sqlite"],
+          code=["invertedIndex.py"],
+          kwargs={"input_folder": "jsonl_crawl_full", "db_file": "comment_search.sqlite"}),
+    Stage("filter_three_sheets", "obtainAIrelatedPostPlusCommentsV2:filter_ai_comments_three_sheets",
+          inputs=["all_raw_comments.parquet"],
+          outputs=["ai_filtered_three_sheets", "ai_filtered_three_sheets.xlsx"],
+          code=["obtainAIrelatedPostPlusCommentsV2.py", "keywordMatcher.py", "commentsIO.py"],
+          kwargs={"input_file": "all_raw_comments.parquet", "output_file": "ai_filtered_three_sheets.parquet"}),
+    Stage("filter_strict", "strictFilterComments:filter_ai_comments_strict",
+          inputs=["all_raw_comments.parquet"],
+          outputs=["ai_filtered_strict.parquet", "ai_filtered_strict.xlsx"],
+          code=["strictFilterComments.py", "keywordMatcher.py", "commentsIO.py"],
+          kwargs={"input_file": "all_raw_comments.parquet", "output_file": "ai_filtered_strict.parquet"}),
+    Stage("extract_titles", "extractPostTitles:extract_unique_post_titles_from_excel",
+          inputs=["all_raw_comments.parquet"], outputs=["unique_post_titles.xlsx"],
+          code=["extractPostTitles.py", "commentsIO.py"],
+          kwargs={"input_file": "all_raw_comments.parquet", "output_file": "unique_post_titles.xlsx"}),
+    Stage("sample_1k", "streamSampler:sample_file",
+          inputs=["ai_filtered_three_sheets"], outputs=["eval_sample_1k.xlsx", "eval_sample_1k.manifest.json"],
+          code=["streamSampler.py"],
+          kwargs={"input_file": "ai_filtered_three_sheets/All_Unique_Comments.parquet",
+                  "output_file": "eval_sample_1k.xlsx", "n": 2000}),
+    Stage("export_2col", "export2Col:export_two_columns",
+          inputs=["ai_filtered_three_sheets.xlsx"], outputs=["sample_comments.json"],
+          code=["export2Col.py", "bm25Rank.py", "strictFilterComments.py", "keywordMatcher.py"],
+          kwargs={"input_file": "ai_filtered_three_sheets.xlsx", "output_file": "sample_comments.json"}),
+]
+
+
+# --- Hashing ---
+class FileHasher:
+    """sha256 of file contents, re-hashing only files whose size/mtime changed since last run"""
+
+    def __init__(self, known=None):
+        self.known = known or {}  # path -> [size, mtime_ns, digest]
+
+    def file_digest(self, path):
+        st = os.stat(path)
+        cached = self.known.get(path)
+        if cached and cached[0] == st.st_size and cached[1] == st.st_mtime_ns:
+            return cached[2]
+        h = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                h.update(block)
+        digest = h.hexdigest()
+        self.known[path] = [st.st_size, st.st_mtime_ns, digest]
+        return digest
+
+    def digest(self, path):
+        """Files hash their bytes, folders hash every (relative path, file hash) inside"""
+        if not os.path.exists(path):
+            return "missing"
+        if os.path.isfile(path):
+            return self.file_digest(path)
+        h = hashlib.sha256()
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                full = os.path.join(root, name)
+                h.update(os.path.relpath(full, path).replace(os.sep, "/").encode("utf-8"))
+                h.update(self.file_digest(full).encode("ascii"))
+        return h.hexdigest()
+
+
+def stage_fingerprint(stage, hasher):
+    h = hashlib.sha256()
+    h.update(stage.target.encode("utf-8"))
+    h.update(json.dumps(stage.kwargs, sort_keys=True).encode("utf-8"))
+    for name in stage.code:
+        h.update(name.encode("utf-8"))
+        h.update(hasher.digest(os.path.join(CODE_DIR, name)).encode("ascii"))
+    for path in stage.inputs:
+        h.update(path.encode("utf-8"))
+        h.update(hasher.digest(path).encode("ascii"))
+    return h.hexdigest()
+
+
+# --- State ---
+def load_state(state_file=STATE_FILE):
+    if not os.path.exists(state_file):
+        return {"stages": {}, "files": {}}
+    with open(state_file, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(state, state_file=STATE_FILE):
+    tmp = state_file + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, state_file)
+
+
+# --- Graph ---
+def dependencies(stages):
+    """stage name -> names of the stages producing its inputs"""
+    producer = {out: s.name for s in stages for out in s.outputs}
+    return {s.name: {producer[i] for i in s.inputs if i in producer and producer[i] != s.name} for s in stages}
+
+
+def select_stages(stages, only=None, include_manual=False):
+    """The requested stages plus everything upstream of them (manual ones only if asked for)"""
+    by_name = {s.name: s for s in stages}
+    unknown = set(only or ()) - set(by_name)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}")
+    deps = dependencies(stages)
+    wanted = set(only) if only else {s.name for s in stages}
+    stack = list(wanted)
+    while stack:
+        for dep in deps[stack.pop()]:
+            if dep not in wanted:
+                wanted.add(dep)
+                stack.append(dep)
+    explicit = set(only or ())
+    return [s for s in stages if s.name in wanted and (not s.manual or include_manual or s.name in explicit)]
+
+
+def run_stage(target, kwargs):
+    """Runs in a worker process"""
+    module_name, func_name = target.split(":")
+    start = time.time()
+    getattr(importlib.import_module(module_name), func_name)(**kwargs)
+    return time.time() - start
+
+
+def run_pipeline(stages=STAGES, only=None, force=(), include_manual=False, dry_run=False,
+                 max_workers=MAX_WORKERS, state_file=STATE_FILE):
+    selected = select_stages(stages, only, include_manual)
+    names = {s.name for s in selected}
+    deps = {name: d & names for name, d in dependencies(selected).items()}
+    state = load_state(state_file)
+    hasher = FileHasher(state.get("files"))
+
+    pending = {s.name: s for s in selected}
+    done, failed, stale, results = set(), set(), set(), {}
+    running = {}
+
+    def should_run(stage):
+        """(run?, fingerprint) - fingerprint is taken once the upstream stages have finished"""
+        fingerprint = stage_fingerprint(stage, hasher)
+        previous = state["stages"].get(stage.name, {}).get("fingerprint")
+        outputs_ok = all(os.path.exists(o) for o in stage.outputs)
+        if stage.manual or stage.name in force or deps[stage.name] & stale:
+            return True, fingerprint
+        return not (fingerprint == previous and outputs_ok), fingerprint
+
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        while pending or running:
+            # Keep scanning while skipped stages unlock their downstream ones
+            progressed = True
+            while progressed:
+                progressed = False
+                for name in [n for n in pending if deps[n] <= done]:
+                    stage = pending.pop(name)
+                    progressed = True
+                    run, fingerprint = should_run(stage)
+                    if not run:
+                        print(f"⏭️  {name}: unchanged, skipped")
+                        results[name] = "skipped"
+                        done.add(name)
+                    elif dry_run:
+                        print(f"▶️  {name}: would run")
+                        results[name] = "would run"
+                        stale.add(name)  # so its downstream stages show up as well
+                        done.add(name)
+                    else:
+                        print(f"▶️  {name}: running")
+                        running[pool.submit(run_stage, stage.target, stage.kwargs)] = (stage, fingerprint)
+
+                # Anything still pending that depends on a failed stage can never run
+                for name in [n for n in pending if deps[n] & failed]:
+                    pending.pop(name)
+                    progressed = True
+                    failed.add(name)
+                    results[name] = "blocked"
+                    print(f"⛔ {name}: blocked by a failed upstream stage")
+
+            if not running:
+                if pending:
+                    raise RuntimeError(f"Cycle or missing producer among: {', '.join(pending)}")
+                break
+
+            finished, _ = wait(list(running), return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage, fingerprint = running.pop(future)
+                try:
+                    seconds = future.result()
+                except Exception as e:
+                    print(f"❌ {stage.name} failed: {e}")
+                    failed.add(stage.name)
+                    results[stage.name] = "failed"
+                    continue
+                print(f"✅ {stage.name}: done in {seconds:.1f}s")
+                state["stages"][stage.name] = {"fingerprint": fingerprint, "finished_at": time.time(),
+                                               "seconds": round(seconds, 2)}
+                state["files"] = hasher.known
+                save_state(state, state_file)
+                done.add(stage.name)
+                results[stage.name] = "ran"
+
+    if not dry_run:
+        state["files"] = hasher.known
+        save_state(state, state_file)
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the Mtd2 V2 pipeline, skipping stages whose inputs/code didn't change")
+    parser.add_argument("--only", nargs="+", help="run only these stages (plus what they depend on)")
+    parser.add_argument("--force", nargs="+", default=[], help="re-run these stages even if unchanged")
+    parser.add_argument("--crawl", action="store_true", help="include the network crawl")
+    parser.add_argument("--dry-run", action="store_true", help="only print what would run")
+    parser.add_argument("-j", "--workers", type=int, default=MAX_WORKERS, help="stages run in parallel")
+    args = parser.parse_args()
+
+    results = run_pipeline(only=args.only, force=set(args.force), include_manual=args.crawl,
+                           dry_run=args.dry_run, max_workers=args.workers)
+    print(f"\n{'='*60}")
+    for name, result in results.items():
+        print(f"  {name}: {result}")
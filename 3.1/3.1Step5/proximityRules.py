@@ -0,0 +1,137 @@
+from bisect import bisect_right
+from collections import Counter
+
+from keywordMatcher import KeywordMatcher
+
+# Declarative co-occurrence rules evaluated on keywordMatcher offsets.
+#   Near("ai", "recruit", within=300)              -> both terms, some pair of occurrences < 300 chars apart
+#   Near("ai", "interview", within=20, unit="tokens") -> same, distance counted in whitespace tokens
+#   TopicCount(topic_words, min_count=3)           -> at least 3 different topic words present
+# Each text is scanned once for the terms of all rules; rules are then checked on
+# the hit offsets (every occurrence, not only the first one like str.find).
+
+
+class Near:
+    def __init__(self, a, b, within=300, unit="chars", name=None):
+        if unit not in ("chars", "tokens"):
+            raise ValueError(f"unit must be 'chars' or 'tokens', got {unit!r}")
+        self.a = a
+        self.b = b
+        self.within = within
+        self.unit = unit
+        self.name = name or f"{a}+{b}"
+
+    def terms(self):
+        return [self.a, self.b]
+
+    def fires(self, positions, token_starts):
+        pa, pb = positions.get(self.a), positions.get(self.b)
+        if not pa or not pb:
+            return False
+        if self.unit == "tokens":
+            pa = [bisect_right(token_starts, p) for p in pa]
+            pb = [bisect_right(token_starts, p) for p in pb]
+        return min_distance(pa, pb) < self.within
+
+
+class TopicCount:
+    def __init__(self, terms, min_count=3, name="topic_count"):
+        self.topic_terms = list(terms)
+        self.min_count = min_count
+        self.name = name
+
+    def terms(self):
+        return self.topic_terms
+
+    def count(self, positions):
+        return sum(1 for t in self.topic_terms if t in positions)
+
+    def fires(self, positions, token_starts):
+        return self.count(positions) >= self.min_count
+
+    def reason(self, positions):
+        # Keeps the old "topic_count:<n>" labels
+        return f"{self.name}:{self.count(positions)}"
+
+
+def min_distance(xs, ys):
+    """Smallest |x - y| over two sorted position lists (two pointers, linear)"""
+    i = j = 0
+    best = float("inf")
+    while i < len(xs) and j < len(ys):
+        d = xs[i] - ys[j]
+        best = min(best, abs(d))
+        if d < 0:
+            i += 1
+        else:
+            j += 1
+    return best
+
+
+def _token_starts(text):
+    starts = []
+    in_token = False
+    for i, ch in enumerate(text):
+        if ch.isspace():
+            in_token = False
+        elif not in_token:
+            starts.append(i)
+            in_token = True
+    return starts
+
+
+class RuleEngine:
+    """
+    engine = RuleEngine([Near("ai", "recruit"), ..., TopicCount(topic_words, 3)])
+    engine.reason(text)               -> name of the first rule that fires, or None
+    engine.evaluate_column(texts)     -> one reason (or None) per text
+    engine.counts                     -> Counter of reasons over every evaluated column
+    Rules are tried in the order given. Terms are matched case insensitively;
+    word_boundary=False keeps the old substring behaviour.
+    """
+
+    def __init__(self, rules, word_boundary=False):
+        self.rules = list(rules)
+        terms = sorted({t for rule in self.rules for t in rule.terms()})
+        self.matcher = KeywordMatcher().add_all(terms, word_boundary=word_boundary).compile()
+        self.needs_tokens = any(getattr(r, "unit", None) == "tokens" for r in self.rules)
+        self.counts = Counter()
+
+    def positions(self, text):
+        """term -> sorted start offsets of every occurrence"""
+        positions = {}
+        for hit in self.matcher.scan(text):
+            positions.setdefault(hit.term, []).append(hit.start)
+        return positions
+
+    def _first_reason(self, text, positions):
+        token_starts = _token_starts(text) if self.needs_tokens else None
+        for rule in self.rules:
+            if rule.fires(positions, token_starts):
+                return rule.reason(positions) if hasattr(rule, "reason") else rule.name
+        return None
+
+    def reason(self, text):
+        if not isinstance(text, str):
+            return None
+        return self._first_reason(text, self.positions(text))
+
+    def fired_rules(self, text):
+        """Every rule that fires (not just the first), for debugging rule sets"""
+        positions = self.positions(text) if isinstance(text, str) else {}
+        token_starts = _token_starts(text) if self.needs_tokens and positions else None
+        return [rule.name for rule in self.rules if rule.fires(positions, token_starts)]
+
+    def evaluate_column(self, texts):
+        """
+        Batch form: scan the whole column first (offsets per row), then run the
+        rules over those offsets. Returns one reason per row, None if no rule fired.
+        """
+        texts = list(texts)
+        all_positions = [self.positions(t) if isinstance(t, str) else {} for t in texts]
+        reasons = [
+            self._first_reason(t, p) if p else None
+            for t, p in zip(texts, all_positions)
+        ]
+        self.counts.update(r for r in reasons if r)
+        return reasons
@@ -0,0 +1,160 @@
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Shared fetch layer for every script that talks to reddit.com
+# - one pooled keep-alive requests.Session (no new TLS handshake per request)
+# - on-disk response cache keyed by URL + params that remembers ETag/Last-Modified
+#   and sends conditional requests, so an unchanged thread costs a 304 instead of
+#   re-downloading the whole JSON
+# - max_age: a cached entry younger than that is returned without any request
+#   (corpusEstimator.py re-reads search listings the crawl already downloaded)
+
+CACHE_FOLDER = os.environ.get("REDDIT_CACHE_DIR", "http_cache")
+USE_CACHE = True
+POOL_SIZE = 10
+
+DEFAULT_HEADERS = {
+    "User-Agent": "Mozilla/5.0 (compatible; SC4021Crawler/1.0; contact=edu)"
+}
+
+_session = None
+request_counts = Counter()  # "network" / "cache" (served by max_age without a request)
+
+
+def get_session():
+    """Process-wide keep-alive session, created on first use"""
+    global _session
+    if _session is None:
+        _session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+        _session.mount("https://", adapter)
+        _session.mount("http://", adapter)
+        _session.headers.update(DEFAULT_HEADERS)
+    return _session
+
+
+# --- On-disk cache ---
+def cache_key(url, params=None):
+    query = urlencode(sorted((params or {}).items()), doseq=True)
+    return hashlib.sha256(f"{url}?{query}".encode("utf-8")).hexdigest()
+
+
+def _cache_path(key):
+    # Two-level fan out so the folder doesn't end up with 100k files in one dir
+    return os.path.join(CACHE_FOLDER, key[:2], f"{key}.json")
+
+
+def load_cached(url, params=None):
+    """Cached entry {url, etag, last_modified, body} or None"""
+    if not USE_CACHE:
+        return None
+    path = _cache_path(cache_key(url, params))
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None  # half-written/corrupt entry, just refetch
+
+
+def touch_cached(url, params=None):
+    """Mark an entry as fresh again (the server answered 304, so its body is current)"""
+    try:
+        os.utime(_cache_path(cache_key(url, params)))
+    except OSError:
+        pass
+
+
+def cache_age(url, params=None):
+    """Seconds since the cached entry was written, None if there is none"""
+    if not USE_CACHE:
+        return None
+    path = _cache_path(cache_key(url, params))
+    if not os.path.exists(path):
+        return None
+    return time.time() - os.path.getmtime(path)
+
+
+def store_cached(url, params, headers, body, without_validators=False):
+    """
+    Save a 200 response body with its validators (atomic replace).
+    without_validators keeps it even if there are none (still reusable through max_age).
+    """
+    if not USE_CACHE:
+        return
+    etag = headers.get("ETag")
+    last_modified = headers.get("Last-Modified")
+    if not etag and not last_modified and not without_validators:
+        return  # nothing to revalidate with, caching would never save a download
+
+    path = _cache_path(cache_key(url, params))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"url": url, "params": params or {}, "etag": etag,
+                   "last_modified": last_modified, "body": body}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+
+def conditional_headers(entry):
+    headers = {}
+    if entry:
+        if entry.get("etag"):
+            headers["If-None-Match"] = entry["etag"]
+        if entry.get("last_modified"):
+            headers["If-Modified-Since"] = entry["last_modified"]
+    return headers
+
+
+class FetchResult:
+    """Minimal stand-in for requests.Response; a 304 is surfaced as a 200 with the cached body"""
+
+    def __init__(self, status_code, text, headers, url, from_cache=False):
+        self.status_code = status_code
+        self.text = text
+        self.headers = headers
+        self.url = url
+        self.from_cache = from_cache
+
+    def json(self):
+        return json.loads(self.text)
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f"{self.status_code} Error for url: {self.url}")
+
+
+def cached_get(url, params=None, headers=None, timeout=15, max_age=None):
+    """
+    GET through the pooled session with conditional revalidation.
+    Network errors are raised exactly like requests.get so callers' retry logic still works.
+    With max_age (seconds), a cached entry at most that old is served without asking the server.
+    """
+    entry = load_cached(url, params)
+    if entry and max_age is not None:
+        age = cache_age(url, params)
+        if age is not None and age <= max_age:
+            request_counts["cache"] += 1
+            return FetchResult(200, entry["body"], {}, url, from_cache=True)
+    request_headers = dict(headers or {})
+    request_headers.update(conditional_headers(entry))
+
+    r = get_session().get(url, params=params, headers=request_headers, timeout=timeout)
+    request_counts["network"] += 1
+
+    if r.status_code == 304 and entry:
+        touch_cached(url, params)
+        return FetchResult(200, entry["body"], r.headers, url, from_cache=True)
+
+    if r.status_code == 200:
+        store_cached(url, params, r.headers, r.text, without_validators=max_age is not None)
+
+    return FetchResult(r.status_code, r.text, r.headers, url)
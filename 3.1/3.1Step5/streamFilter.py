@@ -0,0 +1,174 @@
+import argparse
+import json
+import os
+from collections import OrderedDict
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from convertAllJsonlToParquet import iter_comment_rows, subreddits
+from obtainAIrelatedPostPlusCommentsV2 import build_three_sheet_matcher, has_keywords
+from strictFilterComments import build_strict_matcher, is_strict_match
+
+# Streaming version of strictFilterComments.py / obtainAIrelatedPostPlusCommentsV2.py.
+# Reads jsonl_crawl_full/<sub>_all.jsonl record by record and writes every match as
+# soon as it is found, so memory doesn't grow with the corpus (no DataFrame of
+# all comments, no Excel in between):
+#   python streamFilter.py --mode strict --output ai_filtered_strict.jsonl
+#   python streamFilter.py --mode three --output ai_filtered_three_sheets.parquet
+# Same keyword rules as the batch filters. Differences:
+#   - rows come out in crawl order, not sorted by title
+#   - three-sheet mode writes one file per sheet: <output stem>/<sheet>.jsonl|.parquet
+# The title condition is per post, so its result is cached per post url (an LRU of
+# TITLE_CACHE_SIZE urls; a post's comments are contiguous in the JSONL anyway).
+
+INPUT_FOLDER = "jsonl_crawl_full"
+CHUNK_SIZE = 50000          # rows buffered per Parquet row group
+TITLE_CACHE_SIZE = 10000
+
+COLUMNS = ["post_title", "comment_text", "subreddit", "post_url", "comment_id"]
+SHEETS = ["Posts_with_Keywords_Title", "Comments_with_Keywords_Text", "All_Unique_Comments"]
+
+
+def iter_corpus(input_folder=INPUT_FOLDER, subs=subreddits):
+    """Every comment of every subreddit file, one row dict at a time"""
+    for sub in subs:
+        filepath = os.path.join(input_folder, f"{sub}_all.jsonl")
+        if not os.path.exists(filepath):
+            print(f"Warning: {filepath} not found, skipping")
+            continue
+        for row in iter_comment_rows(filepath, sub):
+            row["subreddit"] = sub
+            yield row
+
+
+class RowSink:
+    """Append-only writer for .jsonl or .parquet (row groups of CHUNK_SIZE), picked by extension"""
+
+    def __init__(self, path, columns, chunk_size=CHUNK_SIZE):
+        self.path = path
+        self.columns = columns
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.parquet = path.lower().endswith(".parquet")
+        if self.parquet:
+            self.schema = pa.schema([(c, pa.string()) for c in columns])
+            self.buffer = {c: [] for c in columns}
+            self.writer = pq.ParquetWriter(path, self.schema, compression="zstd")
+        else:
+            self.file = open(path, "w", encoding="utf-8")
+
+    def write(self, row):
+        self.count += 1
+        if not self.parquet:
+            self.file.write(json.dumps({c: row.get(c) for c in self.columns}, ensure_ascii=False) + "\n")
+            return
+        for c in self.columns:
+            value = row.get(c)
+            self.buffer[c].append(None if value is None else str(value))
+        if len(self.buffer[self.columns[0]]) >= self.chunk_size:
+            self._flush()
+
+    def _flush(self):
+        if self.buffer[self.columns[0]]:
+            self.writer.write_table(pa.Table.from_pydict(self.buffer, schema=self.schema))
+            self.buffer = {c: [] for c in self.columns}
+
+    def close(self):
+        if self.parquet:
+            self._flush()
+            self.writer.close()
+        else:
+            self.file.close()
+
+
+class TitleCache:
+    """post url -> title condition, least recently used urls dropped past maxsize"""
+
+    def __init__(self, check, maxsize=TITLE_CACHE_SIZE):
+        self.check = check
+        self.maxsize = maxsize
+        self.results = OrderedDict()
+        self.evaluated = 0
+
+    def __call__(self, url, title):
+        if url in self.results:
+            self.results.move_to_end(url)
+            return self.results[url]
+        self.evaluated += 1
+        result = self.results[url] = self.check(title)
+        if len(self.results) > self.maxsize:
+            self.results.popitem(last=False)
+        return result
+
+
+def stream_strict(rows, output_file):
+    matcher = build_strict_matcher()
+    sink = RowSink(output_file, COLUMNS)
+    seen = 0
+    try:
+        for row in rows:
+            seen += 1
+            if is_strict_match(matcher.groups_in(str(row["comment_text"]))):
+                sink.write(row)
+            if seen % 100000 == 0:
+                print(f"  {seen:,} comments read, {sink.count:,} kept")
+    finally:
+        sink.close()
+    print(f"Kept {sink.count:,} of {seen:,} comments after strict filtering -> {output_file}")
+    return sink.count
+
+
+def stream_three_sheets(rows, output_file):
+    stem, ext = os.path.splitext(output_file)
+    os.makedirs(stem, exist_ok=True)
+    sinks = {
+        SHEETS[0]: RowSink(os.path.join(stem, SHEETS[0] + ext), COLUMNS + ["source"]),
+        SHEETS[1]: RowSink(os.path.join(stem, SHEETS[1] + ext), COLUMNS + ["source"]),
+        SHEETS[2]: RowSink(os.path.join(stem, SHEETS[2] + ext), COLUMNS + ["source", "conditions_met"]),
+    }
+    matcher = build_three_sheet_matcher()
+    title_has_keywords = TitleCache(lambda title: has_keywords(matcher, str(title)))
+    unique_ids = set()  # only ids of matched comments, for the Sheet 3 dedup
+    seen = 0
+
+    try:
+        for row in rows:
+            seen += 1
+            cond1 = title_has_keywords(row["post_url"], row["post_title"])
+            cond2 = has_keywords(matcher, str(row["comment_text"]))
+            if cond1:
+                sinks[SHEETS[0]].write(dict(row, source="post_title_has_keywords"))
+            if cond2:
+                sinks[SHEETS[1]].write(dict(row, source="comment_text_has_keywords"))
+            if (cond1 or cond2) and row["comment_id"] not in unique_ids:
+                unique_ids.add(row["comment_id"])
+                sinks[SHEETS[2]].write(dict(
+                    row,
+                    source="post_title_has_keywords" if cond1 else "comment_text_has_keywords",
+                    conditions_met="both_conditions" if cond1 and cond2 else
+                                   "post_title_only" if cond1 else "comment_text_only",
+                ))
+            if seen % 100000 == 0:
+                print(f"  {seen:,} comments read, {sinks[SHEETS[2]].count:,} unique matches")
+    finally:
+        for sink in sinks.values():
+            sink.close()
+
+    print(f"Read {seen:,} comments ({title_has_keywords.evaluated:,} titles checked)")
+    for name, sink in sinks.items():
+        print(f"  {name}: {sink.count:,} comments -> {sink.path}")
+    return {name: sink.count for name, sink in sinks.items()}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Filter the raw JSONL crawl without loading it into memory")
+    parser.add_argument("--mode", choices=["strict", "three"], default="strict")
+    parser.add_argument("--input", default=INPUT_FOLDER, help="folder with <sub>_all.jsonl files")
+    parser.add_argument("--output", default=None, help=".jsonl or .parquet (default depends on --mode)")
+    args = parser.parse_args()
+
+    if args.mode == "strict":
+        stream_strict(iter_corpus(args.input), args.output or "ai_filtered_strict.jsonl")
+    else:
+        stream_three_sheets(iter_corpus(args.input), args.output or "ai_filtered_three_sheets.jsonl")
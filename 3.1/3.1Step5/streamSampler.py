@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+import time
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+from pipeline import FileHasher
+
+# Balanced, reproducible eval samples drawn from a stream of rows (replaces the
+# df.sample(n=2000) in obtain1kSamples.py, which needed the whole workbook in memory
+# and couldn't balance anything).
+#   - stratum = subreddit x conditions_met (STRATA), each gets an equal share of n;
+#     strata with fewer rows give what they have and the rest is shared out again
+#   - at most POST_CAP comments of one post per stratum, so one megathread can't dominate
+#   - every row gets a random key from hash(seed, comment_id); a stratum keeps the
+#     smallest keys seen (bottom-k = uniform sample without replacement). The result
+#     depends only on seed + data, not on row order or chunking, and memory is
+#     O(strata x n) however many rows are streamed.
+#   - a manifest (<output>.manifest.json) records seed, input hash, quotas and the ids drawn
+#
+#   python streamSampler.py --input ai_filtered_three_sheets/All_Unique_Comments.parquet --n 2000
+#   python streamSampler.py --input jsonl_crawl_full --n 600 --post-cap 3 --seed 7
+# Input: .parquet (file or dataset), .jsonl (e.g. streamFilter.py output), .xlsx (Sheet 3, loaded
+# whole), or the raw jsonl_crawl_full folder (Sheet 3 rules applied on the fly).
+
+SEED = 42
+POST_CAP = 5
+STRATA = ("subreddit", "conditions_met")
+SHEET_NAME = "All_Unique_Comments"
+BATCH_ROWS = 50000
+
+
+# --- Streaming input ---
+def iter_rows(path, sheet_name=SHEET_NAME):
+    lower = path.lower().rstrip("/\\")
+    if lower.endswith(".parquet"):
+        import pyarrow.dataset as ds
+        for batch in ds.dataset(path, format="parquet", partitioning="hive").to_batches(batch_size=BATCH_ROWS):
+            yield from batch.to_pylist()
+    elif lower.endswith(".jsonl"):
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+    elif lower.endswith((".xlsx", ".xls")):
+        yield from pd.read_excel(path, sheet_name=sheet_name).to_dict(orient="records")
+    elif os.path.isdir(path):
+        yield from iter_sheet3_rows(path)
+    else:
+        raise ValueError(f"Don't know how to stream {path} (expected .parquet, .jsonl, .xlsx or a jsonl folder)")
+
+
+def iter_sheet3_rows(input_folder):
+    """Raw crawl rows that would land in Sheet 3, with their conditions_met"""
+    from obtainAIrelatedPostPlusCommentsV2 import build_three_sheet_matcher, has_keywords
+    from streamFilter import TitleCache, iter_corpus
+
+    matcher = build_three_sheet_matcher()
+    title_has_keywords = TitleCache(lambda title: has_keywords(matcher, str(title)))
+    seen = set()
+    for row in iter_corpus(input_folder):
+        cond1 = title_has_keywords(row["post_url"], row["post_title"])
+        cond2 = has_keywords(matcher, str(row["comment_text"]))
+        if (cond1 or cond2) and row["comment_id"] not in seen:
+            seen.add(row["comment_id"])
+            row["conditions_met"] = ("both_conditions" if cond1 and cond2 else
+                                     "post_title_only" if cond1 else "comment_text_only")
+            yield row
+
+
+# --- Sampling ---
+def sample_key(seed, comment_id):
+    """Uniform [0, 1) from (seed, id): the same comment always gets the same key"""
+    digest = hashlib.blake2b(f"{seed}:{comment_id}".encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64
+
+
+class StratumReservoir:
+    """
+    The `capacity` smallest-key rows of one stratum, at most `post_cap` per post.
+    A row only displaces rows of its own post (past the cap) or the largest key overall,
+    so the kept set is exactly bottom-k of the post-capped stream.
+    """
+
+    def __init__(self, capacity, post_cap=None):
+        self.capacity = capacity
+        self.post_cap = post_cap
+        self.entries = []   # sorted [(key, comment_id)]
+        self.rows = {}      # comment_id -> row
+        self.by_post = {}   # post -> sorted [(key, comment_id)] kept for it
+        self.seen = 0
+
+    def threshold(self):
+        return self.entries[-1][0] if len(self.entries) >= self.capacity else 1.0
+
+    def _remove(self, key, comment_id, post):
+        del self.entries[bisect_left(self.entries, (key, comment_id))]
+        del self.rows[comment_id]
+        kept = self.by_post[post]
+        del kept[bisect_left(kept, (key, comment_id))]
+        if not kept:
+            del self.by_post[post]
+
+    def offer(self, key, comment_id, post, row):
+        self.seen += 1
+        if key >= self.threshold() or comment_id in self.rows:
+            return
+        kept = self.by_post.get(post, [])
+        if self.post_cap is not None and len(kept) >= self.post_cap:
+            if (key, comment_id) >= kept[-1]:
+                return  # the post already has post_cap rows with smaller keys
+            self._remove(*kept[-1], post)
+        insort(self.entries, (key, comment_id))
+        self.rows[comment_id] = row
+        insort(self.by_post.setdefault(post, []), (key, comment_id))
+        if len(self.entries) > self.capacity:
+            key, comment_id = self.entries[-1]
+            self._remove(key, comment_id, self.rows[comment_id]["_post"])
+
+    def take(self, k):
+        """The k smallest keys (a uniform sample of size k of this stratum)"""
+        return [self.rows[cid] for _, cid in self.entries[:k]]
+
+
+def allocate(available, n):
+    """Equal quota per stratum; leftover of small strata is shared out among the others"""
+    quotas = {s: 0 for s in available}
+    remaining, open_strata = n, sorted(available, key=lambda s: available[s])
+    while open_strata and remaining > 0:
+        share = remaining // len(open_strata)
+        if share == 0:
+            # fewer rows left than strata: one more each for the largest strata
+            for s in sorted(open_strata, key=lambda s: -available[s])[:remaining]:
+                quotas[s] += 1
+            break
+        smallest = open_strata[0]
+        if available[smallest] - quotas[smallest] <= share:
+            remaining -= available[smallest] - quotas[smallest]
+            quotas[smallest] = available[smallest]
+            open_strata.pop(0)
+        else:
+            for s in open_strata:
+                quotas[s] += share
+            remaining -= share * len(open_strata)
+            open_strata = [s for s in open_strata if quotas[s] < available[s]]
+    return quotas
+
+
+def stream_sample(rows, n, seed=SEED, strata=STRATA, post_cap=POST_CAP, id_col="comment_id", post_col="post_url"):
+    """(sample DataFrame, per-stratum stats) from an iterable of row dicts"""
+    reservoirs = {}
+    total = 0
+    for row in rows:
+        total += 1
+        stratum = tuple(str(row.get(col)) for col in strata)
+        comment_id = str(row.get(id_col))
+        row["_post"] = row.get(post_col)
+        reservoir = reservoirs.get(stratum)
+        if reservoir is None:
+            reservoir = reservoirs[stratum] = StratumReservoir(n, post_cap)
+        reservoir.offer(sample_key(seed, comment_id), comment_id, row["_post"], row)
+        if total % 500000 == 0:
+            print(f"  {total:,} rows streamed, {len(reservoirs)} strata")
+
+    quotas = allocate({s: len(r.entries) for s, r in reservoirs.items()}, n)
+    picked, stats = [], []
+    for stratum in sorted(reservoirs):
+        taken = reservoirs[stratum].take(quotas[stratum])
+        for row in taken:
+            row.pop("_post", None)
+            row["stratum"] = " / ".join(stratum)
+            row["sample_key"] = sample_key(seed, str(row.get(id_col)))
+        picked += taken
+        stats.append({"stratum": list(stratum), "rows": reservoirs[stratum].seen,
+                      "eligible": len(reservoirs[stratum].entries), "quota": quotas[stratum], "taken": len(taken)})
+    sample = pd.DataFrame(picked)
+    if len(sample):
+        sample = sample.sort_values("sample_key", kind="stable").reset_index(drop=True)
+    return sample, {"rows_streamed": total, "per_stratum": stats}
+
+
+def sample_file(input_file, output_file="eval_sample_1k.xlsx", n=2000, seed=SEED, strata=STRATA,
+                post_cap=POST_CAP, sheet_name=SHEET_NAME):
+    """Stream input_file, write the sample (.xlsx/.parquet/.jsonl) and <output>.manifest.json next to it"""
+    start = time.time()
+    print(f"Sampling {n} rows from {input_file} (seed={seed}, strata={' x '.join(strata)}, post cap={post_cap})...")
+    sample, stats = stream_sample(iter_rows(input_file, sheet_name), n, seed, strata, post_cap)
+
+    lower = output_file.lower()
+    if lower.endswith(".parquet"):
+        sample.to_parquet(output_file, index=False)
+    elif lower.endswith(".jsonl"):
+        sample.to_json(output_file, orient="records", lines=True, force_ascii=False)
+    else:
+        sample.to_excel(output_file, index=False)
+
+    manifest = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "input": input_file,
+        "input_sha256": FileHasher().digest(input_file),
+        "output": output_file,
+        "n_requested": n,
+        "n_drawn": len(sample),
+        "seed": seed,
+        "strata": list(strata),
+        "post_cap": post_cap,
+        **stats,
+        "comment_ids": sample["comment_id"].astype(str).tolist() if len(sample) else [],
+    }
+    manifest_file = os.path.splitext(output_file)[0] + ".manifest.json"
+    with open(manifest_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, ensure_ascii=False)
+
+    print(f"Streamed {stats['rows_streamed']:,} rows in {time.time() - start:.1f}s")
+    print("Sample breakdown:")
+    for s in stats["per_stratum"]:
+        pct = s["taken"] / len(sample) * 100 if len(sample) else 0
+        print(f"  {' / '.join(s['stratum'])}: {s['taken']} of {s['rows']:,} rows ({pct:.1f}%)")
+    print(f"✅ Saved {len(sample)} rows to {output_file} (manifest: {manifest_file})")
+    return sample
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Draw a balanced, reproducible eval sample from a stream of comments")
+    parser.add_argument("--input", default=os.path.join("ai_filtered_three_sheets", "All_Unique_Comments.parquet"))
+    parser.add_argument("--output", default="eval_sample_1k.xlsx")
+    parser.add_argument("--n", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--strata", nargs="+", default=list(STRATA), help="columns defining a stratum")
+    parser.add_argument("--post-cap", type=int, default=POST_CAP, help="max comments per post per stratum (0 = no cap)")
+    args = parser.parse_args()
+
+    sample_file(args.input, args.output, args.n, args.seed, tuple(args.strata), args.post_cap or None)
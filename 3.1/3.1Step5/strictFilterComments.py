@@ -1,9 +1,63 @@
-import pandas as pd
-import re
+from commentsIO import list_columns, load_comments, save_sheets
+from keywordMatcher import KeywordMatcher
+
+# --- Define recruitment-stage keywords ---
+interview_terms = [
+    'hirevue', 'one[- ]way interview', 'video interview', 'ai interview',
+    'automated interview', 'pre[- ]recorded interview', 'digital interview',
+    'phone screen', 'screening call', 'chatbot', 'ai recruiter', 'paradox', 'olivia'
+]
+
+ats_terms = [
+    'ats', 'applicant tracking', 'resume screening', 'cv screening',
+    'auto[- ]reject', 'automated rejection', 'keyword filter',
+    'algorithm rejected', 'screening system', 'candidate ranking'
+]
+
+assessment_terms = [
+    'personality test', 'cognitive test', 'assessment tool',
+    'skills test', 'coding test', 'technical assessment'
+]
+
+opinion_terms = [
+    'automated hiring', 'ai replacing recruiters',
+    'boycott ai interviews', 'double standard'
+]
+
+implicit_hiring_terms = [
+    'screened', 'shortlisted', 'filtered out', 'auto[- ]screen',
+    'rejected automatically', 'ranking system', 'scoring system'
+]
+
+# Combine ALL recruitment-related terms ONCE
+recruitment_terms = (
+    interview_terms
+    + ats_terms
+    + assessment_terms
+    + opinion_terms
+    + implicit_hiring_terms
+)
+
+# Broader but still explicit AI references
+ai_terms = ['ai', 'artificial intelligence', 'algorithm', 'automated system', 'hiring algorithm']
+
+
+def build_strict_matcher():
+    """Both term groups in one automaton, all case insensitive with word boundaries"""
+    return (KeywordMatcher()
+            .add_all(ai_terms, group='ai')
+            .add_all(recruitment_terms, group='recruitment'))
+
+
+def is_strict_match(groups):
+    """Kept IF AND ONLY IF both an AI term and a recruitment term were hit"""
+    return 'ai' in groups and 'recruitment' in groups
+
 
 def filter_ai_comments_strict(
-    input_file="all_raw_comments.xlsx",
-    output_file="ai_filtered_strict.xlsx"
+    input_file="all_raw_comments.parquet",
+    output_file="ai_filtered_strict.parquet",
+    export_excel=True
 ):
     """
     STRICT FILTERING (0% noisy by construction)
@@ -15,26 +69,33 @@ def filter_ai_comments_strict(
     No title-based inclusion.
     No OR logic.
     One output sheet only.
-    """
 
-    print(f"Loading {input_file}...")
-    df = pd.read_excel(input_file)
-    print(f"Loaded {len(df):,} total comments")
+    input_file can be .parquet, .feather, .xlsx or the jsonl_crawl_full folder;
+    only the five columns below are read.
+    """
 
-    # --- Detect column names robustly ---
-    title_col = next((c for c in df.columns if 'title' in c.lower()), 'post_title')
-    text_col = next((c for c in df.columns if 'comment' in c.lower() or 'text' in c.lower()), 'comment_text')
-    subreddit_col = next((c for c in df.columns if 'subreddit' in c.lower()), 'subreddit')
-    url_col = next((c for c in df.columns if 'url' in c.lower()), 'post_url')
+    # --- Detect column names robustly (from the schema, before loading) ---
+    columns = list_columns(input_file)
+    title_col = next((c for c in columns if 'title' in c.lower()), 'post_title')
+    text_col = next((c for c in columns if 'comment' in c.lower() or 'text' in c.lower()), 'comment_text')
+    subreddit_col = next((c for c in columns if 'subreddit' in c.lower()), 'subreddit')
+    url_col = next((c for c in columns if 'url' in c.lower()), 'post_url')
 
-    if 'id' in df.columns:
+    if 'id' in columns:
         id_col = 'id'
-    elif 'comment_id' in df.columns:
+    elif 'comment_id' in columns:
         id_col = 'comment_id'
     else:
-        df['temp_id'] = df.index.astype(str)
         id_col = 'temp_id'
 
+    print(f"Loading {input_file}...")
+    needed = [title_col, text_col, subreddit_col, url_col] + ([id_col] if id_col != 'temp_id' else [])
+    df = load_comments(input_file, columns=list(dict.fromkeys(needed)))
+    print(f"Loaded {len(df):,} total comments")
+
+    if id_col == 'temp_id':
+        df['temp_id'] = df.index.astype(str)
+
     print(f"Using columns:")
     print(f"  title: {title_col}")
     print(f"  text: {text_col}")
@@ -45,55 +106,9 @@ def filter_ai_comments_strict(
     # Convert text column to string once
     text_series = df[text_col].astype(str)
 
-    # --- Define recruitment-stage keywords ---
-    interview_terms = [
-        'hirevue', 'one[- ]way interview', 'video interview', 'ai interview',
-        'automated interview', 'pre[- ]recorded interview', 'digital interview',
-        'phone screen', 'screening call', 'chatbot', 'ai recruiter', 'paradox', 'olivia'
-    ]
-
-    ats_terms = [
-        'ats', 'applicant tracking', 'resume screening', 'cv screening',
-        'auto[- ]reject', 'automated rejection', 'keyword filter',
-        'algorithm rejected', 'screening system', 'candidate ranking'
-    ]
-
-    assessment_terms = [
-        'personality test', 'cognitive test', 'assessment tool',
-        'skills test', 'coding test', 'technical assessment'
-    ]
-
-    opinion_terms = [
-        'automated hiring', 'ai replacing recruiters',
-        'boycott ai interviews', 'double standard'
-    ]
-
-    implicit_hiring_terms = [
-        'screened', 'shortlisted', 'filtered out', 'auto[- ]screen',
-        'rejected automatically', 'ranking system', 'scoring system'
-    ]
-
-    # Combine ALL recruitment-related terms ONCE
-    recruitment_terms = (
-        interview_terms
-        + ats_terms
-        + assessment_terms
-        + opinion_terms
-        + implicit_hiring_terms
-    )
-
-    # Build regex pattern AFTER final list is created
-    recruitment_pattern = r'\b(' + '|'.join(recruitment_terms) + r')\b'
-
-    # Broader but still explicit AI references
-    ai_pattern = r'\b(ai|artificial intelligence|algorithm|automated system|hiring algorithm)\b'
-
-    # Strict AND filtering
-    df['relevant'] = (
-        text_series.str.contains(ai_pattern, na=False, regex=True, case=False)
-        &
-        text_series.str.contains(recruitment_pattern, na=False, regex=True, case=False)
-    )
+    # Strict AND filtering: one pass over each comment finds both term groups
+    matcher = build_strict_matcher()
+    df['relevant'] = [is_strict_match(groups) for groups in matcher.groups_column(text_series)]
 
     final_df = df[df['relevant']].copy()
 
@@ -104,11 +119,10 @@ def filter_ai_comments_strict(
     print(f"Kept {len(final_df):,} comments after strict filtering")
     print(f"Removed {len(df) - len(final_df):,} irrelevant comments")
 
-    # --- Save to Excel (single sheet) ---
-    with pd.ExcelWriter(output_file, engine='openpyxl') as writer:
-        final_df.to_excel(writer, sheet_name='strict_ai_hiring_comments', index=False)
+    # --- Save (single sheet; Excel copy only if export_excel) ---
+    written = save_sheets({'strict_ai_hiring_comments': final_df}, output_file, export_excel=export_excel)
 
-    print(f"Saved strictly filtered dataset to {output_file}")
+    print(f"Saved strictly filtered dataset to {', '.join(written)}")
     print("Dataset satisfies 0% noisy relevance by construction")
 
 if __name__ == "__main__":
@@ -5,9 +5,14 @@
 
 import json
 import os
+import sys
 import pandas as pd
 from collections import Counter
 
+# Shared rule engine lives one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from proximityRules import Near, RuleEngine, TopicCount
+
 # --- Configuration ---
 INPUT_FOLDER = "jsonl_crawl_full"
 OUTPUT_FILE = "all_relevant_comments.xlsx"  # Changed name
@@ -17,47 +22,40 @@ subreddits = [
     "recruitinghell", "technology", "futurology", "recruitmentagencies"
 ]
 
+# Word pair combinations
+combinations = [
+    ("ai", "recruit"), ("ai", "hire"), ("ai", "interview"),
+    ("ai", "candidate"), ("ai", "applicant"), ("ai", "resume"),
+    ("ai", "screen"), ("artificial intelligence", "recruit"),
+    ("machine learning", "recruit"), ("automated", "recruit"),
+    ("automated", "hire"), ("algorithm", "recruit"),
+    ("bot", "interview"), ("robot", "interview"),
+    ("ai", "hiring process"), ("ai", "recruitment process"),
+]
+
+# Topic word counting
+topic_words = [
+    "ai", "artificial intelligence", "machine learning", "ml",
+    "recruit", "hire", "interview", "candidate", "applicant",
+    "resume", "cv", "screening", "automated", "algorithm",
+    "bot", "robot", "chatbot", "ats"
+]
+
+# Rules tried in order: any pair within 300 chars (every occurrence is checked,
+# not just the first one), then >= 3 distinct topic words. Substring matching,
+# like the old `word in text_lower` checks.
+rules = [Near(word1, word2, within=300) for word1, word2 in combinations] + [TopicCount(topic_words, min_count=3)]
+engine = RuleEngine(rules, word_boundary=False)
+
 def is_relevant_combination(text):
     """Check if comment is about AI in hiring"""
-    text_lower = text.lower()
-    
-    # Word pair combinations
-    combinations = [
-        ("ai", "recruit"), ("ai", "hire"), ("ai", "interview"),
-        ("ai", "candidate"), ("ai", "applicant"), ("ai", "resume"),
-        ("ai", "screen"), ("artificial intelligence", "recruit"),
-        ("machine learning", "recruit"), ("automated", "recruit"),
-        ("automated", "hire"), ("algorithm", "recruit"),
-        ("bot", "interview"), ("robot", "interview"),
-        ("ai", "hiring process"), ("ai", "recruitment process"),
-    ]
-    
-    for word1, word2 in combinations:
-        if word1 in text_lower and word2 in text_lower:
-            pos1 = text_lower.find(word1)
-            pos2 = text_lower.find(word2)
-            if abs(pos1 - pos2) < 300:
-                return True, f"{word1}+{word2}"
-    
-    # Topic word counting
-    topic_words = [
-        "ai", "artificial intelligence", "machine learning", "ml",
-        "recruit", "hire", "interview", "candidate", "applicant",
-        "resume", "cv", "screening", "automated", "algorithm",
-        "bot", "robot", "chatbot", "ats"
-    ]
-    
-    matches = [word for word in topic_words if word in text_lower]
-    if len(matches) >= 3:
-        return True, f"topic_count:{len(matches)}"
-    
-    return False, None
+    reason = engine.reason(text)
+    return reason is not None, reason
 
 def find_all_relevant():
     """Find ALL relevant comments without sampling"""
     
     all_relevant = []
-    match_reasons = Counter()
     total_processed = 0
     total_words = 0
     
@@ -75,37 +73,33 @@ def find_all_relevant():
         sub_relevant = 0
         sub_processed = 0
         
+        records = []
         with open(filepath, 'r', encoding='utf-8') as f:
             for line in f:
                 try:
-                    record = json.loads(line)
-                    sub_processed += 1
-                    total_processed += 1
-                    
-                    # Check relevance
-                    is_rel, reason = is_relevant_combination(record["text"])
-                    
-                    if is_rel:
-                        words = len(record["text"].split())
-                        total_words += words
-                        
-                        all_relevant.append({
-                            "subreddit": sub,
-                            "text": record["text"],
-                            "word_count": words,
-                            "relevance_reason": reason,
-                            "id": record.get("id", ""),
-                            "timestamp": record.get("timestamp", "")
-                        })
-                        sub_relevant += 1
-                        match_reasons[reason] += 1
-                    
-                    # Progress indicator
-                    if sub_processed % 5000 == 0:
-                        print(f"  Processed {sub_processed:,} comments, found {sub_relevant:,} relevant so far")
-                        
+                    records.append(json.loads(line))
                 except json.JSONDecodeError:
                     continue
+        sub_processed = len(records)
+        total_processed += sub_processed
+        
+        # Check relevance for the whole subreddit at once (engine.counts tracks reasons)
+        reasons = engine.evaluate_column(record["text"] for record in records)
+        
+        for record, reason in zip(records, reasons):
+            if reason:
+                words = len(record["text"].split())
+                total_words += words
+                
+                all_relevant.append({
+                    "subreddit": sub,
+                    "text": record["text"],
+                    "word_count": words,
+                    "relevance_reason": reason,
+                    "id": record.get("id", ""),
+                    "timestamp": record.get("timestamp", "")
+                })
+                sub_relevant += 1
         
         print(f"  {sub}: {sub_relevant:,} relevant out of {sub_processed:,} comments ({sub_relevant/sub_processed*100:.1f}%)")
     
@@ -120,7 +114,7 @@ def find_all_relevant():
     print(f"Average words per relevant comment: {total_words/len(all_relevant):.1f}")
     
     print("\nTop match reasons:")
-    for reason, count in match_reasons.most_common(10):
+    for reason, count in engine.counts.most_common(10):
         print(f"  {reason}: {count} ({count/len(all_relevant)*100:.1f}%)")
     
     print("\nResults by subreddit:")
@@ -0,0 +1,83 @@
+try:
+    import tiktoken  # optional, exact token counts (pip install tiktoken)
+except ImportError:
+    tiktoken = None
+
+# Token-aware batching for the LLM labelling prompts (Step1 posts, Step3 comments).
+# Instead of a fixed 10 posts / 15 comments per call:
+#   - every item is measured in tokens (tiktoken if installed, else ~4 chars per token)
+#   - overlong texts are cut down by a truncation policy before they go in a prompt
+#   - items are packed greedily, in order, until the prompt budget or max_items is hit
+# Answers are matched back by item id, see structuredLabels.py.
+
+DEFAULT_ENCODING = "cl100k_base"
+CHARS_PER_TOKEN = 4
+TRUNCATION_MARKER = " [...] "
+
+_encoders = {}
+
+
+def _encoder(model):
+    if tiktoken is None:
+        return None
+    if model not in _encoders:
+        try:
+            _encoders[model] = tiktoken.encoding_for_model(model)
+        except KeyError:
+            _encoders[model] = tiktoken.get_encoding(DEFAULT_ENCODING)
+    return _encoders[model]
+
+
+def count_tokens(text, model=None):
+    if not text:
+        return 0
+    enc = _encoder(model)
+    if enc is None:
+        return len(text) // CHARS_PER_TOKEN + 1
+    return len(enc.encode(text, disallowed_special=()))
+
+
+def truncate_text(text, max_tokens, model=None, policy="head_tail"):
+    """
+    Cut text down to about max_tokens.
+      "head"      -> keep the beginning
+      "head_tail" -> keep the beginning and the end (opinions often sit in the last lines)
+    """
+    if not text or count_tokens(text, model) <= max_tokens:
+        return text
+    if policy not in ("head", "head_tail"):
+        raise ValueError(f"Unknown truncation policy {policy!r}")
+
+    enc = _encoder(model)
+    if enc is None:
+        units, join = text, "".join
+        keep = max_tokens * CHARS_PER_TOKEN
+    else:
+        units, join = enc.encode(text, disallowed_special=()), enc.decode
+        keep = max_tokens
+
+    if policy == "head":
+        return join(units[:keep]) + TRUNCATION_MARKER.rstrip()
+    head = keep * 2 // 3
+    return join(units[:head]) + TRUNCATION_MARKER + join(units[len(units) - (keep - head):])
+
+
+def plan_batches(item_tokens, budget_tokens, max_items=None, overhead_tokens=0, per_item_tokens=0):
+    """
+    Greedy in-order packing. item_tokens[i] is the size of item i in the prompt;
+    each batch costs overhead_tokens (instructions) + sum(item + per_item_tokens).
+    Returns lists of item indexes. An item bigger than the budget gets a batch of its own.
+    """
+    batches, current, used = [], [], overhead_tokens
+    for i, tokens in enumerate(item_tokens):
+        cost = tokens + per_item_tokens
+        full = max_items is not None and len(current) >= max_items
+        if current and (full or used + cost > budget_tokens):
+            batches.append(current)
+            current, used = [], overhead_tokens
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
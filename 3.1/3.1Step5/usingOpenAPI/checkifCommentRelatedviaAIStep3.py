@@ -1,9 +1,15 @@
 import pandas as pd
 import openai
-import time
 import os
+import time
 from dotenv import load_dotenv
 
+from batchPlanner import count_tokens, plan_batches, truncate_text
+from labelCache import LabelCache
+from llmRunner import AsyncLLMRunner
+from preClassifier import PreClassifier, savings_report
+from structuredLabels import JSON_INSTRUCTION, format_item, response_format
+
 # --- Load OpenAI API key ---
 load_dotenv("openai_api_key.env")
 api_key = os.getenv("OPENAI_API_KEY")
@@ -11,7 +17,9 @@ if not api_key:
     raise ValueError("OpenAI API key not found in 'openai_api_key.env'")
 
 # --- Create OpenAI client ---
-client = openai.OpenAI(api_key=api_key)
+# max_retries=0: retries/backoff are done by llmRunner so they respect the rate budgets.
+# OPENAI_BASE_URL (if set) points it somewhere else, e.g. mockCompletionsServer.py
+client = openai.AsyncOpenAI(api_key=api_key, max_retries=0)
 
 # --- Load combined comments file (Excel) ---
 input_file = "eval3.xlsx"
@@ -25,9 +33,18 @@ if TEST_LIMIT:
 comments = df['comment'].tolist()
 
 # --- Configuration ---
-batch_size = 15
+model = "gpt-4-turbo"         # needs JSON mode support (plain gpt-4 doesn't have it -> set json_mode = None)
+json_mode = "json_object"     # "json_schema" for gpt-4o and newer
+prompt_token_budget = 5000   # instructions + comments per call (gpt-4 has 8k context, leave room for the reply)
+max_batch_size = 40          # cap on comments per call, long lists get sloppy answers
+comment_max_tokens = 800     # longer comments are cut (head + tail kept)
 max_retries = 5
-backoff_factor = 2
+max_concurrency = 8        # batches in flight at once
+requests_per_minute = 500  # keep under the account's RPM/TPM limits
+tokens_per_minute = 40000
+use_cascade = True                       # confident comments labelled by the local model (if one was trained)
+cascade_model = "preclassifier.joblib"   # python preClassifier.py --data <labelled files>
+cascade_thresholds = None                # (low, high) to override the ones picked at training time
 topic_instruction = """
 You are helping classify comments about AI in hiring and recruitment. 
 Label each comment as 'yes' if it expresses an **opinion, feeling, or judgment** about the topic, otherwise label as 'no'.
@@ -46,49 +63,77 @@ Rules:
 - Label 'no' if the comment is purely factual, informational, or irrelevant.
 """
 
-# --- Helper function to call GPT ---
-def classify_batch(batch):
-    prompt = topic_instruction + "\n\nClassify each comment as 'yes' or 'no', return comma-separated, same order:\n"
-    for idx, c in enumerate(batch, 1):
-        prompt += f"{idx}. {c.strip()}\n"
-
-    for attempt in range(max_retries):
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4",
-                messages=[{"role": "user", "content": prompt}],
-                temperature=0
-            )
-            text = response.choices[0].message.content
-            labels = [x.strip().lower() for x in text.replace("\n", ",").split(",") if x.strip()]
-            # Fill missing labels with 'no'
-            if len(labels) != len(batch):
-                labels += ["no"] * (len(batch) - len(labels))
-            return labels
-        except openai.error.RateLimitError:
-            sleep_time = backoff_factor ** attempt
-            print(f"429 RateLimitError, retrying in {sleep_time}s...")
-            time.sleep(sleep_time)
-        except Exception as e:
-            print(f"Other OpenAI error: {e}")
-            time.sleep(1)
-
-    # If all retries fail, return 'no'
-    return ["no"] * len(batch)
-
-# --- Process in batches ---
-all_labels = []
-total_batches = (len(comments) + batch_size - 1) // batch_size
-
-for i in range(total_batches):
-    batch = comments[i*batch_size:(i+1)*batch_size]
-    print(f"Processing batch {i+1}/{total_batches} with {len(batch)} comments")
-    labels = classify_batch(batch)
-    all_labels.extend(labels)
-    time.sleep(1)  # polite pause
+classify_instruction = "\n\nClassify each comment below as 'yes' or 'no'. " + JSON_INSTRUCTION + "\nComments:\n"
+
+# --- Helper functions ---
+def item_id(i):
+    return f"c{i}"
+
+def build_prompt(ids):
+    prompt = topic_instruction + classify_instruction
+    for key in ids:
+        prompt += format_item(key, prompt_texts[key]) + "\n"
+    return prompt
+
+# --- Labels already known from earlier runs (same prompt + model + comment text) ---
+cache = LabelCache(template=topic_instruction + classify_instruction, model=model)
+all_labels = cache.get_many(comments)
+todo = [i for i, label in enumerate(all_labels) if label is None]
+label_source = ["cache" if label is not None else None for label in all_labels]
+
+# --- Cascade: local pre-classifier takes the comments it is confident about ---
+pre = None
+if use_cascade and todo and os.path.exists(cascade_model):
+    pre = PreClassifier.load(cascade_model)
+    low, high = cascade_thresholds or (pre.low, pre.high)
+    local = pre.route([str(comments[i]) for i in todo], low, high)
+    for i, label in zip(todo, local):
+        if label is not None:
+            all_labels[i] = label
+            label_source[i] = "local"
+    local_count = len(todo)
+    todo = [i for i in todo if all_labels[i] is None]
+    local_count -= len(todo)
+elif use_cascade and todo:
+    print(f"No {cascade_model} yet, every uncached comment goes to the LLM")
+
+# --- Pack uncached comments into batches by token count ---
+prompt_texts = {item_id(i): truncate_text(str(comments[i]).strip(), comment_max_tokens, model) for i in todo}
+batches = [
+    [item_id(todo[j]) for j in batch]
+    for batch in plan_batches([count_tokens(prompt_texts[item_id(i)], model) for i in todo], prompt_token_budget,
+                              max_items=max_batch_size,
+                              overhead_tokens=count_tokens(topic_instruction + classify_instruction, model),
+                              per_item_tokens=20)
+]
+print(f"Classifying {len(todo)} of {len(comments)} comments in {len(batches)} batches ({max_concurrency} at a time)")
+
+# --- Process batches concurrently (answers matched by id, missing ids asked again) ---
+runner = AsyncLLMRunner(client, model=model, max_concurrency=max_concurrency, rpm=requests_per_minute,
+                        tpm=tokens_per_minute, max_retries=max_retries, response_format=response_format(json_mode))
+llm_start = time.time()
+found = runner.run_labels(batches, build_prompt)
+llm_seconds = time.time() - llm_start
+
+labelled = [i for i in todo if item_id(i) in found]
+for i in labelled:
+    all_labels[i] = found[item_id(i)]
+    label_source[i] = "llm"
+cache.put_many([comments[i] for i in labelled], [all_labels[i] for i in labelled])
+
+unlabelled = len(todo) - len(labelled)
+print(f"Requests: {runner.stats['requests']}, retries: {runner.stats['retries']}, "
+      f"re-asked ids: {runner.stats['reasked_ids']}, failed requests: {runner.stats['failures']}")
+if unlabelled:
+    print(f"Warning: {unlabelled} comments got no usable label (left empty, rerun to retry them)")
+print(cache.stats_line())
+if pre is not None:
+    print(savings_report(local_count + len(todo), local_count,
+                         llm_seconds / len(todo) if todo else None, pre.target_agreement))
 
 # --- Assign labels safely ---
-df['related_to_topic'] = all_labels[:len(df)]  # match lengths
+df['related_to_topic'] = all_labels
+df['label_source'] = label_source  # cache / local / llm (local ones are not used to retrain the pre-classifier)
 
 # --- Save results ---
 output_file = "classified_comments_test.xlsx" if TEST_LIMIT else "classified_comments.xlsx"
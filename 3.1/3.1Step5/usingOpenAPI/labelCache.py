@@ -0,0 +1,99 @@
+import hashlib
+import re
+import sqlite3
+import time
+import unicodedata
+
+# Persistent label cache for the LLM relevance checks (Step1 posts, Step3 comments).
+# Every label is stored under sha256(prompt template + model + normalized text), so
+#   - re-runs and TEST_LIMIT experiments don't pay twice for the same item
+#   - overlapping inputs (eval1 / eval2 / eval3) share answers
+#   - changing the prompt or the model automatically starts from an empty cache
+# Same SQLite setup as crawlState.py (WAL, one small transaction per write).
+
+LABEL_CACHE_DB = "label_cache.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    key TEXT PRIMARY KEY,
+    label TEXT NOT NULL,
+    model TEXT,
+    created_at REAL
+);
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_text(text):
+    """Same text modulo unicode form and whitespace -> same key (case is kept, 'AI' != 'ai')"""
+    if not isinstance(text, str):
+        text = "" if text is None else str(text)
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFC", text)).strip()
+
+
+def cache_key(template, model, text):
+    h = hashlib.sha256()
+    for part in (template, model, normalize_text(text)):
+        h.update(part.encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+class LabelCache:
+    """
+    cache = LabelCache(template=topic_instruction, model="gpt-4")
+    labels = cache.get_many(comments)          -> cached label or None per comment
+    cache.put_many(new_comments, new_labels)
+    print(cache.stats_line())
+    """
+
+    def __init__(self, db_file=LABEL_CACHE_DB, template="", model=""):
+        self.template = template
+        self.model = model
+        self.hits = 0
+        self.misses = 0
+        self.stored = 0
+        self.conn = sqlite3.connect(db_file, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def key(self, text):
+        return cache_key(self.template, self.model, text)
+
+    def get_many(self, texts):
+        labels = []
+        for text in texts:
+            row = self.conn.execute("SELECT label FROM labels WHERE key = ?", (self.key(text),)).fetchone()
+            if row is None:
+                self.misses += 1
+                labels.append(None)
+            else:
+                self.hits += 1
+                labels.append(row[0])
+        return labels
+
+    def get(self, text):
+        return self.get_many([text])[0]
+
+    def put_many(self, texts, labels):
+        now = time.time()
+        rows = [(self.key(t), label, self.model, now) for t, label in zip(texts, labels)]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            self.conn.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?)", rows)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        self.stored += len(rows)
+
+    def stats_line(self):
+        lookups = self.hits + self.misses
+        rate = self.hits / lookups * 100 if lookups else 0
+        return (f"Label cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), "
+                f"{self.stored} new labels stored")
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,167 @@
+import asyncio
+import os
+import random
+import sys
+
+import openai
+
+from structuredLabels import MAX_ROUNDS, parse_labels_json
+# Token bucket from the async crawler lives one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from asyncCrawl import TokenBucket
+
+# Async chat-completions runner used by checkifCommentRelatedviaAIStep3.py.
+# Sends many prompts at once instead of one batch + time.sleep(1) at a time:
+#   - at most MAX_CONCURRENCY requests in flight (asyncio.Semaphore)
+#   - requests/minute and tokens/minute budgets, each a TokenBucket
+#   - RateLimitError / timeouts / connection errors / 5xx are retried with
+#     exponential backoff + full jitter, everything else fails that prompt only
+#   - results come back in the same order as the prompts
+# Point it at mockCompletionsServer.py with OPENAI_BASE_URL=http://127.0.0.1:8766/v1
+
+MAX_CONCURRENCY = 8
+REQUESTS_PER_MINUTE = 500
+TOKENS_PER_MINUTE = 40000
+MAX_RETRIES = 6
+BACKOFF_BASE = 1.0   # seconds, doubled every attempt
+BACKOFF_CAP = 60.0
+
+# Errors worth retrying with the modern (>= 1.0) client
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def estimate_tokens(prompt, max_tokens=None):
+    """Rough prompt + completion size (~4 chars per token), only used for the TPM budget"""
+    return len(prompt) // 4 + 1 + (max_tokens or 0)
+
+
+def backoff_delay(attempt, base=BACKOFF_BASE, cap=BACKOFF_CAP):
+    """Full jitter: anywhere between 0 and base * 2**attempt, so retries don't line up"""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+
+def _retry_after(error):
+    response = getattr(error, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class AsyncLLMRunner:
+    """
+    runner = AsyncLLMRunner(openai.AsyncOpenAI(max_retries=0), model="gpt-4")
+    texts = runner.run(prompts)   -> one reply text per prompt (None if it kept failing)
+    labels = runner.run_labels(id_batches, build_prompt)
+                                  -> {id: label}, missing/invalid ids re-asked on their own
+    runner.stats                  -> requests / retries / failures / re-asked ids counters
+    """
+
+    def __init__(self, client, model, max_concurrency=MAX_CONCURRENCY, rpm=REQUESTS_PER_MINUTE,
+                 tpm=TOKENS_PER_MINUTE, max_retries=MAX_RETRIES, temperature=0, max_tokens=None,
+                 response_format=None):
+        self.client = client
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.response_format = response_format  # e.g. structuredLabels.response_format("json_object")
+        # Burst of ~10s worth of budget, then a steady refill of limit/60 per second
+        self.request_bucket = TokenBucket(rpm / 60, burst=max(1, rpm // 6))
+        self.token_bucket = TokenBucket(tpm / 60, burst=max(1, tpm // 6))
+        self.stats = {"requests": 0, "retries": 0, "failures": 0, "reasked_ids": 0}
+
+    async def complete(self, prompt, max_tokens=None):
+        """One chat completion with budgets + retries, returns the reply text or None"""
+        max_tokens = max_tokens or self.max_tokens
+        cost = estimate_tokens(prompt, max_tokens)
+
+        for attempt in range(self.max_retries):
+            await self.request_bucket.acquire()
+            await self.token_bucket.acquire(cost)
+            self.stats["requests"] += 1
+            try:
+                response = await self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=self.temperature,
+                    **({"max_tokens": max_tokens} if max_tokens else {}),
+                    **({"response_format": self.response_format} if self.response_format else {}),
+                )
+                return response.choices[0].message.content
+            except RETRYABLE_ERRORS as e:
+                self.stats["retries"] += 1
+                wait = backoff_delay(attempt)
+                if isinstance(e, openai.RateLimitError):
+                    retry_after = _retry_after(e)
+                    self.request_bucket.penalize(retry_after)
+                    self.token_bucket.penalize(retry_after)
+                    wait = max(wait, retry_after or 0)
+                print(f"{type(e).__name__}, retrying in {wait:.1f}s (attempt {attempt+1}/{self.max_retries})")
+                await asyncio.sleep(wait)
+            except openai.OpenAIError as e:
+                print(f"Other OpenAI error: {e}")
+                break
+
+        self.stats["failures"] += 1
+        return None
+
+    async def _complete_limited(self, prompt, max_tokens=None):
+        async with self._semaphore:
+            return await self.complete(prompt, max_tokens)
+
+    async def run_async(self, prompts, max_tokens=None):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        done = 0
+
+        async def worker(prompt):
+            nonlocal done
+            text = await self._complete_limited(prompt, max_tokens)
+            done += 1
+            print(f"Finished {done}/{len(prompts)} requests")
+            return text
+
+        # gather keeps the prompt order no matter which request finishes first
+        return await asyncio.gather(*(worker(p) for p in prompts))
+
+    def run(self, prompts, max_tokens=None):
+        return asyncio.run(self.run_async(list(prompts), max_tokens))
+
+    async def label_batch(self, ids, build_prompt, max_rounds=MAX_ROUNDS):
+        """Async version of structuredLabels.label_missing_ids"""
+        found = {}
+        remaining = list(ids)
+        for round_num in range(max_rounds):
+            if round_num:
+                self.stats["reasked_ids"] += len(remaining)
+            text = await self._complete_limited(build_prompt(remaining))
+            if text is None:
+                break
+            found.update(parse_labels_json(text, remaining))
+            remaining = [i for i in remaining if i not in found]
+            if not remaining:
+                break
+        return found
+
+    async def run_labels_async(self, id_batches, build_prompt, max_rounds=MAX_ROUNDS):
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        results = await asyncio.gather(*(self.label_batch(b, build_prompt, max_rounds) for b in id_batches))
+        found = {}
+        for r in results:
+            found.update(r)
+        return found
+
+    def run_labels(self, id_batches, build_prompt, max_rounds=MAX_ROUNDS):
+        """
+        build_prompt(ids) -> prompt asking for JSON labels of those item ids.
+        Returns {id: label}; ids missing from it never got a valid answer.
+        """
+        return asyncio.run(self.run_labels_async(list(id_batches), build_prompt, max_rounds))
@@ -0,0 +1,138 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Fixed-window rate counter from the Reddit stand-in lives one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from mockRedditServer import RateWindow
+
+# Local stand-in for the OpenAI chat completions endpoint, so the classifier can be
+# run (and its retry/rate limit handling checked) without spending API credits.
+#
+# Usage:
+#   python mockCompletionsServer.py --port 8766 --quota 20 --window 10
+#   OPENAI_BASE_URL=http://127.0.0.1:8766/v1 OPENAI_API_KEY=test python checkifCommentRelatedviaAIStep3.py
+#
+# POST /v1/chat/completions answers every item of the prompt with 'yes' if it mentions
+# AI and 'no' otherwise:
+#   "[id=c17] ..." items -> {"labels": [{"id": "c17", "label": "yes"}, ...]} (JSON mode)
+#   "1. ..." items       -> comma-separated, in order (old prompts)
+# --drop-rate leaves that fraction of ids out of JSON answers, to exercise the re-asking.
+# --quota makes it answer 429 (with retry-after) once the window is used up,
+# --error-rate makes that fraction of requests fail with a 500.
+
+ITEM_LINE = re.compile(r"^\s*(\d+)\.\s+(.*)$")
+ID_LINE = re.compile(r"^\s*\[id=([^\]]+)\]\s*(.*)$")
+AI_MENTION = re.compile(r"\bAI\b|artificial intelligence|chatgpt|\bATS\b", re.IGNORECASE)
+
+
+def fake_labels(prompt):
+    """'yes'/'no' per numbered item, deterministic so runs can be compared"""
+    items = [m.group(2) for m in map(ITEM_LINE.match, prompt.splitlines()) if m]
+    return ["yes" if AI_MENTION.search(item) else "no" for item in items]
+
+
+def fake_json_labels(prompt, drop_rate=0.0):
+    """JSON answer for "[id=...]" items, or None if the prompt has none"""
+    items = [m.groups() for m in map(ID_LINE.match, prompt.splitlines()) if m]
+    if not items:
+        return None
+    labels = [{"id": item_id, "label": "yes" if AI_MENTION.search(text) else "no"}
+              for item_id, text in items if not (drop_rate and random.random() < drop_rate)]
+    return json.dumps({"labels": labels})
+
+
+def completion_body(model, content, prompt):
+    return {
+        "id": f"chatcmpl-mock{random.getrandbits(32):08x}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": model,
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content},
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(content) // 4,
+            "total_tokens": (len(prompt) + len(content)) // 4,
+        },
+    }
+
+
+def make_handler(rate_window, latency, error_rate, drop_rate=0.0):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def send_json(self, status, payload, remaining, reset):
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("x-ratelimit-remaining-requests", str(remaining))
+            self.send_header("x-ratelimit-reset-requests", f"{reset:.1f}s")
+            if status == 429:
+                self.send_header("retry-after", str(int(reset) + 1))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            request = json.loads(self.rfile.read(length) or b"{}")
+            ok, remaining, reset = rate_window.hit()
+            if latency:
+                time.sleep(latency)
+
+            if self.path.rstrip("/") != "/v1/chat/completions":
+                self.send_json(404, {"error": {"message": "Not Found", "type": "invalid_request_error"}},
+                               remaining, reset)
+                return
+            if not ok:
+                self.send_json(429, {"error": {"message": "Rate limit reached", "type": "requests",
+                                               "code": "rate_limit_exceeded"}}, remaining, reset)
+                return
+            if error_rate and random.random() < error_rate:
+                self.send_json(500, {"error": {"message": "The server had an error", "type": "server_error"}},
+                               remaining, reset)
+                return
+
+            prompt = "\n".join(str(m.get("content", "")) for m in request.get("messages", []))
+            content = fake_json_labels(prompt, drop_rate)
+            if content is None:
+                content = ", ".join(fake_labels(prompt))
+            self.send_json(200, completion_body(request.get("model", "mock"), content, prompt), remaining, reset)
+
+        def log_message(self, format, *args):
+            pass  # keep classifier output readable
+
+    return Handler
+
+
+def serve(port=8766, quota=3500, window=60, latency=0.0, error_rate=0.0, drop_rate=0.0):
+    handler = make_handler(RateWindow(quota, window), latency, error_rate, drop_rate)
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    print(f"Serving mock chat completions on http://127.0.0.1:{port}/v1")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Local stand-in for the OpenAI chat completions API")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--quota", type=int, default=3500, help="requests allowed per window before 429")
+    parser.add_argument("--window", type=float, default=60, help="rate limit window in seconds")
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds of delay added to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with a 500")
+    parser.add_argument("--drop-rate", type=float, default=0.0, help="fraction of ids left out of JSON answers")
+    args = parser.parse_args()
+
+    server = serve(args.port, args.quota, args.window, args.latency, args.error_rate, args.drop_rate)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
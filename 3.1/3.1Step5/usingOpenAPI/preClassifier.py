@@ -0,0 +1,205 @@
+import argparse
+import os
+import time
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import cross_val_predict
+from sklearn.pipeline import make_pipeline
+
+# Cheap local first pass before the LLM (cascade mode in Step1/Step3).
+# TF-IDF + logistic regression is trained on comments that already have a label
+# (hand-labelled eval sheets, or an earlier classified_comments.xlsx), scores every
+# item on CPU in milliseconds, and only the uncertain band goes to GPT:
+#   P(yes) >= high -> 'yes' locally
+#   P(yes) <= low  -> 'no' locally
+#   otherwise      -> LLM
+# low/high are picked on cross-validated predictions so that the locally decided
+# items agree with the labels at least `target_agreement` of the time.
+#
+# Train:   python preClassifier.py --data ../../evalFinalv1.xlsx classified_comments.xlsx --target-agreement 0.95
+# Posts:   python preClassifier.py --data posts_labelled.csv --text-cols title selftext --output preclassifier_posts.joblib
+
+MODEL_FILE = "preclassifier.joblib"
+TARGET_AGREEMENT = 0.95
+TEXT_COLUMNS = ["comment_text", "comment", "text"]
+LABEL_COLUMNS = ["label", "Class", "related_to_topic"]
+YES_VALUES = {"yes", "y", "1", "true", "relevant"}
+NO_VALUES = {"no", "n", "0", "false", "irrelevant"}
+
+
+def normalize_label(value):
+    """'yes'/'no', or None for blank/unknown labels"""
+    if value is None or (isinstance(value, float) and np.isnan(value)):
+        return None
+    value = str(value).strip().lower()
+    if value.endswith(".0"):
+        value = value[:-2]
+    if value in YES_VALUES:
+        return "yes"
+    if value in NO_VALUES:
+        return "no"
+    return None
+
+
+def joined_text(df, text_cols):
+    return df[text_cols].fillna("").astype(str).agg("\n".join, axis=1)
+
+
+def load_labelled(paths, text_cols=None, label_col=None):
+    """Texts + 'yes'/'no' labels from every sheet of the given files that has a usable label column"""
+    texts, labels = [], []
+    for path in paths:
+        if not os.path.exists(path):
+            print(f"Warning: {path} not found, skipping")
+            continue
+        sheets = pd.read_csv(path) if path.endswith(".csv") else pd.read_excel(path, sheet_name=None)
+        for name, df in (sheets.items() if isinstance(sheets, dict) else [(path, sheets)]):
+            cols = text_cols or [next((c for c in TEXT_COLUMNS if c in df.columns), None)]
+            lcol = label_col or next((c for c in LABEL_COLUMNS if c in df.columns), None)
+            if None in cols or lcol is None or not set(cols) <= set(df.columns):
+                continue
+            y = df[lcol].map(normalize_label)
+            keep = y.notna()
+            if "label_source" in df.columns:
+                keep &= df["label_source"] != "local"  # don't learn from our own guesses
+            if keep.any():
+                print(f"  {path} [{name}]: {keep.sum()} labelled rows ('{lcol}')")
+            texts += joined_text(df[keep], cols).tolist()
+            labels += y[keep].tolist()
+    if not texts or len(set(labels)) < 2:
+        raise ValueError("Need labelled rows of both classes (a 'label'/'Class'/'related_to_topic' column with yes/no)")
+    return texts, np.array(labels)
+
+
+def build_model():
+    return make_pipeline(
+        TfidfVectorizer(ngram_range=(1, 2), min_df=2, sublinear_tf=True, max_features=200000),
+        LogisticRegression(class_weight="balanced", max_iter=2000),
+    )
+
+
+def pick_thresholds(p_yes, labels, target_agreement=TARGET_AGREEMENT):
+    """
+    Widest auto-decided region with agreement >= target on each side:
+    high = lowest score where the items at or above it are 'yes' often enough,
+    low  = highest score where the items at or below it are 'no' often enough.
+    """
+    is_yes = labels == "yes"
+    ranks = np.arange(1, len(labels) + 1)
+
+    order = np.argsort(-p_yes)
+    ok = np.nonzero(np.cumsum(is_yes[order]) / ranks >= target_agreement)[0]
+    high = p_yes[order][ok[-1]] if len(ok) else 1.01
+
+    order = np.argsort(p_yes)
+    ok = np.nonzero(np.cumsum(~is_yes[order]) / ranks >= target_agreement)[0]
+    low = p_yes[order][ok[-1]] if len(ok) else -0.01
+
+    if low >= high:  # overlapping bands, nothing is uncertain -> split at the middle
+        low = high = (low + high) / 2
+    return float(low), float(high)
+
+
+def route(p_yes, low, high):
+    """'yes' / 'no' where the local model is confident, None where the LLM should decide"""
+    return np.where(p_yes >= high, "yes", np.where(p_yes <= low, "no", None))
+
+
+def agreement_table(p_yes, labels, targets=(0.9, 0.95, 0.98, 0.99)):
+    rows = []
+    for target in targets:
+        low, high = pick_thresholds(p_yes, labels, target)
+        routed = route(p_yes, low, high)
+        auto = pd.notna(routed)
+        rows.append({
+            "target_agreement": target,
+            "low": round(low, 3),
+            "high": round(high, 3),
+            "auto_share": auto.mean(),
+            "agreement": (routed[auto] == labels[auto]).mean() if auto.any() else float("nan"),
+        })
+    return pd.DataFrame(rows)
+
+
+class PreClassifier:
+    """
+    pre = PreClassifier.load("preclassifier.joblib")
+    p_yes = pre.score(texts)
+    local_labels = pre.route(texts)    -> 'yes'/'no'/None per text
+    """
+
+    def __init__(self, model=None, low=0.0, high=1.0, text_cols=None, target_agreement=TARGET_AGREEMENT):
+        self.model = model or build_model()
+        self.low = low
+        self.high = high
+        self.text_cols = text_cols
+        self.target_agreement = target_agreement
+
+    def fit(self, texts, labels, target_agreement=TARGET_AGREEMENT, folds=5):
+        """Fit, and choose low/high on out-of-fold scores so the thresholds aren't overfit"""
+        labels = np.asarray(labels)
+        oof = cross_val_predict(build_model(), texts, labels, cv=folds, method="predict_proba")
+        p_yes = oof[:, list(np.unique(labels)).index("yes")]
+        self.low, self.high = pick_thresholds(p_yes, labels, target_agreement)
+        self.target_agreement = target_agreement
+        self.model.fit(texts, labels)
+        return p_yes
+
+    def score(self, texts):
+        texts = ["" if not isinstance(t, str) else t for t in texts]
+        yes_col = list(self.model.classes_).index("yes")
+        return self.model.predict_proba(texts)[:, yes_col]
+
+    def route(self, texts, low=None, high=None):
+        return route(self.score(texts), self.low if low is None else low, self.high if high is None else high)
+
+    def save(self, path=MODEL_FILE):
+        joblib.dump({"model": self.model, "low": self.low, "high": self.high,
+                     "text_cols": self.text_cols, "target_agreement": self.target_agreement}, path)
+
+    @classmethod
+    def load(cls, path=MODEL_FILE):
+        return cls(**joblib.load(path))
+
+
+def savings_report(n_total, n_local, llm_seconds_per_item=None, target_agreement=None):
+    """How much LLM volume/time the cascade avoided for this run"""
+    share = n_local / n_total * 100 if n_total else 0
+    line = f"Cascade: {n_local} of {n_total} items labelled locally ({share:.1f}% fewer LLM items"
+    if target_agreement is not None:
+        line += f" at >= {target_agreement:.0%} expected agreement"
+    line += ")"
+    if llm_seconds_per_item:
+        line += f", ~{n_local * llm_seconds_per_item / 60:.1f} min of LLM time saved ({llm_seconds_per_item:.2f}s/item this run)"
+    return line
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Train the local pre-classifier used by the LLM cascade")
+    parser.add_argument("--data", nargs="+", required=True, help="labelled .xlsx/.csv files")
+    parser.add_argument("--text-cols", nargs="+", default=None, help="text column(s), default comment_text/comment/text")
+    parser.add_argument("--label-col", default=None, help="label column, default label/Class/related_to_topic")
+    parser.add_argument("--target-agreement", type=float, default=TARGET_AGREEMENT)
+    parser.add_argument("--output", default=MODEL_FILE)
+    args = parser.parse_args()
+
+    print("Loading labelled data...")
+    texts, labels = load_labelled(args.data, args.text_cols, args.label_col)
+    print(f"{len(texts)} labelled items ({(labels == 'yes').sum()} yes / {(labels == 'no').sum()} no)")
+
+    pre = PreClassifier(text_cols=args.text_cols)
+    start = time.time()
+    p_yes = pre.fit(texts, labels, args.target_agreement)
+    print(f"Trained in {time.time() - start:.1f}s")
+
+    print("\nCross-validated coverage vs agreement:")
+    print(agreement_table(p_yes, labels).to_string(index=False))
+
+    pre.save(args.output)
+    routed = route(p_yes, pre.low, pre.high)
+    print(f"\n✅ Saved {args.output} (low={pre.low:.3f}, high={pre.high:.3f})")
+    print(savings_report(len(texts), int(pd.notna(routed).sum()), target_agreement=args.target_agreement))
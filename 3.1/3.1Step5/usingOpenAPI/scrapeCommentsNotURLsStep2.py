@@ -2,6 +2,12 @@ import pandas as pd
 import requests
 import time
 import random
+import os
+import sys
+
+# Shared pooled session + conditional GET cache lives one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from redditFetch import cached_get
 
 #REV goes into eval2
 
@@ -21,7 +27,7 @@ def fetch_reddit_comments(url):
 
     for attempt in range(MAX_RETRIES):
         try:
-            response = requests.get(url, headers=HEADERS, timeout=10)
+            response = cached_get(url, headers=HEADERS, timeout=10)
 
             if response.status_code == 429:
                 delay = BASE_DELAY * (2 ** attempt) + random.uniform(0, 1)
@@ -1,12 +1,21 @@
-import requests
 import csv
 import time
 from datetime import datetime
 import openai
 import os
+import sys
 import json
 from dotenv import load_dotenv
 
+# Shared pooled session + conditional GET cache lives one folder up
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from redditFetch import cached_get
+
+from batchPlanner import count_tokens, plan_batches, truncate_text
+from labelCache import LabelCache
+from preClassifier import PreClassifier, savings_report
+from structuredLabels import JSON_INSTRUCTION, format_item, label_missing_ids, response_format
+
 #REV as of now prog doesn't exclude #deleted/removed comments so later u still need to filter out
 #once u start crawling for the actual comments cuz rn u r only blindy counting #comments
 
@@ -35,7 +44,14 @@ keywords = [
 
 MIN_COMMENTS = 25
 POSTS_PER_QUERY = 100
-BATCH_SIZE = 10
+PROMPT_TOKEN_BUDGET = 3000   # prompt tokens per relevance call (posts are packed up to this)
+MAX_BATCH_SIZE = 20          # cap on posts per call
+SELFTEXT_MAX_TOKENS = 500    # longer selftexts are cut before they go in the prompt
+SELFTEXT_TRUNCATION = "head_tail"  # or "head"
+# Cascade: a local model trained on labelled posts (preClassifier.py --text-cols title selftext)
+# answers the posts it is confident about, only the rest go to the LLM
+USE_CASCADE = True
+CASCADE_MODEL = "preclassifier_posts.joblib"
 REQUEST_DELAY = 2.0
 TARGET_COMMENTS = 30000
 TARGET_POSTS = 300
@@ -45,6 +61,15 @@ HEADERS = {
     "User-Agent": "Mozilla/5.0 (Stage1PostCollector/1.0; contact=edu)"
 }
 
+RELEVANCE_MODEL = "gpt-3.5-turbo"
+RELEVANCE_JSON_MODE = "json_object"
+RELEVANCE_PROMPT = (
+    "For each Reddit post below, answer only 'yes' if it is directly related to "
+    "AI used in hiring, recruitment, resume screening, or interview automation, "
+    "otherwise answer 'no'. Be very strict to avoid false positives. "
+    + JSON_INSTRUCTION + "\n"
+)
+
 # --- Load OpenAI API key ---
 load_dotenv("openai_api_key.env")
 openai.api_key = os.getenv("OPENAI_API_KEY")
@@ -78,7 +103,7 @@ def fetch_posts(subreddit, keyword, limit=100):
         "limit": limit,
     }
     try:
-        r = requests.get(url, headers=HEADERS, params=params, timeout=10)
+        r = cached_get(url, headers=HEADERS, params=params, timeout=10)
         if r.status_code != 200:
             print(f"Failed ({subreddit}, '{keyword}') -> {r.status_code}")
             return []
@@ -87,32 +112,45 @@ def fetch_posts(subreddit, keyword, limit=100):
         print(f"Error ({subreddit}, '{keyword}'): {e}")
         return []
 
-def check_batch_relevance(posts_batch):
-    """Check relevance of multiple posts in one OpenAI call"""
-    prompt = (
-        "For each Reddit post below, answer only 'yes' if it is directly related to "
-        "AI used in hiring, recruitment, resume screening, or interview automation, "
-        "otherwise answer 'no'. Be very strict to avoid false positives. "
-        "Reply with one answer per post in order, separated by commas.\n\n"
-    )
-    for i, post in enumerate(posts_batch, start=1):
-        prompt += f"{i}. Title: {post['title']}\n   Selftext: {post['selftext']}\n\n"
+def post_text(post):
+    return f"Title: {post['title']}\n   Selftext: {post['selftext']}"
+
+def prompt_text(post):
+    selftext = truncate_text(post["selftext"], SELFTEXT_MAX_TOKENS, RELEVANCE_MODEL, SELFTEXT_TRUNCATION)
+    return f"Title: {post['title']}\n   Selftext: {selftext}"
 
+def ask_relevance(posts):
+    prompt = RELEVANCE_PROMPT
+    for post in posts:
+        prompt += format_item(post["id"], prompt_text(post)) + "\n\n"
     try:
         response = openai.chat.completions.create(
-            model="gpt-3.5-turbo",
+            model=RELEVANCE_MODEL,
             messages=[{"role": "user", "content": prompt}],
             temperature=0,
-            max_tokens=len(posts_batch) * 3
+            max_tokens=len(posts) * 20 + 10,
+            **({"response_format": response_format(RELEVANCE_JSON_MODE)} if RELEVANCE_JSON_MODE else {})
         )
-        answers = response.choices[0].message.content.strip().lower()
-        answers_list = [ans.strip() for ans in answers.replace("\n", ",").split(",") if ans.strip()]
-        return answers_list
+        return response.choices[0].message.content
     except Exception as e:
         print(f"OpenAI API error: {e}")
-        return ["no"] * len(posts_batch)
+        return None
+
+def check_batch_relevance(posts_batch):
+    """
+    Check relevance of multiple (uncached) posts in one OpenAI call. Answers are matched
+    by post id and only ids missing from the reply are asked again; every answer goes
+    into the cache. None = no usable answer (left unchecked, retried next run).
+    """
+    todo = {p["id"]: p for p in posts_batch}
+    found = label_missing_ids(list(todo), lambda ids: ask_relevance([todo[i] for i in ids]))
+    label_cache.put_many([post_text(todo[i]) for i in found], list(found.values()))
+    return [found.get(p["id"]) for p in posts_batch]
 
 # --- Main ---
+label_cache = LabelCache(template=RELEVANCE_PROMPT, model=RELEVANCE_MODEL)
+pre_classifier = PreClassifier.load(CASCADE_MODEL) if USE_CASCADE and os.path.exists(CASCADE_MODEL) else None
+cascade_local = cascade_total = 0
 new_rows_this_run = []
 
 # Load existing CSV if exists and count total comments
@@ -142,42 +180,61 @@ for kw in keywords:
         if not new_posts:
             continue
 
-        # Process in batches
-        for i in range(0, len(new_posts), BATCH_SIZE):
-            batch = new_posts[i:i+BATCH_SIZE]
-            batch_posts = [{"title": p.get("title",""), "selftext": p.get("selftext",""), **p} for p in batch]
-            relevance_answers = check_batch_relevance(batch_posts)
+        # Cached (and confidently routed) posts are answered up front; only the rest is packed
+        # into batches up to PROMPT_TOKEN_BUDGET, so they don't take up room in an LLM call
+        all_posts = [{**p, "title": p.get("title") or "", "selftext": p.get("selftext") or ""} for p in new_posts]
+        answers = label_cache.get_many([post_text(p) for p in all_posts])
+        if pre_classifier is not None:
+            # confident local answers are used like cached ones (but not stored in the LLM cache)
+            unknown = [i for i, ans in enumerate(answers) if ans is None]
+            local = pre_classifier.route([f"{all_posts[i]['title']}\n{all_posts[i]['selftext']}" for i in unknown])
+            for i, ans in zip(unknown, local):
+                answers[i] = ans
+            cascade_total += len(unknown)
+            cascade_local += sum(ans is not None for ans in local)
+        todo = [i for i, ans in enumerate(answers) if ans is None]
+        batches = plan_batches([count_tokens(prompt_text(all_posts[i]), RELEVANCE_MODEL) for i in todo],
+                               PROMPT_TOKEN_BUDGET, max_items=MAX_BATCH_SIZE,
+                               overhead_tokens=count_tokens(RELEVANCE_PROMPT, RELEVANCE_MODEL), per_item_tokens=20)
+
+        for batch in batches:
+            batch_idx = [todo[j] for j in batch]
+            labels = check_batch_relevance([all_posts[i] for i in batch_idx])
+            for i, ans in zip(batch_idx, labels):
+                answers[i] = ans
             time.sleep(REQUEST_DELAY)
 
-            for post_data, relevant in zip(batch_posts, relevance_answers):
-                post_id = post_data["id"]
-                checked_post_ids.add(post_id)  # mark as checked
-
-                if relevant != "yes" or post_id in included_post_ids:
-                    continue
-
-                included_post_ids.add(post_id)
-                num_comments = post_data.get("num_comments",0)
-                total_comments_collected += num_comments
-
-                row = {
-                    "keyword": kw,
-                    "subreddit": sub,
-                    "post_id": post_id,
-                    "title": post_data.get("title", ""),
-                    "selftext": post_data.get("selftext", ""),
-                    "num_comments": num_comments,
-                    "url": f"https://www.reddit.com{post_data['permalink']}",
-                    "created_utc": datetime.utcfromtimestamp(
-                        post_data["created_utc"]
-                    ).isoformat() + "Z",
-                }
-                new_rows_this_run.append(row)
-                print(f"Included post {post_id} ({num_comments} comments). Total comments: {total_comments_collected}, Total posts: {len(included_post_ids)}")
-
-                if len(included_post_ids) >= TARGET_POSTS and total_comments_collected >= TARGET_COMMENTS:
-                    print("Reached target posts and comments!")
-                    break
+        for post_data, relevant in zip(all_posts, answers):
+            post_id = post_data["id"]
+            if relevant is None:
+                continue  # no usable answer, try again next run
+            checked_post_ids.add(post_id)  # mark as checked
+
+            if relevant != "yes" or post_id in included_post_ids:
+                continue
+
+            included_post_ids.add(post_id)
+            num_comments = post_data.get("num_comments",0)
+            total_comments_collected += num_comments
+
+            row = {
+                "keyword": kw,
+                "subreddit": sub,
+                "post_id": post_id,
+                "title": post_data.get("title", ""),
+                "selftext": post_data.get("selftext", ""),
+                "num_comments": num_comments,
+                "url": f"https://www.reddit.com{post_data['permalink']}",
+                "created_utc": datetime.utcfromtimestamp(
+                    post_data["created_utc"]
+                ).isoformat() + "Z",
+            }
+            new_rows_this_run.append(row)
+            print(f"Included post {post_id} ({num_comments} comments). Total comments: {total_comments_collected}, Total posts: {len(included_post_ids)}")
+
+            if len(included_post_ids) >= TARGET_POSTS and total_comments_collected >= TARGET_COMMENTS:
+                print("Reached target posts and comments!")
+                break
 
 # --- Save progress ---
 with open(CHECKED_FILE, "w") as f:
@@ -207,3 +264,6 @@ with open(OUTPUT_CSV, "a", newline="", encoding="utf-8") as f:
     writer.writerows(new_rows_this_run)
 
 print(f"\nAppended {len(new_rows_this_run)} posts, total comments now {total_comments_collected} to {OUTPUT_CSV}")
+print(label_cache.stats_line())
+if pre_classifier is not None:
+    print(savings_report(cascade_total, cascade_local, target_agreement=pre_classifier.target_agreement))
@@ -0,0 +1,117 @@
+import json
+
+# Structured (JSON) answers for the LLM labelling steps.
+# Every item in the prompt carries an id, the model answers
+#   {"labels": [{"id": "c17", "label": "yes"}, {"id": "c18", "label": "no"}, ...]}
+# and each entry is checked against LABEL_SCHEMA on our side. Labels are matched by
+# id, not by position, so a stray comma or a skipped item can't shift the rest.
+# Ids that are missing or invalid are asked again on their own (label_missing_ids),
+# the ones that came back fine are kept.
+
+LABELS = ("yes", "no")
+MAX_ROUNDS = 3  # first ask + 2 retries of whatever ids are still missing
+
+LABEL_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "labels": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "id": {"type": "string"},
+                    "label": {"type": "string", "enum": list(LABELS)},
+                },
+                "required": ["id", "label"],
+                "additionalProperties": False,
+            },
+        },
+    },
+    "required": ["labels"],
+    "additionalProperties": False,
+}
+
+JSON_INSTRUCTION = (
+    "Answer with JSON only, in this exact shape, one entry per item id:\n"
+    '{"labels": [{"id": "<item id>", "label": "yes" or "no"}, ...]}\n'
+)
+
+
+def response_format(mode="json_object"):
+    """
+    response_format argument for chat.completions.create
+      "json_schema" -> strict schema (gpt-4o and newer)
+      "json_object" -> plain JSON mode (gpt-4-turbo, gpt-3.5-turbo-1106 and newer)
+      None          -> no constraint, rely on the instruction + validation
+    """
+    if mode == "json_schema":
+        return {"type": "json_schema", "json_schema": {"name": "labels", "strict": True, "schema": LABEL_SCHEMA}}
+    if mode == "json_object":
+        return {"type": "json_object"}
+    if mode is None:
+        return None
+    raise ValueError(f"Unknown response format mode {mode!r}")
+
+
+def format_item(item_id, text):
+    return f"[id={item_id}] {text}"
+
+
+def _valid_entry(entry, labels):
+    return (isinstance(entry, dict)
+            and isinstance(entry.get("id"), str)
+            and isinstance(entry.get("label"), str)
+            and entry["label"].strip().lower() in labels)
+
+
+def parse_labels_json(text, expected_ids, labels=LABELS):
+    """
+    id -> label for every valid entry whose id was asked for.
+    Unknown ids, labels outside `labels`, and ids answered twice with
+    different labels are dropped (they end up retried).
+    """
+    if not text:
+        return {}
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError:
+        # Some models wrap the JSON in a code fence
+        start, end = text.find("{"), text.rfind("}")
+        try:
+            data = json.loads(text[start:end + 1]) if start != -1 else None
+        except json.JSONDecodeError:
+            return {}
+    entries = data.get("labels") if isinstance(data, dict) else None
+    if not isinstance(entries, list):
+        return {}
+
+    expected = {str(i) for i in expected_ids}
+    found, conflicts = {}, set()
+    for entry in entries:
+        if not _valid_entry(entry, labels) or entry["id"].strip() not in expected:
+            continue
+        item_id, label = entry["id"].strip(), entry["label"].strip().lower()
+        if found.get(item_id, label) != label:
+            conflicts.add(item_id)
+        found[item_id] = label
+    for item_id in conflicts:
+        del found[item_id]
+    return found
+
+
+def label_missing_ids(ids, ask, max_rounds=MAX_ROUNDS):
+    """
+    ask(ids) -> reply text (None on failure). Re-asks only the ids that are still
+    missing after each round. Returns id -> label for the ids that got an answer.
+    """
+    found = {}
+    remaining = list(ids)
+    for _ in range(max_rounds):
+        text = ask(remaining)
+        if text is None:
+            break  # API kept failing, smaller prompts won't help
+        found.update(parse_labels_json(text, remaining))
+        remaining = [i for i in remaining if i not in found]
+        if not remaining:
+            break
+    return found
@@ -1,24 +1,60 @@
-import json, os
+import json, os, sys, time
 from datetime import datetime
 
+# "more" stub expansion + pooled/cached fetch live in 3.1Step5
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "3.1Step5"))
+from moreChildren import expand_more
+from redditFetch import cached_get
+from dedupIndex import DedupIndex
+
 #REV u manually download json file frm reddit posts then this prog will convert them to jsonl
 
-def reddit_json_to_jsonl(input_json_file, output_jsonl_file, post_url):
+# The saved .json only has the comments Reddit showed on the page, the rest are "more" stubs.
+# EXPAND_MORE fetches them through /api/morechildren (100 ids per call) before converting.
+EXPAND_MORE = True
+MORECHILDREN_URL = "https://www.reddit.com/api/morechildren.json"
+REQUEST_DELAY = 3.0
+
+# Comment index of the full crawl (3.1Step5/dedupIndex.py). Comments already in
+# jsonl_crawl_full are left out of these files so the two sources don't overlap.
+# Only read here, never written, so the full crawl still collects these threads itself.
+DEDUP_DB = os.path.join("..", "3.1Step5", "comment_index.sqlite")
+
+def fetch_more_json(url, params):
+    time.sleep(REQUEST_DELAY)
+    try:
+        r = cached_get(url, params=params, timeout=15)
+        if r.status_code == 200:
+            return r.json()
+        print(f"morechildren failed: HTTP {r.status_code}")
+    except Exception as e:
+        print(f"morechildren error: {e}")
+    return None
+
+def reddit_json_to_jsonl(input_json_file, output_jsonl_file, post_url, dedup=None):
     """
     Convert Reddit JSON (from /comments/.json) to JSONL where each comment is 1 record.
     Handles nested replies recursively.
+    Comments the dedup index already has are skipped (their replies are still checked).
     """
     with open(input_json_file, "r", encoding="utf-8") as f:
         data = json.load(f)
 
+    if EXPAND_MORE:
+        calls = expand_more(data, fetch_more_json, MORECHILDREN_URL)
+        if calls:
+            print(f"Expanded 'more' stubs with {calls} morechildren calls")
+
     # Post info for metadata
     post_data = data[0]["data"]["children"][0]["data"]
     subreddit = post_data["subreddit"]
     post_title = post_data["title"]
 
+    skipped = 0
     with open(output_jsonl_file, "w", encoding="utf-8") as out_f:
 
         def process_comment(comment):
+            nonlocal skipped
             if comment["kind"] != "t1":  # only process comments
                 return
             c = comment["data"]
@@ -30,10 +66,14 @@ def reddit_json_to_jsonl(input_json_file, output_jsonl_file, post_url):
                 "metadata": {
                     "subreddit": subreddit,
                     "post_title": post_title,
-                    "url": post_url
+                    "url": post_url,
+                    "parent_id": c.get("parent_id")
                 }
             }
-            out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            if dedup is not None and dedup.known_ids([c["id"]]):
+                skipped += 1
+            else:
+                out_f.write(json.dumps(record, ensure_ascii=False) + "\n")
             
             # Process replies recursively
             if c.get("replies") and isinstance(c["replies"], dict):
@@ -45,6 +85,8 @@ def reddit_json_to_jsonl(input_json_file, output_jsonl_file, post_url):
         for comment in comments_data:
             process_comment(comment)
 
+    if skipped:
+        print(f"Skipped {skipped} comments already in the full crawl")
     print(f"Finished! JSONL saved to {output_jsonl_file}")
 
 # List of input/output files + URLs
@@ -57,8 +99,13 @@ files = [
     {"input": "recruitment1.json", "url": "https://www.reddit.com/r/Recruitment/comments/1jmizg8/ai_in_hiring_tools_yes_or_no/"}
 ]
 
+dedup = DedupIndex(DEDUP_DB) if DEDUP_DB and os.path.exists(DEDUP_DB) else None
+
 for f in files:
     input_file = f["input"]
     #assume output file same name as input file
     output_file = os.path.splitext(input_file)[0] + ".jsonl"  # replaces .json with .jsonl
-    reddit_json_to_jsonl(input_file, output_file, f["url"])
+    reddit_json_to_jsonl(input_file, output_file, f["url"], dedup)
+
+if dedup is not None:
+    dedup.close()